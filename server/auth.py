@@ -1,14 +1,17 @@
-from models import User,db,TokenBlocklist
+from models import User
 from flask import Blueprint,request,make_response
 from flask_restful import Api, Resource
 from flask_jwt_extended import create_access_token,create_refresh_token,JWTManager,get_jwt,current_user,jwt_required,get_jwt_identity
 from functools import wraps
-from datetime import datetime, timezone
+from revocation import blocklist
+from identity import LazyUser
+from encoding import REPRESENTATIONS
 
 jwt=JWTManager()
 
 auth_bp = Blueprint('auth_bp',__name__, url_prefix='/auth')
 api=Api(auth_bp)
+api.representations.update(REPRESENTATIONS)
 
 
 
@@ -29,15 +32,11 @@ def allow(required_roles):
 
 @jwt.user_lookup_loader
 def user_lookup_callback(_jwt_header,jwt_data):
-    identity=jwt_data['sub']
-    return User.query.filter_by(id=identity).first()
+    return LazyUser(_jwt_header,jwt_data)
 
 @jwt.token_in_blocklist_loader
 def check_if_token_revoked(jwt_header, jwt_data):
-    jti = jwt_data["jti"]
-    token = TokenBlocklist.query.filter_by(jti=jti).first()
-
-    return token or None
+    return blocklist.is_revoked(jwt_data["jti"])
 
 
 
@@ -135,9 +134,7 @@ class Logout(Resource):
     @jwt_required()
     def get(self):
         jti = get_jwt()["jti"]
-        now = datetime.now(timezone.utc)
-        db.session.add(TokenBlocklist(jti=jti, created_at=now))
-        db.session.commit()
+        blocklist.revoke(jti)
         
         return make_response(
             {"message": "You have been logged out"},
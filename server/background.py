@@ -0,0 +1,32 @@
+import threading
+
+
+class FirstUse:
+    """A value built by create() the first time get() is called, once even when threads race.
+
+    The extensions' background threads are all held in one of these rather
+    than started in init_app. A server that preloads the app (wsgi.py under gunicorn
+    --preload) runs init_app in a parent process and then forks the workers, and a fork
+    copies only the thread that called it: each worker would inherit a Thread object with no
+    thread behind it, and any lock one of the parent's threads held at that moment stays
+    held. Built on first use, the thread belongs to the process that serves requests.
+    """
+
+    def __init__(self,create):
+        self.create=create
+        self.value=None
+        self._lock=threading.Lock()
+
+    def get(self):
+        if self.value is None:
+            with self._lock:
+                if self.value is None:
+                    self.value=self.create()
+        return self.value
+
+
+def daemon(target,name,*args):
+    """Start target(*args) on a daemon thread, for FirstUse(lambda: daemon(...))."""
+    thread=threading.Thread(target=target,args=args,name=name,daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,293 @@
+"""Load test of every API resource through the Flask test client.
+
+Run from the server directory:
+
+    python -m benchmarks.api --parcels 100000 --requests 200 --output before.json
+    python -m benchmarks.api --parcels 100000 --requests 200 --output after.json --compare before.json
+
+Seeds a throwaway SQLite database with seed.generate(), then sends --requests requests
+to each endpoint one after the other and reports throughput, p50/p95/p99 latency and SQL
+statements per request. With --compare the run is checked against an earlier JSON file
+and the exit status is 1 when any endpoint got slower than --tolerance allows or issues
+more SQL per request.
+
+Mutating endpoints work on their own rows: creates use fresh tracking numbers and phone
+numbers, deletes walk down from the highest ids. GET /parcels/<id>/events/stream never
+ends and is left out. The database and the response cache live in a temporary directory
+that is removed at the end.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime,timedelta
+from urllib.parse import urlencode
+
+
+class Scenario:
+    """One endpoint. url and body are values or functions of the request number."""
+
+    def __init__(self,method,url,name=None,body=None,token='admin',limit=None,warmup=True):
+        self.method=method
+        self.url=url
+        self.name=name or f"{method} {url}"
+        self.body=body
+        self.token=token
+        self.limit=limit
+        self.warmup=warmup
+
+    def request(self,index):
+        url=self.url(index) if callable(self.url) else self.url
+        body=self.body(index) if callable(self.body) else self.body
+        return url,body
+
+
+def scenarios(context):
+    users,parcels,locations,vehicles=context['users'],context['parcels'],context['locations'],context['vehicles']
+    rng=random.Random(1)
+    parcel=lambda index:rng.randrange(1,parcels+1)
+    user=lambda index:rng.randrange(1,users+1)
+    location=lambda index:rng.randrange(1,locations+1)
+    vehicle=lambda index:rng.randrange(1,vehicles+1)
+    staff,customer,lanes=context['staff'],context['customer'],context['lanes']
+    lane=lambda index:lanes[rng.randrange(len(lanes))]
+    recent=(datetime.now()-timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%S')
+
+    def new_parcel(prefix,index):
+        return {"user_id":staff,"name":"bench","description":"benchmark parcel","tracking_number":f"{prefix}{index}",
+                "weight":12.5,"status":"pending","sender_id":customer,"recipient_id":customer,
+                "location_id":location(index),"vehicle_id":None}
+
+    def new_user(prefix,index):
+        return {"name":f"Bench {prefix} {index}","phone_number":f"{prefix}{index:08d}","email":f"bench{prefix}{index}@example.com",
+                "password":"benchmark1","role":"customer"}
+
+    def pings(index):
+        return {"positions":[{"vehicle_id":vehicle(index),"latitude":rng.uniform(-4.5,4.5),"longitude":rng.uniform(34.0,41.0),
+                              "speed":rng.uniform(0,90)} for item in range(100)]}
+
+    return [
+        #auth.py
+        Scenario('POST','/auth/login',body={"phone_number":context['admin_phone'],"password":context['password']},token=None),
+        Scenario('GET','/auth/login',name='GET /auth/login (refresh)',token='refresh'),
+        Scenario('POST','/auth/signup',body=lambda index:new_user('09',index),token=None,warmup=False),
+        Scenario('GET','/auth/useridentity'),
+        Scenario('GET','/auth/logout',token='fresh',warmup=False),
+        #resources.py
+        Scenario('GET','/users'),
+        Scenario('GET','/users?name=wanjiru&limit=20'),
+        Scenario('GET','/users?phone_number=07000&limit=20'),
+        Scenario('POST','/users',body=lambda index:new_user('08',index),warmup=False),
+        Scenario('GET',lambda index:f"/users/{user(index)}",name='GET /users/<id>'),
+        Scenario('PUT',lambda index:f"/users/{user(index)}",name='PUT /users/<id>',body=lambda index:{"email":f"renamed{index}@example.com"},warmup=False),
+        Scenario('GET','/parcels'),
+        Scenario('GET','/parcels?status=in_transit&fields=id,tracking_number,status'),
+        Scenario('GET',lambda index:f"/parcels?location_id={location(index)}",name='GET /parcels?location_id'),
+        Scenario('POST','/parcels',body=lambda index:new_parcel('BENCH',index),warmup=False),
+        Scenario('POST','/parcels/bulk',body=lambda index:{"parcels":[new_parcel(f'BULK{index}-',item) for item in range(100)]},warmup=False),
+        Scenario('GET',lambda index:f"/parcels/{parcel(index)}",name='GET /parcels/<id>'),
+        Scenario('PUT',lambda index:f"/parcels/{parcel(index)}",name='PUT /parcels/<id>',body={"status":"in_transit"},warmup=False),
+        Scenario('GET','/vehicles'),
+        Scenario('POST','/vehicles',body=lambda index:{"number_plate":f"BENCH {index}","capacity":1000,"driver_name":"bench",
+                                                       "driver_phone":"0711111111","departure_time":None,
+                                                       "expected_arrival_time":None,"status":"empty",
+                                                       "location_id":location(index)},warmup=False),
+        Scenario('GET',lambda index:f"/vehicles/{vehicle(index)}",name='GET /vehicles/<id>'),
+        Scenario('PUT',lambda index:f"/vehicles/{vehicle(index)}",name='PUT /vehicles/<id>',body={"status":"loading"},warmup=False),
+        Scenario('GET','/locations'),
+        Scenario('POST','/locations',body={"origin":"Bench","destination":"Mark","cost_per_kg":99},warmup=False),
+        Scenario('GET',lambda index:f"/locations/{location(index)}",name='GET /locations/<id>'),
+        Scenario('PUT',lambda index:f"/locations/{location(index)}",name='PUT /locations/<id>',body={"cost_per_kg":120},warmup=False),
+        Scenario('GET',lambda index:f"/assignments/{staff}",name='GET /assignments/<id>'),
+        Scenario('GET','/me/parcels',token='customer'),
+        Scenario('GET',lambda index:f"/parcels/search?q={parcel(index)-1:06d}",name='GET /parcels/search?q=<tracking number part>'),
+        #the other blueprints
+        Scenario('GET',lambda index:f"/track/MW{parcel(index)-1:010d}",name='GET /track/<tracking_number>',token=None),
+        Scenario('GET',lambda index:f"/parcels/{parcel(index)}/events",name='GET /parcels/<id>/events'),
+        Scenario('POST','/quotes',body={"items":[{"location_id":item%locations+1,"weight":item+1} for item in range(100)]},token=None),
+        Scenario('GET',lambda index:"/routes?"+urlencode(dict(zip(('origin','destination'),lane(index)),weight=10)),
+                 name='GET /routes',token=None),
+        Scenario('POST','/vehicles/positions',body=pings,warmup=False),
+        Scenario('GET','/vehicles/positions'),
+        Scenario('GET',lambda index:f"/vehicles/{vehicle(index)}/eta?latitude=-1.28&longitude=36.82",name='GET /vehicles/<id>/eta'),
+        Scenario('POST',lambda index:f"/vehicles/{vehicle(index)}/transition",name='POST /vehicles/<id>/transition',
+                 body=lambda index:{"status":("in_transit","pending")[index%2]},warmup=False),
+        Scenario('POST',lambda index:f"/locations/{location(index)}/plan?dry_run=1",name='POST /locations/<id>/plan?dry_run=1'),
+        Scenario('GET','/stats'),
+        Scenario('GET',f"/parcels/export?created_from={recent}",name='GET /parcels/export (last day)'),
+        Scenario('GET','/metrics'),
+        #deletes last, walking down from the highest ids. Only an admin's assignments can be deleted
+        Scenario('DELETE','/assignments/1',name='DELETE /assignments/<id>',limit=context['admin_assignments'],warmup=False),
+        Scenario('DELETE',lambda index:f"/parcels/{parcels-index}",name='DELETE /parcels/<id>',limit=parcels//2,warmup=False),
+        Scenario('DELETE',lambda index:f"/users/{users-index}",name='DELETE /users/<id>',limit=users//2,warmup=False),
+        Scenario('DELETE',lambda index:f"/vehicles/{vehicles-index}",name='DELETE /vehicles/<id>',limit=vehicles//2,warmup=False),
+        Scenario('DELETE',lambda index:f"/locations/{locations-index}",name='DELETE /locations/<id>',limit=locations//2,warmup=False),
+        Scenario('DELETE','/locations',limit=1,warmup=False),
+    ]
+
+
+def percentile(ordered,fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered)-1,int(round(fraction*(len(ordered)-1))))]
+
+
+def run(client,scenario,requests,headers_for,statements,warmup):
+    count=min(requests,scenario.limit) if scenario.limit is not None else requests
+    if scenario.warmup:
+        for index in range(min(warmup,count)):
+            url,body=scenario.request(index)
+            client.open(url,method=scenario.method,json=body,headers=headers_for(scenario.token))
+    timings=[]
+    queries=0
+    codes={}
+    for index in range(count):
+        url,body=scenario.request(index)
+        headers=headers_for(scenario.token)
+        before=statements[0]
+        started=time.perf_counter()
+        response=client.open(url,method=scenario.method,json=body,headers=headers)
+        response.get_data()
+        timings.append(time.perf_counter()-started)
+        queries+=statements[0]-before
+        codes[str(response.status_code)]=codes.get(str(response.status_code),0)+1
+    timings.sort()
+    total=sum(timings)
+    return {
+        "requests":count,
+        "throughput":round(count/total,1) if total else None,
+        "mean_ms":round(total/count*1000,3) if count else None,
+        "p50_ms":round(percentile(timings,0.50)*1000,3) if timings else None,
+        "p95_ms":round(percentile(timings,0.95)*1000,3) if timings else None,
+        "p99_ms":round(percentile(timings,0.99)*1000,3) if timings else None,
+        "sql_per_request":round(queries/count,2) if count else None,
+        "statuses":codes
+    }
+
+
+def compare(results,baseline,tolerance):
+    """Endpoints that got slower at p95 than tolerance allows, or issue more SQL. Returns the count."""
+    regressions=0
+    for name,result in results.items():
+        old=baseline.get(name)
+        if not old or result['p95_ms'] is None or old.get('p95_ms') is None:
+            continue
+        change=(result['p95_ms']-old['p95_ms'])/old['p95_ms'] if old['p95_ms'] else 0
+        slower=change>tolerance and result['p95_ms']-old['p95_ms']>1
+        more_sql=(result['sql_per_request'] or 0)>(old.get('sql_per_request') or 0)+0.01
+        flag='REGRESSION' if slower or more_sql else ''
+        regressions+=bool(flag)
+        print(f"{name:52} p95 {old['p95_ms']:9.2f} -> {result['p95_ms']:9.2f} ms ({change:+.0%}) "
+              f"sql {old.get('sql_per_request')} -> {result['sql_per_request']} {flag}")
+    return regressions
+
+
+def measure(args,directory):
+    """Seed a database in directory and run every scenario against it. Returns (results, volumes, dialect)."""
+    from app import create_app
+    from models import db,User,Location,UserParcelAssignment
+    from positions import positions
+    from seed import generate,PASSWORD,ADMIN_PHONE
+    from sqlalchemy import event
+    from flask_jwt_extended import create_access_token,create_refresh_token
+    app=create_app({
+        "SQLALCHEMY_DATABASE_URI":f"sqlite:///{os.path.join(directory,'bench.db')}",
+        "RESPONSE_CACHE_PATH":os.path.join(directory,'response-cache.db'),
+    })
+
+    volumes={"users":args.users,"locations":args.locations,"vehicles":args.vehicles,"parcels":args.parcels}
+    with app.app_context():
+        generate(seed=1,log=lambda line:print(f"seed {line}"),**volumes)
+        staff=db.session.query(User.id).filter(User.role=='customer_service').order_by(User.id).first()
+        customer=db.session.query(User.id).filter(User.role=='customer').order_by(User.id).first()
+        customer=customer[0] if customer else 1
+        admin_assignments=UserParcelAssignment.query.filter_by(user_id=1).count()
+        lanes=db.session.query(Location.origin,Location.destination).all()
+        tokens={
+            "admin":create_access_token(identity=1,additional_claims={"role":"admin"}),
+            "refresh":create_refresh_token(identity=1),
+            "customer":create_access_token(identity=customer,additional_claims={"role":"customer"}),
+        }
+        engine=db.engine
+    context=dict(volumes,staff=staff[0] if staff else 1,customer=customer,lanes=[tuple(lane) for lane in lanes],
+                 admin_phone=ADMIN_PHONE,password=PASSWORD,admin_assignments=admin_assignments)
+
+    statements=[0]
+    def count_statement(*_):
+        statements[0]+=1
+    event.listen(engine,'before_cursor_execute',count_statement)
+
+    def headers_for(token):
+        if token is None:
+            return {}
+        if token=='fresh':
+            #logout revokes the token it is called with, every request needs its own
+            with app.app_context():
+                return {"Authorization":f"Bearer {create_access_token(identity=1,additional_claims={'role':'admin'})}"}
+        return {"Authorization":f"Bearer {tokens[token]}"}
+
+    client=app.test_client()
+    results={}
+    for scenario in scenarios(context):
+        if args.only and args.only not in scenario.name:
+            continue
+        result=run(client,scenario,args.requests,headers_for,statements,args.warmup)
+        results[scenario.name]=result
+        print(f"{scenario.name:52} {result['throughput'] or 0:9.1f} req/s  p50 {result['p50_ms'] or 0:8.2f}  "
+              f"p95 {result['p95_ms'] or 0:8.2f}  p99 {result['p99_ms'] or 0:8.2f} ms  "
+              f"sql {result['sql_per_request']}  {result['statuses']}")
+
+    #write the buffered pings now, not at exit once the directory is gone
+    with app.app_context():
+        positions.flush()
+    database=engine.dialect.name
+    engine.dispose()
+    return results,volumes,database
+
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests',type=int,default=100,help="requests per endpoint")
+    parser.add_argument('--warmup',type=int,default=5,help="untimed requests per read-only endpoint")
+    parser.add_argument('--users',type=int,default=2000)
+    parser.add_argument('--locations',type=int,default=50)
+    parser.add_argument('--vehicles',type=int,default=200)
+    parser.add_argument('--parcels',type=int,default=20000)
+    parser.add_argument('--only',default=None,help="run the endpoints whose name contains this")
+    parser.add_argument('--output',default='benchmark-api.json')
+    parser.add_argument('--compare',default=None,help="earlier --output file to check against")
+    parser.add_argument('--tolerance',type=float,default=0.25,help="allowed p95 slowdown, 0.25 is 25%%")
+    args=parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results,volumes,database=measure(args,directory)
+
+    report={
+        "meta":{
+            "created_at":datetime.now().isoformat(timespec='seconds'),
+            "python":platform.python_version(),
+            "platform":platform.platform(),
+            "database":database,
+            "volumes":volumes,
+            "requests":args.requests
+        },
+        "results":results
+    }
+    with open(args.output,'w') as file:
+        json.dump(report,file,indent=2)
+    print(f"Saved {args.output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline=json.load(file)['results']
+        regressions=compare(results,baseline,args.tolerance)
+        print(f"{regressions} regressions against {args.compare}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark of response encoding on a page of parcels.
+
+Run from the server directory:
+
+    python -m benchmarks.encoding --parcels 1000
+
+Loads a page of seeded parcels with their sender and recipient the way GET /parcels does,
+then times every encoder the app can use on it (the old pretty printed stdlib JSON, compact
+stdlib JSON, orjson and msgpack when installed) and reports the bytes on the wire raw,
+gzipped and deflated along with the compression time.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import zlib
+
+
+def _best(func,repeat):
+    timings=[]
+    for _ in range(repeat):
+        started=time.perf_counter()
+        result=func()
+        timings.append(time.perf_counter()-started)
+    return min(timings),result
+
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--parcels',type=int,default=1000)
+    parser.add_argument('--repeat',type=int,default=20)
+    parser.add_argument('--level',type=int,default=6,help="gzip/deflate compression level")
+    args=parser.parse_args()
+
+    directory=tempfile.mkdtemp()
+    os.environ['DB_URI']=f"sqlite:///{os.path.join(directory,'bench.db')}"
+    from app import create_app
+    from models import Parcel
+    from seed import generate
+    from serializers import eager,serialize_many
+    from encoding import orjson,msgpack,_default,_msgpack_default
+    app=create_app()
+
+    with app.app_context():
+        generate(users=200,parcels=args.parcels,log=lambda message:None,seed=1)
+        parcels=Parcel.query.options(*eager(Parcel)).order_by(Parcel.id.desc()).limit(args.parcels).all()
+        page={"parcels":serialize_many(parcels,Parcel),"next_cursor":None}
+
+    encoders=[
+        ('json indent=2 (before)',lambda:json.dumps(page,indent=2,sort_keys=True).encode()),
+        ('json compact',lambda:json.dumps(page,separators=(',',':'),sort_keys=True).encode()),
+    ]
+    if orjson is not None:
+        encoders.append(('orjson',lambda:orjson.dumps(page,default=_default,option=orjson.OPT_SORT_KEYS|orjson.OPT_NON_STR_KEYS)))
+    if msgpack is not None:
+        encoders.append(('msgpack',lambda:msgpack.packb(page,default=_msgpack_default,use_bin_type=True)))
+
+    print(f"{len(page['parcels'])} parcels, best of {args.repeat}")
+    print(f"{'encoder':<24}{'encode ms':>10}{'bytes':>10}{'gzip':>9}{'gzip ms':>9}{'deflate':>9}{'deflate ms':>11}")
+    for name,encode in encoders:
+        elapsed,body=_best(encode,args.repeat)
+        sizes=[]
+        for wbits in (31,15):
+            def compress():
+                compressor=zlib.compressobj(args.level,zlib.DEFLATED,wbits)
+                return compressor.compress(body)+compressor.flush()
+            compress_time,compressed=_best(compress,args.repeat)
+            sizes+=[len(compressed),compress_time]
+        print(f"{name:<24}{elapsed*1000:>10.2f}{len(body):>10}{sizes[0]:>9}{sizes[1]*1000:>9.2f}{sizes[2]:>9}{sizes[3]*1000:>11.2f}")
+
+
+if __name__=='__main__':
+    main()
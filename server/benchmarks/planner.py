@@ -0,0 +1,108 @@
+"""Benchmark of the load planner.
+
+Run from the server directory:
+
+    python -m benchmarks.planner --parcels 50000 --vehicles 300
+
+Times plan_loads() on its own, then POST /locations/<id>/plan end to end against a
+throwaway SQLite database, first as a dry run and then with the bulk UPDATE and event log.
+Each of the --repeat runs seeds a fresh database and the budgets are checked against the
+fastest of them, a single run on a busy machine can take a few hundred ms longer.
+
+The budgets are set from what the defaults (50k parcels, 300 vehicles) achieve on a single
+core, at best of 3, with some headroom: plan_loads() takes 100-110 ms against --max-plan-ms
+200, the dry run 265-315 ms against --max-dry-run-ms 400, and the plan with its writes
+770-800 ms against --max-ms 900. The exit status is 1 when any of them is over its budget.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from array import array
+
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--parcels',type=int,default=50000)
+    parser.add_argument('--vehicles',type=int,default=300)
+    parser.add_argument('--seed',type=int,default=1)
+    parser.add_argument('--repeat',type=int,default=3,help="runs to take the fastest of")
+    parser.add_argument('--max-plan-ms',type=float,default=200,help="fail when plan_loads() is slower")
+    parser.add_argument('--max-dry-run-ms',type=float,default=400,help="fail when the dry run is slower")
+    parser.add_argument('--max-ms',type=float,default=900,help="fail when the plan with its writes is slower")
+    args=parser.parse_args()
+
+    best={}
+    for _ in range(args.repeat):
+        with tempfile.TemporaryDirectory() as directory:
+            for name,elapsed in run(args,directory).items():
+                best[name]=min(elapsed,best.get(name,elapsed))
+    budgets=(('plan_loads()',args.max_plan_ms),('POST plan?dry_run=1',args.max_dry_run_ms),('POST plan',args.max_ms))
+    over=[f"{name} took {best[name]:.1f} ms at best, over its {budget:.0f} ms budget"
+          for name,budget in budgets if best[name]>budget]
+    for message in over:
+        print(message)
+    if over:
+        sys.exit(1)
+
+
+def run(args,directory):
+    """Seed a database in directory and time the planner, returns the ms each step took."""
+    os.environ['DB_URI']=f"sqlite:///{os.path.join(directory,'bench.db')}"
+    from app import create_app
+    from models import db,User,Parcel,Vehicle,Location
+    from planner import plan_loads
+    from sqlalchemy import insert
+    app=create_app({"RESPONSE_CACHE_PATH":os.path.join(directory,'response-cache.db')})
+
+    random.seed(args.seed)
+    weights=array('d',(round(random.uniform(0.5,60),1) for _ in range(args.parcels)))
+    #enough room for roughly 90% of the weight, so both the packing and the leftovers get exercised
+    average=sum(weights)*0.9/args.vehicles
+    capacities=array('d',(round(random.uniform(0.8,1.2)*average) for _ in range(args.vehicles)))
+
+    started=time.perf_counter()
+    assignment,_=plan_loads(weights,capacities)
+    elapsed=time.perf_counter()-started
+    placed=sum(1 for slot in assignment if slot>=0)
+    print(f"plan_loads: {args.parcels} parcels into {args.vehicles} vehicles in {elapsed*1000:.1f} ms ({placed} placed)")
+    timings={'plan_loads()':elapsed*1000}
+
+    with app.app_context():
+        db.create_all()
+        admin=User(name='bench',phone_number='0700000000',email='bench@example.com',role='admin')
+        admin.set_password('benchmark')
+        db.session.add(admin)
+        location=Location(origin='Nairobi',destination='Mombasa',cost_per_kg=10)
+        db.session.add(location)
+        db.session.commit()
+        db.session.execute(insert(Vehicle),[{
+            "number_plate":f"KBX {index}","capacity":capacity,"driver_name":"driver","driver_phone":"0700000001",
+            "status":"empty","location_id":location.id
+        } for index,capacity in enumerate(capacities)])
+        db.session.execute(insert(Parcel),[{
+            "name":"parcel","description":"benchmark","tracking_number":f"BENCH{index}","weight":weight,
+            "status":"pending","shipping_cost":weight*10,"location_id":location.id
+        } for index,weight in enumerate(weights)])
+        db.session.commit()
+        location_id=location.id
+
+    client=app.test_client()
+    response=client.post('/auth/login',json={"phone_number":"0700000000","password":"benchmark"})
+    headers={"Authorization":f"Bearer {response.get_json()['tokens']['access_token']}"}
+
+    for name,url in (('POST plan?dry_run=1',f'/locations/{location_id}/plan?dry_run=1'),
+                     ('POST plan',f'/locations/{location_id}/plan')):
+        started=time.perf_counter()
+        response=client.post(url,headers=headers)
+        timings[name]=(time.perf_counter()-started)*1000
+        body=response.get_json()
+        print(f"POST {url}: {timings[name]:.1f} ms, status {response.status_code}, "
+              f"{body['assigned']} assigned, {body['unassigned']} left over")
+    return timings
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark of the time from process start to the first served request.
+
+Run from the server directory:
+
+    python -m benchmarks.startup --runs 10 --workers 4 --max-ms 1500
+
+Seeds a throwaway SQLite database, then measures two ways a worker comes up:
+
+cold       a new Python process imports app, calls create_app() and answers --path through
+           the test client, timed from just before the process is spawned, with the import,
+           create_app() and first request split out.
+preloaded  one process builds the app the way wsgi.py does under gunicorn --preload and forks
+           --workers children, each timed from the fork to its first answered request.
+
+Every run gets its own empty response cache in a temporary directory, removed afterwards, so
+no run answers --path from what an earlier one cached. Medians over --runs are reported. With
+--max-ms the exit status is 1 when the median cold start is slower than that.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SEED='''
+import os
+from app import create_app
+from seed import generate
+app=create_app({"RESPONSE_CACHE_PATH":os.environ['STARTUP_RESPONSE_CACHE']})
+with app.app_context():
+    generate(users=200,parcels=2000,seed=1,log=lambda line:None)
+print("{}")
+'''
+
+COLD='''
+import json,os,sys,time
+started=float(os.environ['STARTUP_STARTED'])
+interpreter=time.time()
+from app import create_app
+imported=time.time()
+app=create_app({"RESPONSE_CACHE_PATH":os.environ['STARTUP_RESPONSE_CACHE']})
+created=time.time()
+status=app.test_client().get(sys.argv[1]).status_code
+served=time.time()
+print(json.dumps({"interpreter":interpreter-started,"import":imported-interpreter,"create_app":created-imported,
+                  "first_request":served-created,"total":served-started,"status":status}))
+'''
+
+PRELOADED='''
+import gc,json,os,sys,time
+from app import create_app
+app=create_app({"RESPONSE_CACHE_PATH":os.environ['STARTUP_RESPONSE_CACHE']})
+gc.freeze()
+path,workers=sys.argv[1],int(sys.argv[2])
+read,write=os.pipe()
+for _ in range(workers):
+    forked=time.time()
+    if os.fork()==0:
+        status=app.test_client().get(path).status_code
+        os.write(write,(json.dumps({"first_request":time.time()-forked,"status":status})+"\\n").encode())
+        os._exit(0)
+for _ in range(workers):
+    os.wait()
+os.close(write)
+with os.fdopen(read) as lines:
+    print(json.dumps([json.loads(line) for line in lines]))
+'''
+
+
+def _run(script,*args,env):
+    with tempfile.TemporaryDirectory() as instance:
+        env=dict(env,STARTUP_RESPONSE_CACHE=os.path.join(instance,'response-cache.db'),STARTUP_STARTED=repr(time.time()))
+        result=subprocess.run([sys.executable,'-c',script,*map(str,args)],env=env,capture_output=True,text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if result.returncode:
+        sys.exit(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs',type=int,default=10)
+    parser.add_argument('--workers',type=int,default=4)
+    parser.add_argument('--path',default='/locations')
+    parser.add_argument('--max-ms',type=float,default=None,help="fail when the median cold start is slower")
+    args=parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env=dict(os.environ,DB_URI=f"sqlite:///{os.path.join(directory,'bench.db')}")
+        _run(SEED,env=env)
+        cold=[_run(COLD,args.path,env=env) for _ in range(args.runs)]
+        preloaded=[worker for _ in range(args.runs) for worker in _run(PRELOADED,args.path,args.workers,env=env)]
+    statuses={run['status'] for run in cold+preloaded}
+
+    print(f"GET {args.path}, median of {args.runs} runs, statuses {sorted(statuses)}")
+    print(f"{'cold start':<24}{'ms':>10}")
+    for stage in ('interpreter','import','create_app','first_request','total'):
+        print(f"  {stage:<22}{statistics.median(run[stage] for run in cold)*1000:>10.1f}")
+    print(f"{'preloaded worker':<24}{'ms':>10}")
+    print(f"  {'fork to first request':<22}{statistics.median(run['first_request'] for run in preloaded)*1000:>10.1f}")
+
+    total=statistics.median(run['total'] for run in cold)*1000
+    if args.max_ms is not None and total>args.max_ms:
+        print(f"cold start {total:.1f} ms is over --max-ms {args.max_ms:.1f}")
+        sys.exit(1)
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,51 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+_MISSING=object()
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire ttl seconds after they were set."""
+
+    def __init__(self,maxsize=1024,ttl=60,timer=time.monotonic):
+        self.maxsize=maxsize
+        self.ttl=ttl
+        self.timer=timer
+        self._data=OrderedDict()
+        self._lock=Lock()
+
+    def get(self,key,default=None):
+        with self._lock:
+            entry=self._data.get(key,_MISSING)
+            if entry is _MISSING:
+                return default
+            value,expires_at=entry
+            if expires_at<=self.timer():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self,key,value,ttl=None):
+        expires_at=self.timer()+(self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key]=(value,expires_at)
+            self._data.move_to_end(key)
+            while len(self._data)>self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self,key,default=None):
+        with self._lock:
+            entry=self._data.pop(key,_MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self,key):
+        return self.get(key,_MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,154 @@
+import zlib
+from datetime import date,time
+from decimal import Decimal
+from uuid import UUID
+from flask import current_app,request,has_request_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson=None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack=None
+
+JSON_MIMETYPE='application/json'
+MSGPACK_MIMETYPES=('application/msgpack','application/x-msgpack')
+COMPRESSIBLE=(JSON_MIMETYPE,'application/x-ndjson','text/')+MSGPACK_MIMETYPES
+
+
+def _default(value):
+    if isinstance(value,Decimal):
+        return str(value)
+    if hasattr(value,'__html__'):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _msgpack_default(value):
+    if isinstance(value,(date,time)):
+        return value.isoformat()
+    if isinstance(value,UUID):
+        return str(value)
+    return _default(value)
+
+
+def negotiated_mimetype():
+    """application/json, or the msgpack type when the client prefers it and msgpack is installed."""
+    if msgpack is None or not has_request_context():
+        return JSON_MIMETYPE
+    return request.accept_mimetypes.best_match((JSON_MIMETYPE,)+MSGPACK_MIMETYPES,default=JSON_MIMETYPE)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider with orjson doing the work when it is installed.
+
+    Every make_response(dict) and get_json() in the app goes through here. Output is compact
+    with sorted keys, datetimes come out as ISO 8601, and a client that sends
+    Accept: application/msgpack gets msgpack instead when msgpack is installed. Without
+    orjson this is the stock provider.
+    """
+    compact=True
+
+    def _options(self):
+        options=orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options|=orjson.OPT_SORT_KEYS
+        if self.compact is False:
+            options|=orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self,obj,**kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj,**kwargs)
+        return orjson.dumps(obj,default=_default,option=self._options()).decode()
+
+    def loads(self,s,**kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s,**kwargs)
+        return orjson.loads(s)
+
+    def response(self,*args,**kwargs):
+        obj=self._prepare_response_obj(args,kwargs)
+        mimetype=negotiated_mimetype()
+        if mimetype!=JSON_MIMETYPE:
+            body=msgpack.packb(obj,default=_msgpack_default,use_bin_type=True)
+        elif orjson is not None:
+            body=orjson.dumps(obj,default=_default,option=self._options()|orjson.OPT_APPEND_NEWLINE)
+        else:
+            return super().response(obj)
+        response=self._app.response_class(body,mimetype=mimetype)
+        if msgpack is not None:
+            response.vary.add('Accept')
+        return response
+
+
+def output(data,code,headers=None):
+    """flask_restful representation for resources that return plain data."""
+    response=current_app.json.response(data)
+    response.status_code=code
+    response.headers.extend(headers or {})
+    return response
+
+
+REPRESENTATIONS={JSON_MIMETYPE:output}
+if msgpack is not None:
+    REPRESENTATIONS.update((mimetype,output) for mimetype in MSGPACK_MIMETYPES)
+
+
+class Compression:
+    """gzip or deflate response bodies of at least COMPRESS_MIN_SIZE bytes for clients that accept it.
+
+    Streamed responses (the parcel export, event streams) and bodies that already carry a
+    Content-Encoding are left alone, they handle their own.
+    """
+
+    def __init__(self,app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self,app):
+        app.config.setdefault('COMPRESS_MIN_SIZE',1024)
+        app.config.setdefault('COMPRESS_LEVEL',6)
+        self.min_size=app.config['COMPRESS_MIN_SIZE']
+        self.level=app.config['COMPRESS_LEVEL']
+        app.after_request(self._compress)
+        app.extensions['compression']=self
+
+    def negotiate(self):
+        """gzip or deflate, whichever the request accepts first, None when it takes neither."""
+        return request.accept_encodings.best_match(('gzip','deflate'))
+
+    def encode(self,body,mimetype):
+        """(body, encoding) with body compressed for this request, encoding None when it is left as it is."""
+        encoding=self.negotiate()
+        if encoding is None or len(body)<self.min_size or not (mimetype or '').startswith(COMPRESSIBLE):
+            return body,None
+        #wbits 31 writes a gzip wrapper, 15 the zlib one HTTP calls deflate
+        compressor=zlib.compressobj(self.level,zlib.DEFLATED,31 if encoding=='gzip' else 15)
+        return compressor.compress(body)+compressor.flush(),encoding
+
+    def _compress(self,response):
+        if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+            return response
+        if response.status_code<200 or response.status_code in (204,304) or request.method=='HEAD':
+            return response
+        if not (response.mimetype or '').startswith(COMPRESSIBLE):
+            return response
+        response.vary.add('Accept-Encoding')
+        body,encoding=self.encode(response.get_data(),response.mimetype)
+        if encoding is None:
+            return response
+        response.set_data(body)
+        response.headers['Content-Encoding']=encoding
+        #the compressed bytes differ from what a strong ETag promised
+        etag,weak=response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag,weak=True)
+        return response
+
+
+compression=Compression()
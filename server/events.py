@@ -0,0 +1,205 @@
+import json
+import queue
+import threading
+from collections import defaultdict
+from models import db,Parcel,ParcelEvent,local_now
+from flask import Blueprint,request,make_response,Response
+from flask_restful import Api, Resource
+from flask_jwt_extended import jwt_required
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event,inspect,insert,select,literal
+from auth import allow
+from pagination import PaginationError,page_size,encode_cursor,decode_cursor,page
+from serializers import DATETIME_FORMAT,serialize,serialize_many
+
+events_bp = Blueprint('events_bp',__name__)
+api=Api(events_bp)
+
+TRACKED=('status','vehicle_id','location_id')
+SUBSCRIBER_QUEUE_SIZE=100
+KEEPALIVE_SECONDS=15
+
+
+class Broker:
+    """In-process pub/sub. Each subscriber is a bounded queue, publishing never blocks on a slow reader."""
+
+    def __init__(self):
+        self._subscribers=defaultdict(set)
+        self._lock=threading.Lock()
+
+    def subscribe(self,key):
+        subscriber=queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[key].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self,key,subscriber):
+        with self._lock:
+            subscribers=self._subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[key]
+
+    def subscribed(self):
+        with self._lock:
+            return set(self._subscribers)
+
+    def publish(self,key,message):
+        with self._lock:
+            subscribers=list(self._subscribers.get(key,()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                pass
+
+
+broker=Broker()
+
+
+# Events are written in the same flush as the parcel change and published once the
+# transaction commits, so subscribers never see a change that was rolled back.
+
+def _has_changed(parcel):
+    attrs=inspect(parcel).attrs
+    for name in TRACKED:
+        history=attrs[name].history
+        if history.added and list(history.added)!=list(history.deleted):
+            return True
+    return False
+
+
+@event.listens_for(Session,'before_flush')
+def _record_parcel_events(session,flush_context,instances):
+    for parcel in session.new:
+        if isinstance(parcel,Parcel):
+            status=parcel.status if parcel.status is not None else Parcel.__table__.c.status.default.arg
+            session.add(ParcelEvent(parcel=parcel,status=status,vehicle_id=parcel.vehicle_id,location_id=parcel.location_id))
+    for parcel in session.dirty:
+        if isinstance(parcel,Parcel) and _has_changed(parcel):
+            session.add(ParcelEvent(parcel=parcel,status=parcel.status,vehicle_id=parcel.vehicle_id,location_id=parcel.location_id))
+
+
+@event.listens_for(Session,'after_flush')
+def _collect_parcel_events(session,flush_context):
+    pending=[serialize(instance) for instance in session.new if isinstance(instance,ParcelEvent)]
+    if pending:
+        session.info.setdefault('parcel_events',[]).extend(pending)
+
+
+@event.listens_for(Session,'after_commit')
+def _publish_parcel_events(session):
+    for message in session.info.pop('parcel_events',()):
+        broker.publish(message['parcel_id'],message)
+
+
+@event.listens_for(Session,'after_rollback')
+def _discard_parcel_events(session):
+    session.info.pop('parcel_events',None)
+
+
+def record_snapshots(*criteria):
+    """Log the current state of every parcel matching criteria, for changes made with bulk statements."""
+    columns=('parcel_id','status','vehicle_id','location_id','created_at')
+    created_at=local_now()
+    states=select(Parcel.id,Parcel.status,Parcel.vehicle_id,Parcel.location_id,literal(created_at,db.DateTime))\
+        .where(*criteria)
+    statement=insert(ParcelEvent).from_select(columns,states)
+    #only parcels someone is watching need a message, bulk changes can touch tens of thousands
+    watched=broker.subscribed()
+    if not watched:
+        return db.session.execute(statement).rowcount
+    rows=db.session.execute(statement.returning(ParcelEvent.id,*[getattr(ParcelEvent,column) for column in columns[:-1]])).all()
+    created_at=created_at.strftime(DATETIME_FORMAT)
+    db.session.info.setdefault('parcel_events',[]).extend({
+        "id":event_id,
+        "parcel_id":parcel_id,
+        "status":status,
+        "vehicle_id":vehicle_id,
+        "location_id":location_id,
+        "created_at":created_at
+    } for event_id,parcel_id,status,vehicle_id,location_id in rows if parcel_id in watched)
+    return len(rows)
+
+
+class ParcelEvents(Resource):
+    @jwt_required()
+    @allow(['admin','customer_service','customer'])
+    def get(self,id):
+        try:
+            limit=page_size(request.args)
+            cursor=decode_cursor(request.args.get('cursor'))
+            after=int(cursor[0]) if cursor else None
+        except PaginationError as error:
+            return make_response({
+                "error":str(error)
+            },400)
+        except (TypeError,ValueError):
+            return make_response({
+                "error":"Invalid cursor"
+            },400)
+
+        query=ParcelEvent.query.filter_by(parcel_id=id)
+        if after is not None:
+            query=query.filter(ParcelEvent.id>after)
+        events=query.order_by(ParcelEvent.id).limit(limit+1).all()
+        if not events and not cursor and db.session.get(Parcel,id) is None:
+            return make_response({
+                "error":"Parcel not found"
+            },400)
+        events,next_cursor=page(events,limit,lambda parcel_event:encode_cursor(parcel_event.id))
+
+        return make_response({
+            "events":serialize_many(events,ParcelEvent),
+            "next_cursor":next_cursor
+        },200)
+
+
+def _sse(message):
+    return f"id: {message['id']}\nevent: parcel_event\ndata: {json.dumps(message)}\n\n"
+
+
+class ParcelEventStream(Resource):
+    @jwt_required()
+    @allow(['admin','customer_service','customer'])
+    def get(self,id):
+        if db.session.get(Parcel,id) is None:
+            return make_response({
+                "error":"Parcel not found"
+            },400)
+
+        subscriber=broker.subscribe(id)
+        #a reconnecting EventSource sends the last id it saw, replay what it missed from the log
+        missed=[]
+        last_event_id=request.headers.get('Last-Event-ID',type=int)
+        if last_event_id is not None:
+            missed=serialize_many(ParcelEvent.query.filter(ParcelEvent.parcel_id==id,ParcelEvent.id>last_event_id)
+                                  .order_by(ParcelEvent.id).all(),ParcelEvent)
+
+        def stream():
+            try:
+                yield "retry: 5000\n\n"
+                last_sent=last_event_id or 0
+                for message in missed:
+                    last_sent=message['id']
+                    yield _sse(message)
+                while True:
+                    try:
+                        message=subscriber.get(timeout=KEEPALIVE_SECONDS)
+                    except queue.Empty:
+                        yield ": keepalive\n\n"
+                        continue
+                    if message['id']>last_sent:
+                        last_sent=message['id']
+                        yield _sse(message)
+            finally:
+                broker.unsubscribe(id,subscriber)
+
+        return Response(stream(),mimetype='text/event-stream',headers={
+            "Cache-Control":"no-cache",
+            "X-Accel-Buffering":"no"
+        })
+
+api.add_resource(ParcelEvents,'/parcels/<int:id>/events')
+api.add_resource(ParcelEventStream,'/parcels/<int:id>/events/stream')
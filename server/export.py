@@ -0,0 +1,145 @@
+import csv
+import io
+import json
+import zlib
+import click
+from models import db,User,Parcel,Location
+from flask import Blueprint,request,make_response,Response,stream_with_context
+from flask.cli import AppGroup
+from flask_restful import Api, Resource
+from flask_jwt_extended import jwt_required
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from auth import allow
+from pagination import PaginationError,parse_datetime
+from serializers import DATETIME_FORMAT
+
+export_bp = Blueprint('export_bp',__name__)
+api=Api(export_bp)
+
+# rows held in memory at a time, on Postgres this is also the server-side cursor's fetch size
+EXPORT_BATCH=2000
+FORMATS={
+    'ndjson':('application/x-ndjson','ndjson'),
+    'csv':('text/csv','csv'),
+}
+
+Sender=aliased(User,name='sender')
+Recipient=aliased(User,name='recipient')
+EXPORT_COLUMNS=(
+    Parcel.id,Parcel.tracking_number,Parcel.name,Parcel.description,Parcel.weight,Parcel.status,
+    Parcel.shipping_cost,Parcel.created_at,Parcel.vehicle_id,
+    Parcel.sender_id,Sender.name.label('sender_name'),Sender.phone_number.label('sender_phone_number'),
+    Sender.email.label('sender_email'),
+    Parcel.recipient_id,Recipient.name.label('recipient_name'),Recipient.phone_number.label('recipient_phone_number'),
+    Recipient.email.label('recipient_email'),
+    Parcel.location_id,Location.origin,Location.destination,Location.cost_per_kg,
+)
+HEADER=[column.key for column in EXPORT_COLUMNS]
+CREATED_AT=HEADER.index('created_at')
+
+
+def ledger(status=None,created_from=None,created_to=None):
+    """Every parcel with its sender, recipient and route, in id order."""
+    query=select(*EXPORT_COLUMNS).select_from(Parcel)\
+        .outerjoin(Sender,Sender.id==Parcel.sender_id)\
+        .outerjoin(Recipient,Recipient.id==Parcel.recipient_id)\
+        .outerjoin(Location,Location.id==Parcel.location_id)
+    if status is not None:
+        query=query.where(Parcel.status==status)
+    if created_from:
+        query=query.where(Parcel.created_at>=created_from)
+    if created_to:
+        query=query.where(Parcel.created_at<created_to)
+    return query.order_by(Parcel.id)
+
+
+def _rows(query):
+    #yield_per streams from a server-side cursor where the driver has one and
+    #keeps only EXPORT_BATCH rows buffered
+    result=db.session.execute(query.execution_options(yield_per=EXPORT_BATCH))
+    for rows in result.partitions():
+        batch=[]
+        for row in rows:
+            row=list(row)
+            if row[CREATED_AT] is not None:
+                row[CREATED_AT]=row[CREATED_AT].strftime(DATETIME_FORMAT)
+            batch.append(row)
+        yield batch
+
+
+def _ndjson(query):
+    for batch in _rows(query):
+        yield ''.join(json.dumps(dict(zip(HEADER,row)),separators=(',',':'))+'\n' for row in batch).encode()
+
+
+def _csv(query):
+    buffer=io.StringIO()
+    writer=csv.writer(buffer)
+    writer.writerow(HEADER)
+    for batch in _rows(query):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def export_chunks(query,format='ndjson',compress=False):
+    """The export as a stream of byte chunks, gzipped on the fly when compress is set."""
+    chunks=_csv(query) if format=='csv' else _ndjson(query)
+    if not compress:
+        yield from chunks
+        return
+    compressor=zlib.compressobj(6,zlib.DEFLATED,31)
+    for chunk in chunks:
+        compressed=compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class ParcelExport(Resource):
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def get(self):
+        args=request.args
+        format=args.get('format','ndjson')
+        if format not in FORMATS:
+            return make_response({
+                "error":"format should be ndjson or csv"
+            },400)
+        try:
+            created_from=parse_datetime(args.get('created_from'),'created_from')
+            created_to=parse_datetime(args.get('created_to'),'created_to')
+        except PaginationError as error:
+            return make_response({
+                "error":str(error)
+            },400)
+
+        mimetype,extension=FORMATS[format]
+        #a listed gzip;q=0 is a refusal, only a positive quality asks for it
+        compress=request.accept_encodings['gzip']>0
+        query=ledger(args.get('status'),created_from,created_to)
+        headers={"Content-Disposition":f"attachment; filename=parcels.{extension}","Vary":"Accept-Encoding"}
+        if compress:
+            headers['Content-Encoding']='gzip'
+        #the generator runs after the view returns, stream_with_context keeps the session alive
+        return Response(stream_with_context(export_chunks(query,format,compress)),mimetype=mimetype,headers=headers)
+
+api.add_resource(ParcelExport,'/parcels/export')
+
+
+export_cli=AppGroup('export',help="Bulk data exports.")
+
+
+@export_cli.command('parcels')
+@click.option('--format','format',type=click.Choice(list(FORMATS)),default='ndjson')
+@click.option('--output',type=click.Path(dir_okay=False,writable=True),required=True)
+@click.option('--gzip','compress',is_flag=True,help="Gzip the file as it is written.")
+@click.option('--status',default=None)
+def export_parcels(format,output,compress,status):
+    """Write the parcel ledger to a file without loading it into memory."""
+    with open(output,'wb') as file:
+        for chunk in export_chunks(ledger(status),format,compress):
+            file.write(chunk)
+    print(f"Exported parcels to {output}")
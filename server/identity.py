@@ -0,0 +1,52 @@
+from collections import namedtuple
+from flask_jwt_extended.exceptions import UserLookupError
+from models import User
+from cache import TTLCache
+from serializers import USER_COLUMNS
+
+IDENTITY_CACHE_SIZE=10000
+IDENTITY_CACHE_TTL=60
+
+# a detached snapshot of the columns handlers read off current_user, safe to share between requests
+CachedUser=namedtuple('CachedUser',USER_COLUMNS)
+
+identity_cache=TTLCache(maxsize=IDENTITY_CACHE_SIZE,ttl=IDENTITY_CACHE_TTL)
+
+
+def load_user(user_id):
+    user=identity_cache.get(user_id)
+    if user is None:
+        row=User.query.with_entities(*[getattr(User,column) for column in USER_COLUMNS]).filter_by(id=user_id).first()
+        if row is None:
+            return None
+        user=CachedUser(*row)
+        identity_cache.set(user_id,user)
+    return user
+
+
+def invalidate_user(user_id):
+    identity_cache.pop(user_id)
+
+
+class LazyUser:
+    """What current_user resolves to: the id from the token, the rest loaded on first attribute access.
+
+    allow() only reads the role claim, so handlers that never touch current_user cost no query.
+    """
+    __slots__=('id','_jwt_header','_jwt_data','_user')
+
+    def __init__(self,jwt_header,jwt_data):
+        self.id=jwt_data['sub']
+        self._jwt_header=jwt_header
+        self._jwt_data=jwt_data
+        self._user=None
+
+    def __getattr__(self,name):
+        if self._user is None:
+            self._user=load_user(self.id)
+            if self._user is None:
+                raise UserLookupError("Error loading the user",self._jwt_header,self._jwt_data)
+        return getattr(self._user,name)
+
+    def __repr__(self):
+        return f'<LazyUser {self.id}>'
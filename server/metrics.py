@@ -0,0 +1,200 @@
+import bisect
+import logging
+import re
+import threading
+import time
+from flask import Blueprint,Response,g,request,make_response,has_app_context
+from flask_restful import Api, Resource
+from flask_jwt_extended import verify_jwt_in_request,get_jwt
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger=logging.getLogger(__name__)
+
+metrics_bp = Blueprint('metrics_bp',__name__)
+api=Api(metrics_bp)
+
+# upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS=(0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10)
+# IN lists render one placeholder per value, collapse them so each query shape is one entry
+PLACEHOLDER_LIST=re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*\)')
+
+
+def _label(value):
+    return value.replace('\\','\\\\').replace('"','\\"').replace('\n',' ')
+
+
+class RequestMetrics:
+    """Per-process request and SQL statistics, rendered in the Prometheus text format.
+
+    Every request records its latency in a histogram per resource and method, along with how
+    many SQL statements it ran and how long they took (counted by engine events). Statements
+    are also aggregated by their text, with placeholders instead of values, to list the
+    slowest. Requests slower than METRICS_SLOW_REQUEST_MS are logged with their SQL totals.
+    Each worker keeps its own numbers, Prometheus sums them across scrape targets.
+    """
+
+    def __init__(self,app=None):
+        self._lock=threading.Lock()
+        self.latency={}
+        self.responses={}
+        self.sql={}
+        self.statements={}
+        self._normalized={}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self,app):
+        app.config.setdefault('METRICS_SLOW_REQUEST_MS',500)
+        app.config.setdefault('METRICS_TOP_STATEMENTS',10)
+        app.config.setdefault('METRICS_MAX_STATEMENTS',500)
+        #scrapers on these addresses read /metrics without a token, anyone else needs an admin one.
+        #none by default, behind a local reverse proxy every client would look like 127.0.0.1
+        app.config.setdefault('METRICS_ALLOWED_ADDRESSES',())
+        self.slow_request=app.config['METRICS_SLOW_REQUEST_MS']/1000
+        self.top_statements=app.config['METRICS_TOP_STATEMENTS']
+        self.max_statements=app.config['METRICS_MAX_STATEMENTS']
+        self.allowed_addresses=frozenset(app.config['METRICS_ALLOWED_ADDRESSES'])
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        if not event.contains(Engine,'before_cursor_execute',self._start_statement):
+            event.listen(Engine,'before_cursor_execute',self._start_statement)
+            event.listen(Engine,'after_cursor_execute',self._finish_statement)
+            event.listen(Engine,'handle_error',self._failed_statement)
+        app.extensions['request_metrics']=self
+
+    def _start_request(self):
+        g.metrics_sql=[0,0.0]
+        g.metrics_started=time.perf_counter()
+
+    def _finish_request(self,response):
+        started=g.pop('metrics_started',None)
+        if started is None:
+            return response
+        elapsed=time.perf_counter()-started
+        statements,sql_seconds=g.pop('metrics_sql')
+        key=(request.endpoint or 'unmatched',request.method)
+        bucket=bisect.bisect_left(LATENCY_BUCKETS,elapsed)
+        with self._lock:
+            histogram=self.latency.get(key)
+            if histogram is None:
+                histogram=self.latency[key]=[[0]*(len(LATENCY_BUCKETS)+1),0.0]
+            histogram[0][bucket]+=1
+            histogram[1]+=elapsed
+            status=key+(response.status_code,)
+            self.responses[status]=self.responses.get(status,0)+1
+            totals=self.sql.get(key)
+            if totals is None:
+                totals=self.sql[key]=[0,0.0]
+            totals[0]+=statements
+            totals[1]+=sql_seconds
+        if elapsed>=self.slow_request:
+            logger.warning("Slow request %s %s: %.1f ms, %d SQL statements taking %.1f ms",
+                           request.method,request.full_path.rstrip('?'),elapsed*1000,statements,sql_seconds*1000)
+        return response
+
+    def _start_statement(self,conn,cursor,statement,parameters,context,executemany):
+        conn.info.setdefault('metrics_started',[]).append((context,time.perf_counter()))
+
+    def _failed_statement(self,context):
+        #a statement that raised gets no after_cursor_execute, drop the start time it pushed
+        if context.connection is None:
+            return
+        started=context.connection.info.get('metrics_started')
+        if started and started[-1][0] is context.execution_context:
+            started.pop()
+
+    def _finish_statement(self,conn,cursor,statement,parameters,context,executemany):
+        elapsed=time.perf_counter()-conn.info['metrics_started'].pop()[1]
+        if has_app_context():
+            totals=g.get('metrics_sql')
+            if totals is not None:
+                totals[0]+=1
+                totals[1]+=elapsed
+        normalized=self._normalized.get(statement)
+        if normalized is None:
+            if len(self._normalized)>=4*self.max_statements:
+                self._normalized.clear()
+            normalized=self._normalized[statement]=' '.join(PLACEHOLDER_LIST.sub('(...)',statement).split())
+        statement=normalized
+        with self._lock:
+            stats=self.statements.get(statement)
+            if stats is None:
+                if len(self.statements)>=self.max_statements:
+                    #full: the cheapest statement seen so far makes room
+                    cheapest=min(self.statements,key=lambda text:self.statements[text][1])
+                    if self.statements[cheapest][1]>=elapsed:
+                        return
+                    del self.statements[cheapest]
+                stats=self.statements[statement]=[0,0.0,0.0]
+            stats[0]+=1
+            stats[1]+=elapsed
+            if elapsed>stats[2]:
+                stats[2]=elapsed
+
+    def render(self):
+        with self._lock:
+            latency={key:([*counts],total) for key,(counts,total) in self.latency.items()}
+            responses=dict(self.responses)
+            sql={key:tuple(totals) for key,totals in self.sql.items()}
+            slowest=sorted(self.statements.items(),key=lambda item:item[1][1],reverse=True)[:self.top_statements]
+        lines=[
+            "# HELP http_request_duration_seconds Request latency by resource and method.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (resource,method),(counts,total) in sorted(latency.items()):
+            labels=f'resource="{_label(resource)}",method="{method}"'
+            cumulative=0
+            for bound,count in zip(LATENCY_BUCKETS+('+Inf',),counts):
+                cumulative+=count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {total}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {cumulative}')
+        lines+=[
+            "# HELP http_responses_total Responses by resource, method and status code.",
+            "# TYPE http_responses_total counter",
+        ]
+        for (resource,method,status),count in sorted(responses.items()):
+            lines.append(f'http_responses_total{{resource="{_label(resource)}",method="{method}",status="{status}"}} {count}')
+        lines+=[
+            "# HELP http_request_sql_statements_total SQL statements run while serving each resource and method.",
+            "# TYPE http_request_sql_statements_total counter",
+        ]
+        for (resource,method),(statements,_) in sorted(sql.items()):
+            lines.append(f'http_request_sql_statements_total{{resource="{_label(resource)}",method="{method}"}} {statements}')
+        lines+=[
+            "# HELP http_request_sql_seconds_total Time spent in SQL while serving each resource and method.",
+            "# TYPE http_request_sql_seconds_total counter",
+        ]
+        for (resource,method),(_,seconds) in sorted(sql.items()):
+            lines.append(f'http_request_sql_seconds_total{{resource="{_label(resource)}",method="{method}"}} {seconds}')
+        for name,index,kind,description in (
+            ('sql_statement_calls_total',0,'counter','Calls of the statements with the most total time.'),
+            ('sql_statement_seconds_total',1,'counter','Total time of the statements with the most total time.'),
+            ('sql_statement_seconds_max',2,'gauge','Slowest single call of the statements with the most total time.'),
+        ):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for statement,stats in slowest:
+                lines.append(f'{name}{{statement="{_label(statement)}"}} {stats[index]}')
+        return '\n'.join(lines)+'\n'
+
+
+request_metrics=RequestMetrics()
+
+
+class Metrics(Resource):
+    def get(self):
+        #the statement texts show the schema and queries, keep them from the public
+        if request.remote_addr not in request_metrics.allowed_addresses:
+            if verify_jwt_in_request(optional=True) is None:
+                return make_response({
+                    "error":"Missing access token"
+                },401)
+            if get_jwt().get('role')!='admin':
+                return make_response({
+                    "error":"Access forbidden"
+                },403)
+        return Response(request_metrics.render(),mimetype='text/plain; version=0.0.4')
+
+api.add_resource(Metrics,'/metrics')
@@ -0,0 +1,67 @@
+"""parcel summaries
+
+Revision ID: 16b9a3ba017b
+Revises: 1c5457cb4a69
+Create Date: 2026-10-18 16:17:19.818330
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '16b9a3ba017b'
+down_revision = '1c5457cb4a69'
+branch_labels = None
+depends_on = None
+
+
+# fill the summaries from the parcels already in the database, same GROUP BYs as `flask stats rebuild`
+BACKFILL = [
+    "INSERT INTO status_summaries (status, parcels, weight) "
+    "SELECT status, count(*), coalesce(sum(weight), 0) FROM parcels GROUP BY status",
+    "INSERT INTO route_summaries (location_id, parcels, weight, revenue) "
+    "SELECT parcels.location_id, count(*), coalesce(sum(parcels.weight), 0), coalesce(sum(parcels.shipping_cost), 0) "
+    "FROM parcels JOIN locations ON locations.id = parcels.location_id GROUP BY parcels.location_id",
+    "INSERT INTO vehicle_day_summaries (vehicle_id, day, parcels, weight) "
+    "SELECT parcels.vehicle_id, date(parcels.created_at), count(*), coalesce(sum(parcels.weight), 0) "
+    "FROM parcels JOIN vehicles ON vehicles.id = parcels.vehicle_id WHERE parcels.created_at IS NOT NULL "
+    "GROUP BY parcels.vehicle_id, date(parcels.created_at)",
+]
+
+
+def upgrade():
+    op.create_table('route_summaries',
+    sa.Column('location_id', sa.Integer(), nullable=False),
+    sa.Column('parcels', sa.Integer(), nullable=False),
+    sa.Column('weight', sa.Float(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('location_id')
+    )
+    op.create_table('status_summaries',
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('parcels', sa.Integer(), nullable=False),
+    sa.Column('weight', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('status')
+    )
+    op.create_table('vehicle_day_summaries',
+    sa.Column('vehicle_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('parcels', sa.Integer(), nullable=False),
+    sa.Column('weight', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('vehicle_id', 'day')
+    )
+    with op.batch_alter_table('vehicle_day_summaries', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_vehicle_day_summaries_day'), ['day'], unique=False)
+
+    for statement in BACKFILL:
+        op.execute(statement)
+
+
+def downgrade():
+    with op.batch_alter_table('vehicle_day_summaries', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_vehicle_day_summaries_day'))
+
+    op.drop_table('vehicle_day_summaries')
+    op.drop_table('status_summaries')
+    op.drop_table('route_summaries')
@@ -0,0 +1,58 @@
+"""user directory search
+
+Revision ID: 1c5457cb4a69
+Revises: 1ebeb44dc3f9
+Create Date: 2026-10-18 16:13:07.481590
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c5457cb4a69'
+down_revision = '1ebeb44dc3f9'
+branch_labels = None
+depends_on = None
+
+
+USERS_FTS_SQLITE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(name, content='users', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF name ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO users_fts(rowid, name) VALUES (new.id, new.name); END",
+    "INSERT INTO users_fts(users_fts) VALUES ('rebuild')",
+]
+USERS_FTS_POSTGRESQL = [
+    "CREATE INDEX IF NOT EXISTS ix_users_fts ON users USING gin (to_tsvector('simple', coalesce(name, '')))",
+]
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_role'), ['role'], unique=False)
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in USERS_FTS_SQLITE:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        for statement in USERS_FTS_POSTGRESQL:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for trigger in ('users_fts_insert', 'users_fts_delete', 'users_fts_update'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS users_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_users_fts")
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_role'))
@@ -0,0 +1,62 @@
+"""index foreign keys and filter columns
+
+Revision ID: 1ebeb44dc3f9
+Revises: ca498a417ee3
+Create Date: 2026-10-18 16:10:52.130952
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1ebeb44dc3f9'
+down_revision = 'ca498a417ee3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_name'), ['name'], unique=False)
+
+    with op.batch_alter_table('vehicles', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_vehicles_location_id'), ['location_id'], unique=False)
+
+    with op.batch_alter_table('parcels', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_parcels_sender_id'), ['sender_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_parcels_recipient_id'), ['recipient_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_parcels_created_at'), ['created_at'], unique=False)
+        batch_op.create_index('ix_parcels_status_created_at', ['status', 'created_at'], unique=False)
+        batch_op.create_index('ix_parcels_vehicle_id_status', ['vehicle_id', 'status'], unique=False)
+        batch_op.create_index('ix_parcels_location_id_vehicle_id', ['location_id', 'vehicle_id'], unique=False)
+
+    with op.batch_alter_table('user_parcel_assignments', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_parcel_assignments_user_id'), ['user_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_user_parcel_assignments_parcel_id'), ['parcel_id'], unique=False)
+
+    with op.batch_alter_table('token_blocklist', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_token_blocklist_jti'), ['jti'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('token_blocklist', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_token_blocklist_jti'))
+
+    with op.batch_alter_table('user_parcel_assignments', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_parcel_assignments_parcel_id'))
+        batch_op.drop_index(batch_op.f('ix_user_parcel_assignments_user_id'))
+
+    with op.batch_alter_table('parcels', schema=None) as batch_op:
+        batch_op.drop_index('ix_parcels_location_id_vehicle_id')
+        batch_op.drop_index('ix_parcels_vehicle_id_status')
+        batch_op.drop_index('ix_parcels_status_created_at')
+        batch_op.drop_index(batch_op.f('ix_parcels_created_at'))
+        batch_op.drop_index(batch_op.f('ix_parcels_recipient_id'))
+        batch_op.drop_index(batch_op.f('ix_parcels_sender_id'))
+
+    with op.batch_alter_table('vehicles', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_vehicles_location_id'))
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_name'))
@@ -0,0 +1,38 @@
+"""add parcel events
+
+Revision ID: ca498a417ee3
+Revises: 3ff00a98e71c
+Create Date: 2026-10-18 16:10:51.290758
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ca498a417ee3'
+down_revision = '3ff00a98e71c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('parcel_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('vehicle_id', sa.Integer(), nullable=True),
+    sa.Column('location_id', sa.Integer(), nullable=True),
+    sa.Column('parcel_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['parcel_id'], ['parcels.id'], name=op.f('fk_parcel_events_parcel_id_parcels')),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('parcel_events', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_parcel_events_parcel_id'), ['parcel_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('parcel_events', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_parcel_events_parcel_id'))
+
+    op.drop_table('parcel_events')
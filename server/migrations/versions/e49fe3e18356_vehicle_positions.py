@@ -0,0 +1,37 @@
+"""vehicle positions
+
+Revision ID: e49fe3e18356
+Revises: a6e8fbfa82fa
+Create Date: 2026-10-18 16:49:36.093368
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e49fe3e18356'
+down_revision = 'a6e8fbfa82fa'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('vehicle_positions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('vehicle_id', sa.Integer(), nullable=False),
+    sa.Column('recorded_at', sa.DateTime(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.Column('speed', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('vehicle_positions', schema=None) as batch_op:
+        batch_op.create_index('ix_vehicle_positions_vehicle_id_recorded_at', ['vehicle_id', 'recorded_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('vehicle_positions', schema=None) as batch_op:
+        batch_op.drop_index('ix_vehicle_positions_vehicle_id_recorded_at')
+
+    op.drop_table('vehicle_positions')
@@ -0,0 +1,65 @@
+"""parcel search
+
+Revision ID: ed6628ea4cfd
+Revises: e49fe3e18356
+Create Date: 2026-10-18 17:05:12.418230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ed6628ea4cfd'
+down_revision = 'e49fe3e18356'
+branch_labels = None
+depends_on = None
+
+
+PARCEL_VALUES = (
+    "new.id, new.name, new.description, new.tracking_number, "
+    "(SELECT name FROM users WHERE id = new.sender_id), (SELECT name FROM users WHERE id = new.recipient_id)"
+)
+PARCELS_FTS_SQLITE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS parcels_fts USING fts5(name, description, tracking_number, sender, recipient, tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS parcels_fts_insert AFTER INSERT ON parcels BEGIN "
+    f"INSERT INTO parcels_fts(rowid, name, description, tracking_number, sender, recipient) SELECT {PARCEL_VALUES}; END",
+    "CREATE TRIGGER IF NOT EXISTS parcels_fts_delete AFTER DELETE ON parcels BEGIN "
+    "DELETE FROM parcels_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS parcels_fts_update AFTER UPDATE OF name, description, tracking_number, sender_id, recipient_id ON parcels BEGIN "
+    "DELETE FROM parcels_fts WHERE rowid = old.id; "
+    f"INSERT INTO parcels_fts(rowid, name, description, tracking_number, sender, recipient) SELECT {PARCEL_VALUES}; END",
+    "CREATE TRIGGER IF NOT EXISTS parcels_fts_party AFTER UPDATE OF name ON users BEGIN "
+    "UPDATE parcels_fts SET sender = new.name WHERE rowid IN (SELECT id FROM parcels WHERE sender_id = new.id); "
+    "UPDATE parcels_fts SET recipient = new.name WHERE rowid IN (SELECT id FROM parcels WHERE recipient_id = new.id); END",
+    "INSERT INTO parcels_fts(rowid, name, description, tracking_number, sender, recipient) "
+    "SELECT parcels.id, parcels.name, parcels.description, parcels.tracking_number, sender.name, recipient.name FROM parcels "
+    "LEFT JOIN users AS sender ON sender.id = parcels.sender_id LEFT JOIN users AS recipient ON recipient.id = parcels.recipient_id",
+]
+PARCELS_FTS_POSTGRESQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_parcels_fts ON parcels USING gin "
+    "((coalesce(name, '') || ' ' || coalesce(description, '') || ' ' || coalesce(tracking_number, '')) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_parcels_fts_users ON users USING gin (name gin_trgm_ops)",
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in PARCELS_FTS_SQLITE:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        for statement in PARCELS_FTS_POSTGRESQL:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for trigger in ('parcels_fts_insert', 'parcels_fts_delete', 'parcels_fts_update', 'parcels_fts_party'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS parcels_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_parcels_fts_users")
+        op.execute("DROP INDEX IF EXISTS ix_parcels_fts")
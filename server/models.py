@@ -5,23 +5,29 @@ from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy_serializer import SerializerMixin
 from werkzeug.security import generate_password_hash,check_password_hash
 from datetime import datetime,timezone,timedelta
+from replicas import RoutingSession
 
 
 
 metadata = MetaData(naming_convention={
+    "ix": "ix_%(column_0_label)s",
     "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
 })
-db = SQLAlchemy(metadata=metadata)
+db = SQLAlchemy(metadata=metadata,session_options={"class_":RoutingSession})
+
+
+def local_now():
+    return datetime.now(timezone(timedelta(hours=3)))
 
 
 class User(db.Model,SerializerMixin):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String, nullable=False)
+    name = db.Column(db.String, nullable=False, index=True)
     phone_number = db.Column(db.String, nullable=False, unique=True)
     email = db.Column(db.String, unique=True)
     password = db.Column(db.String, nullable=False)
-    role = db.Column(db.String, nullable=False,default='customer')  # (customers,admin or customer service)
+    role = db.Column(db.String, nullable=False,default='customer', index=True)  # (customers,admin or customer service)
     
     # Relationships
     sent_parcels = db.relationship('Parcel', foreign_keys='Parcel.sender_id', back_populates='sender')
@@ -70,11 +76,11 @@ class Parcel(db.Model,SerializerMixin):
     weight = db.Column(db.Float, nullable=False)
     status = db.Column(db.String, nullable=False, default='Pending')  # (pending,in_transit,delivered)
     shipping_cost = db.Column(db.Float)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone(timedelta(hours=3))))
+    created_at = db.Column(db.DateTime, default=local_now, index=True)
 
     #FOREIGN IDS
-    sender_id = db.Column(db.Integer, db.ForeignKey('users.id'))
-    recipient_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    sender_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+    recipient_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
     location_id=db.Column(db.Integer,db.ForeignKey('locations.id'))
     vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'))
 
@@ -84,8 +90,16 @@ class Parcel(db.Model,SerializerMixin):
     vehicle = db.relationship('Vehicle', back_populates='parcels')
     location=db.relationship('Location',back_populates='parcels')
     customer_service_assignments = db.relationship('UserParcelAssignment', back_populates='parcel', cascade='all, delete-orphan')
+    events = db.relationship('ParcelEvent', back_populates='parcel', cascade='all, delete-orphan', order_by='ParcelEvent.id')
     
-    serialize_rules = ('-customer_service_assignments', '-vehicle', '-location')
+    serialize_rules = ('-customer_service_assignments', '-vehicle', '-location', '-events')
+    
+    #location_id and vehicle_id are covered by the leading column of the composites
+    __table_args__ = (
+        db.Index('ix_parcels_status_created_at', 'status', 'created_at'),
+        db.Index('ix_parcels_vehicle_id_status', 'vehicle_id', 'status'),
+        db.Index('ix_parcels_location_id_vehicle_id', 'location_id', 'vehicle_id'),
+    )
     
    
 
@@ -106,7 +120,7 @@ class Vehicle(db.Model,SerializerMixin):
     status=db.Column(db.String ,default='empty')
     
     #Foreign id
-    location_id=db.Column(db.Integer,db.ForeignKey('locations.id'))
+    location_id=db.Column(db.Integer,db.ForeignKey('locations.id'), index=True)
     
     #Relationships
     parcels = db.relationship('Parcel', back_populates='vehicle')
@@ -145,8 +159,8 @@ class UserParcelAssignment(db.Model,SerializerMixin):
     id = db.Column(db.Integer, primary_key=True)
     
     #FOREIGN ID
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id')) #this is a customer service/admin user
-    parcel_id = db.Column(db.Integer, db.ForeignKey('parcels.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True) #this is a customer service/admin user
+    parcel_id = db.Column(db.Integer, db.ForeignKey('parcels.id'), index=True)
 
     #RELATIONSHIPS
     user = db.relationship('User', back_populates='parcels')
@@ -159,7 +173,71 @@ class UserParcelAssignment(db.Model,SerializerMixin):
         return f'<UserParcelAssignment User: {self.user_id}, Parcel: {self.parcel_id}>'
 
 
+# one row per committed change of a parcel's status, vehicle or location, holding the state it changed to
+class ParcelEvent(db.Model,SerializerMixin):
+    __tablename__ = 'parcel_events'
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=local_now)
+    
+    #state of the parcel after the change, plain ids so history outlives deleted vehicles and locations
+    status = db.Column(db.String, nullable=False)
+    vehicle_id = db.Column(db.Integer)
+    location_id = db.Column(db.Integer)
+    
+    #FOREIGN ID
+    parcel_id = db.Column(db.Integer, db.ForeignKey('parcels.id'), nullable=False, index=True)
+    
+    #RELATIONSHIPS
+    parcel = db.relationship('Parcel', back_populates='events')
+    serialize_rules = ('-parcel',)
+    
+    def __repr__(self):
+        return f'<ParcelEvent Parcel: {self.parcel_id}, {self.status}>'
+
+
+# dashboard totals kept up to date on every parcel write (see stats.py), plain ids like ParcelEvent
+class StatusSummary(db.Model):
+    __tablename__ = 'status_summaries'
+    status = db.Column(db.String, primary_key=True)
+    parcels = db.Column(db.Integer, nullable=False, default=0)
+    weight = db.Column(db.Float, nullable=False, default=0)
+
+
+class RouteSummary(db.Model):
+    __tablename__ = 'route_summaries'
+    location_id = db.Column(db.Integer, primary_key=True)
+    parcels = db.Column(db.Integer, nullable=False, default=0)
+    weight = db.Column(db.Float, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+
+# parcels on each vehicle grouped by the day they were booked
+class VehicleDaySummary(db.Model):
+    __tablename__ = 'vehicle_day_summaries'
+    vehicle_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True, index=True)
+    parcels = db.Column(db.Integer, nullable=False, default=0)
+    weight = db.Column(db.Float, nullable=False, default=0)
+
+
 class TokenBlocklist(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    jti = db.Column(db.String(36), nullable=False)
-    created_at = db.Column(db.DateTime, nullable=False)
\ No newline at end of file
+    jti = db.Column(db.String(36), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+# GPS pings from the drivers' phones, written in bulk by positions.py
+class VehiclePosition(db.Model):
+    __tablename__ = 'vehicle_positions'
+    id = db.Column(db.Integer, primary_key=True)
+    vehicle_id = db.Column(db.Integer, nullable=False)
+    recorded_at = db.Column(db.DateTime, nullable=False)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    speed = db.Column(db.Float)  # km/h as reported by the phone
+
+    __table_args__ = (
+        db.Index('ix_vehicle_positions_vehicle_id_recorded_at', 'vehicle_id', 'recorded_at'),
+    )
+
+    def __repr__(self):
+        return f'<VehiclePosition Vehicle: {self.vehicle_id}, {self.latitude},{self.longitude}>'
@@ -0,0 +1,68 @@
+import base64
+import json
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE=50
+MAX_PAGE_SIZE=200
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def page_size(args,default=DEFAULT_PAGE_SIZE,maximum=MAX_PAGE_SIZE):
+    limit=args.get('limit',default)
+    try:
+        limit=int(limit)
+    except (TypeError,ValueError):
+        raise PaginationError("limit should be a number")
+    if limit<1:
+        raise PaginationError("limit should be at least 1")
+    return min(limit,maximum)
+
+
+# cursors are opaque to clients, they only hand back what we gave them in next_cursor
+def encode_cursor(*values):
+    raw=json.dumps(values,separators=(',',':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        raw=base64.urlsafe_b64decode(cursor+'='*(-len(cursor)%4))
+        values=json.loads(raw)
+    except (ValueError,TypeError):
+        raise PaginationError("Invalid cursor")
+    if not isinstance(values,list) or not values:
+        raise PaginationError("Invalid cursor")
+    return values
+
+
+def parse_fields(args,allowed):
+    fields=args.get('fields')
+    if not fields:
+        return None
+    fields=[field.strip() for field in fields.split(',') if field.strip()]
+    unknown=[field for field in fields if field not in allowed]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def parse_datetime(value,name):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise PaginationError(f"{name} should be an ISO 8601 date or datetime")
+
+
+def page(items,limit,cursor_of):
+    """Split a limit+1 result into the page and the cursor for the next one."""
+    has_more=len(items)>limit
+    items=items[:limit]
+    next_cursor=cursor_of(items[-1]) if has_more else None
+    return items,next_cursor
@@ -0,0 +1,128 @@
+from array import array
+from models import db,Parcel,Vehicle,Location
+from flask import Blueprint,request,make_response
+from flask_restful import Api, Resource
+from flask_jwt_extended import jwt_required
+from sqlalchemy import Table,Column,Integer,MetaData,func,select,insert,delete
+from auth import allow
+from events import record_snapshots
+from stats import count_loaded
+
+planner_bp = Blueprint('planner_bp',__name__)
+api=Api(planner_bp)
+
+# parcels in this state are off the vehicle and no longer count towards its load
+DELIVERED='delivered'
+# a plan's assignments, loaded with one executemany so that the writes after it are each one set-based statement
+plan_table=Table('load_plan',MetaData(),
+                 Column('parcel_id',Integer,primary_key=True),
+                 Column('vehicle_id',Integer,nullable=False),
+                 prefixes=['TEMPORARY'])
+
+
+def plan_loads(weights,capacities):
+    """First-fit-decreasing packing of weights into bins with the given free capacities.
+
+    The free capacities live in an array-backed max segment tree, so finding the first bin
+    that still fits a parcel is a walk down the tree instead of a scan over every vehicle:
+    O(n log m) for n parcels and m vehicles. Returns the bin index per weight (-1 when no
+    bin fits) and the remaining capacity per bin.
+    """
+    bins=len(capacities)
+    assignment=array('l',[-1])*len(weights)
+    if not bins:
+        return assignment,array('d',capacities)
+
+    size=1<<(bins-1).bit_length()
+    tree=array('d',[-1.0])*(2*size)
+    tree[size:size+bins]=array('d',capacities)
+    for node in range(size-1,0,-1):
+        tree[node]=max(tree[2*node],tree[2*node+1])
+
+    for index in sorted(range(len(weights)),key=weights.__getitem__,reverse=True):
+        weight=weights[index]
+        if tree[1]<weight:
+            continue
+        node=1
+        while node<size:
+            node*=2
+            if tree[node]<weight:
+                node+=1
+        tree[node]-=weight
+        assignment[index]=node-size
+        node//=2
+        #free capacity only shrinks, so once a parent's maximum stays put the ones above it do too
+        while node:
+            left=tree[2*node]
+            right=tree[2*node+1]
+            largest=left if left>right else right
+            if tree[node]==largest:
+                break
+            tree[node]=largest
+            node//=2
+    return assignment,tree[size:size+bins]
+
+
+class LoadPlan(Resource):
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def post(self,id):
+        if db.session.get(Location,id) is None:
+            return make_response({
+                "error":"No location is found"
+            },400)
+        dry_run=request.args.get('dry_run','').lower() in ('1','true','yes')
+
+        vehicles=db.session.query(Vehicle.id,Vehicle.capacity).filter(Vehicle.location_id==id).order_by(Vehicle.id).all()
+        vehicle_ids=[vehicle_id for vehicle_id,_ in vehicles]
+        loads=dict(db.session.query(Parcel.vehicle_id,func.sum(Parcel.weight))
+                   .filter(Parcel.vehicle_id.in_(vehicle_ids),func.lower(Parcel.status)!=DELIVERED)
+                   .group_by(Parcel.vehicle_id).all())
+        capacities=array('d',[capacity-(loads.get(vehicle_id) or 0) for vehicle_id,capacity in vehicles])
+
+        #a Core select on the connection, ORM rows cost more than the query for tens of thousands of parcels
+        parcels=db.session.connection().execute(select(Parcel.id,Parcel.weight)
+            .where(Parcel.location_id==id,Parcel.vehicle_id.is_(None),func.lower(Parcel.status)!=DELIVERED)).all()
+        parcel_ids=array('l',[parcel_id for parcel_id,_ in parcels])
+        weights=array('d',[weight for _,weight in parcels])
+
+        assignment,remaining=plan_loads(weights,capacities)
+        changes=[(parcel_id,vehicle_ids[slot]) for parcel_id,slot in zip(parcel_ids,assignment) if slot>=0]
+
+        if changes and not dry_run:
+            connection=db.session.connection()
+            plan_table.create(connection,checkfirst=True)
+            connection.execute(delete(plan_table))
+            #compiled once and the rows handed to the driver as they are, two integers need no bind processing
+            compiled=insert(plan_table).compile(dialect=connection.dialect)
+            connection.exec_driver_sql(str(compiled),changes if compiled.positional else
+                                       [{"parcel_id":parcel_id,"vehicle_id":vehicle_id} for parcel_id,vehicle_id in changes])
+            planned=Parcel.id.in_(select(plan_table.c.parcel_id))
+            #parcels another request put on a vehicle since they were read above keep it
+            connection.execute(delete(plan_table).where(plan_table.c.parcel_id.in_(
+                select(Parcel.id).where(planned,Parcel.vehicle_id.isnot(None)))))
+            parcels_table=Parcel.__table__
+            connection.execute(parcels_table.update().where(parcels_table.c.id==plan_table.c.parcel_id)
+                               .values(vehicle_id=plan_table.c.vehicle_id))
+            count_loaded(planned)
+            record_snapshots(planned)
+            plan_table.drop(connection)
+            db.session.commit()
+
+        utilization=[]
+        for (vehicle_id,capacity),free in zip(vehicles,remaining):
+            utilization.append({
+                "vehicle_id":vehicle_id,
+                "capacity":capacity,
+                "load":capacity-free,
+                "utilization":round((capacity-free)/capacity,4) if capacity else None
+            })
+
+        return make_response({
+            "dry_run":dry_run,
+            "assigned":len(changes),
+            "unassigned":len(parcels)-len(changes),
+            "vehicles":utilization
+        },200)
+
+api.add_resource(LoadPlan,'/locations/<int:id>/plan')
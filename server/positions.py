@@ -0,0 +1,387 @@
+import atexit
+import logging
+import math
+import threading
+import time
+from array import array
+from datetime import datetime
+from models import db,Vehicle,VehiclePosition,local_now
+from flask import Blueprint,request,make_response
+from flask_restful import Api, Resource
+from flask_jwt_extended import jwt_required,get_jwt,current_user
+from sqlalchemy import func,insert
+from auth import allow
+from shared_cache import response_cache
+from background import FirstUse,daemon
+
+logger=logging.getLogger(__name__)
+
+positions_bp = Blueprint('positions_bp',__name__)
+api=Api(positions_bp)
+
+MAX_BATCH_POSITIONS=1000
+# timestamp, latitude, longitude and reported speed (nan when the phone sent none) per slot
+FIELDS=4
+EARTH_RADIUS_KM=6371.0
+# below this a vehicle is treated as stopped and gets no ETA
+MIN_SPEED_KMH=1.0
+LOCAL=local_now().tzinfo
+
+
+def distance_km(latitude,longitude,other_latitude,other_longitude):
+    """Great circle distance by the haversine formula."""
+    latitude,longitude,other_latitude,other_longitude=map(math.radians,(latitude,longitude,other_latitude,other_longitude))
+    a=math.sin((other_latitude-latitude)/2)**2+\
+      math.cos(latitude)*math.cos(other_latitude)*math.sin((other_longitude-longitude)/2)**2
+    return 2*EARTH_RADIUS_KM*math.asin(math.sqrt(a))
+
+
+class PositionRing:
+    """The last size positions of one vehicle in a flat array of doubles, the oldest overwritten first."""
+    __slots__=('values','size','count','head','measured')
+
+    def __init__(self,size):
+        self.values=array('d',bytes(8*FIELDS*size))
+        self.size=size
+        self.count=0
+        self.head=0
+        self.measured=None
+
+    def append(self,timestamp,latitude,longitude,speed):
+        offset=self.head*FIELDS
+        self.values[offset:offset+FIELDS]=array('d',(timestamp,latitude,longitude,speed))
+        self.head=(self.head+1)%self.size
+        self.count=min(self.count+1,self.size)
+        self.measured=None
+
+    def newest(self,count=None):
+        """Up to count (timestamp, latitude, longitude, speed) tuples, newest first."""
+        values=self.values
+        for step in range(min(self.count,count or self.count)):
+            offset=((self.head-1-step)%self.size)*FIELDS
+            yield tuple(values[offset:offset+FIELDS])
+
+    def latest(self):
+        return next(self.newest(1),None)
+
+    def speed(self,window):
+        """km/h over the positions of the last window seconds, the phone's own figure when there is only one."""
+        #kept until the next append, reading every vehicle's speed is then a lookup for the ones that did not move
+        if self.measured is None or self.measured[0]!=window:
+            self.measured=(window,self._speed(window))
+        return self.measured[1]
+
+    def _speed(self,window):
+        latest=None
+        travelled=0.0
+        for position in self.newest():
+            if latest is None:
+                latest=earliest=position
+                continue
+            if latest[0]-position[0]>window:
+                break
+            travelled+=distance_km(position[1],position[2],earliest[1],earliest[2])
+            earliest=position
+        if latest is None:
+            return None
+        elapsed=latest[0]-earliest[0]
+        if elapsed>0:
+            return travelled/elapsed*3600
+        return None if math.isnan(latest[3]) else latest[3]
+
+
+class PositionStore:
+    """Live vehicle positions: ring buffers in memory, history written to vehicle_positions in bulk.
+
+    Pings go into a fixed size ring per vehicle and onto a pending list that a flusher thread
+    writes with one executemany every POSITIONS_FLUSH_SECONDS, or sooner once
+    POSITIONS_FLUSH_ROWS are waiting, so an ingest request never touches the database.
+    Pending rows are also written at exit. The rings are per process, so before answering a
+    read a worker appends the rows other workers have written to vehicle_positions since its
+    last look, at most every POSITIONS_SYNC_SECONDS: a ping ingested elsewhere shows up here
+    once it is flushed, the first read loads the latest stored position of every vehicle.
+    """
+
+    def __init__(self,app=None):
+        self.app=None
+        self.rings={}
+        self.pending=[]
+        self.vehicle_ids=frozenset()
+        self.drivers={}
+        self.vehicles_version=None
+        #highest vehicle_positions id already in the rings, None until the first read
+        self.synced=None
+        self.synced_at=0.0
+        self._flusher=FirstUse(lambda:daemon(self._flush_forever,'position-flush'))
+        self._lock=threading.Lock()
+        self._wake=threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self,app):
+        app.config.setdefault('POSITIONS_BUFFER',120)
+        app.config.setdefault('POSITIONS_FLUSH_SECONDS',5)
+        app.config.setdefault('POSITIONS_FLUSH_ROWS',5000)
+        app.config.setdefault('POSITIONS_SPEED_WINDOW',300)
+        app.config.setdefault('POSITIONS_SYNC_SECONDS',1)
+        self.app=app
+        self.buffer=app.config['POSITIONS_BUFFER']
+        self.flush_seconds=app.config['POSITIONS_FLUSH_SECONDS']
+        self.flush_rows=app.config['POSITIONS_FLUSH_ROWS']
+        self.speed_window=app.config['POSITIONS_SPEED_WINDOW']
+        self.sync_seconds=app.config['POSITIONS_SYNC_SECONDS']
+        atexit.register(self._flush_at_exit)
+        app.extensions['positions']=self
+
+    def known_vehicles(self):
+        #vehicle writes bump the shared 'vehicles' version, reload the ids only then
+        version=response_cache.version('vehicles')
+        if version!=self.vehicles_version or not self.vehicle_ids:
+            drivers={}
+            for vehicle_id,driver_phone in db.session.query(Vehicle.id,Vehicle.driver_phone):
+                drivers.setdefault(driver_phone,set()).add(vehicle_id)
+            self.drivers={driver_phone:frozenset(vehicle_ids) for driver_phone,vehicle_ids in drivers.items()}
+            self.vehicle_ids=frozenset(vehicle_id for vehicle_ids in drivers.values() for vehicle_id in vehicle_ids)
+            self.vehicles_version=version
+        return self.vehicle_ids
+
+    def driven_by(self,phone_number):
+        """Ids of the vehicles whose driver_phone is phone_number."""
+        self.known_vehicles()
+        return self.drivers.get(phone_number,frozenset())
+
+    def add(self,positions):
+        """Record (vehicle_id, timestamp, latitude, longitude, speed) tuples, speed may be None."""
+        with self._lock:
+            for vehicle_id,timestamp,latitude,longitude,speed in positions:
+                #to the microsecond the table keeps, so the row read back by sync() matches the ring
+                recorded_at=datetime.fromtimestamp(timestamp,LOCAL)
+                timestamp=recorded_at.timestamp()
+                ring=self.rings.get(vehicle_id)
+                if ring is None:
+                    ring=self.rings[vehicle_id]=PositionRing(self.buffer)
+                latest=ring.latest()
+                #late pings still go to the history but would scramble the ring's order
+                if latest is None or timestamp>=latest[0]:
+                    ring.append(timestamp,latitude,longitude,math.nan if speed is None else speed)
+                self.pending.append({
+                    "vehicle_id":vehicle_id,
+                    "recorded_at":recorded_at,
+                    "latitude":latitude,
+                    "longitude":longitude,
+                    "speed":speed
+                })
+            waiting=len(self.pending)
+        self._ensure_flusher()
+        if waiting>=self.flush_rows:
+            self._wake.set()
+
+    def flush(self):
+        """Write the pending positions in one executemany, returns how many."""
+        with self._lock:
+            rows,self.pending=self.pending,[]
+        if not rows:
+            return 0
+        try:
+            db.session.execute(insert(VehiclePosition),rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            with self._lock:
+                self.pending[:0]=rows
+            raise
+        return len(rows)
+
+    def _append(self,vehicle_id,recorded_at,latitude,longitude,speed):
+        if recorded_at.tzinfo is None:
+            recorded_at=recorded_at.replace(tzinfo=LOCAL)
+        timestamp=recorded_at.timestamp()
+        ring=self.rings.get(vehicle_id)
+        if ring is None:
+            ring=self.rings[vehicle_id]=PositionRing(self.buffer)
+        latest=ring.latest()
+        #this worker's own pings come back from the table too, they are already in the ring
+        if latest is None or timestamp>latest[0]:
+            ring.append(timestamp,latitude,longitude,math.nan if speed is None else speed)
+
+    def sync(self):
+        """Append the rows written to vehicle_positions since the last sync, the latest per vehicle on the first."""
+        now=time.monotonic()
+        if self.synced is not None and now-self.synced_at<self.sync_seconds:
+            return
+        columns=(VehiclePosition.id,VehiclePosition.vehicle_id,VehiclePosition.recorded_at,VehiclePosition.latitude,
+                 VehiclePosition.longitude,VehiclePosition.speed)
+        if self.synced is None:
+            synced=db.session.query(func.max(VehiclePosition.id)).scalar() or 0
+            newest=db.session.query(VehiclePosition.vehicle_id,func.max(VehiclePosition.recorded_at).label('recorded_at'))\
+                .filter(VehiclePosition.id<=synced).group_by(VehiclePosition.vehicle_id).subquery()
+            rows=db.session.query(*columns)\
+                .join(newest,(newest.c.vehicle_id==VehiclePosition.vehicle_id)&(newest.c.recorded_at==VehiclePosition.recorded_at))\
+                .order_by(VehiclePosition.recorded_at).all()
+        else:
+            rows=db.session.query(*columns).filter(VehiclePosition.id>self.synced).order_by(VehiclePosition.id).all()
+            synced=rows[-1][0] if rows else self.synced
+        with self._lock:
+            for row_id,vehicle_id,recorded_at,latitude,longitude,speed in rows:
+                self._append(vehicle_id,recorded_at,latitude,longitude,speed)
+            self.synced=synced
+            self.synced_at=now
+
+    def latest(self,vehicle_id=None):
+        """{vehicle_id: (timestamp, latitude, longitude, speed_kmh)} for every vehicle or just the one."""
+        self.sync()
+        with self._lock:
+            rings=self.rings.items() if vehicle_id is None else [(vehicle_id,self.rings.get(vehicle_id))]
+            return {
+                ring_vehicle_id:ring.latest()[:3]+(ring.speed(self.speed_window),)
+                for ring_vehicle_id,ring in rings if ring is not None
+            }
+
+    def _ensure_flusher(self):
+        self._flusher.get()
+
+    def _flush_forever(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            with self.app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception("Writing vehicle positions failed")
+
+    def _flush_at_exit(self):
+        if not self.pending:
+            return
+        with self.app.app_context():
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Writing vehicle positions at exit failed")
+
+
+positions=PositionStore()
+
+
+def _coordinate(value,limit):
+    if isinstance(value,bool) or not isinstance(value,(int,float)) or not -limit<=value<=limit:
+        return None
+    return float(value)
+
+
+def _position(vehicle_id,position):
+    timestamp,latitude,longitude,speed=position
+    return {
+        "vehicle_id":vehicle_id,
+        "recorded_at":datetime.fromtimestamp(timestamp,LOCAL).isoformat(),
+        "latitude":latitude,
+        "longitude":longitude,
+        "speed_kmh":None if speed is None or math.isnan(speed) else round(speed,1)
+    }
+
+
+class Positions(Resource):
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def get(self):
+        latest=positions.latest()
+        return make_response({
+            "positions":[_position(vehicle_id,latest[vehicle_id]) for vehicle_id in sorted(latest)]
+        },200)
+
+    @jwt_required()
+    @allow(['admin','customer_service','driver'])
+    def post(self):
+        data=request.get_json(silent=True)
+        items=data.get('positions') if isinstance(data,dict) else None
+        if not isinstance(items,list) or not items:
+            return make_response({
+                "error":"Please send the positions as a non empty list under 'positions'"
+            },400)
+        if len(items)>MAX_BATCH_POSITIONS:
+            return make_response({
+                "error":f"A batch can have at most {MAX_BATCH_POSITIONS} positions"
+            },400)
+
+        #a driver reports only for the vehicles that list their phone number, staff for any vehicle
+        if get_jwt().get('role')=='driver':
+            vehicle_ids=positions.driven_by(current_user.phone_number)
+        else:
+            vehicle_ids=positions.known_vehicles()
+        now=time.time()
+        accepted=[]
+        errors=[]
+        for index,item in enumerate(items):
+            if not isinstance(item,dict):
+                errors.append({"index":index,"error":"Invalid position"})
+                continue
+            vehicle_id=item.get('vehicle_id')
+            latitude=_coordinate(item.get('latitude'),90)
+            longitude=_coordinate(item.get('longitude'),180)
+            speed=item.get('speed')
+            recorded_at=item.get('recorded_at')
+            #a list would not hash and True would pass for vehicle 1
+            if isinstance(vehicle_id,bool) or not isinstance(vehicle_id,int) or vehicle_id not in vehicle_ids:
+                errors.append({"index":index,"error":"Invalid vehicle"})
+                continue
+            if latitude is None or longitude is None:
+                errors.append({"index":index,"error":"latitude and longitude should be valid coordinates"})
+                continue
+            if speed is not None and (isinstance(speed,bool) or not isinstance(speed,(int,float)) or speed<0):
+                errors.append({"index":index,"error":"speed should be a non negative number of km/h"})
+                continue
+            timestamp=now
+            if recorded_at is not None:
+                try:
+                    recorded_at=datetime.fromisoformat(recorded_at)
+                except (TypeError,ValueError):
+                    errors.append({"index":index,"error":"recorded_at should be an ISO 8601 datetime"})
+                    continue
+                timestamp=(recorded_at if recorded_at.tzinfo else recorded_at.replace(tzinfo=LOCAL)).timestamp()
+                if timestamp>now+60:
+                    errors.append({"index":index,"error":"recorded_at is in the future"})
+                    continue
+            accepted.append((vehicle_id,timestamp,latitude,longitude,None if speed is None else float(speed)))
+
+        positions.add(accepted)
+
+        return make_response({
+            "accepted":len(accepted),
+            "errors":errors
+        },202 if accepted else 400)
+
+api.add_resource(Positions,'/vehicles/positions')
+
+class VehicleETA(Resource):
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def get(self,id):
+        try:
+            latitude=_coordinate(float(request.args['latitude']),90)
+            longitude=_coordinate(float(request.args['longitude']),180)
+        except (KeyError,ValueError):
+            latitude=longitude=None
+        if latitude is None or longitude is None:
+            return make_response({
+                "error":"Please enter the latitude and longitude of the destination"
+            },400)
+        position=positions.latest(id).get(id)
+        if position is None:
+            return make_response({
+                "error":"No position has been received for that vehicle"
+            },400)
+
+        timestamp,vehicle_latitude,vehicle_longitude,speed=position
+        distance=distance_km(vehicle_latitude,vehicle_longitude,latitude,longitude)
+        seconds=None
+        if speed is not None and not math.isnan(speed) and speed>=MIN_SPEED_KMH:
+            seconds=distance/speed*3600
+
+        return make_response({
+            "position":_position(id,position),
+            "distance_km":round(distance,3),
+            "eta_seconds":None if seconds is None else round(seconds),
+            "eta":None if seconds is None else datetime.fromtimestamp(timestamp+seconds,LOCAL).isoformat()
+        },200)
+
+api.add_resource(VehicleETA,'/vehicles/<int:id>/eta')
@@ -0,0 +1,266 @@
+import heapq
+import operator
+import threading
+import time
+from array import array
+from models import db,Location
+from flask import Blueprint,request,make_response
+from flask_restful import Api, Resource
+from shared_cache import response_cache
+
+rates_bp = Blueprint('rates_bp',__name__)
+api=Api(rates_bp)
+
+MAX_QUOTE_ITEMS=10000
+# writes in any worker bump the shared 'locations' version, the TTL bounds staleness from changes made outside the app
+RATE_TABLE_TTL=60
+
+
+def lane_key(origin,destination):
+    return (origin.strip().lower(),destination.strip().lower())
+
+
+class RateTable:
+    """Every Location rate in one array, indexed by location id and by (origin, destination)."""
+
+    def __init__(self,ttl=RATE_TABLE_TTL):
+        self.ttl=ttl
+        self._snapshot=None
+        self._lock=threading.Lock()
+
+    def invalidate(self):
+        self._snapshot=None
+
+    def _stale(self,snapshot,version):
+        return snapshot is None or snapshot[1]!=version or time.monotonic()-snapshot[0]>self.ttl
+
+    def snapshot(self):
+        version=response_cache.version('locations') if response_cache.path else 0
+        snapshot=self._snapshot
+        if self._stale(snapshot,version):
+            with self._lock:
+                snapshot=self._snapshot
+                if self._stale(snapshot,version):
+                    snapshot=self._snapshot=self._build(version)
+        return snapshot[2:]
+
+    def _build(self,version):
+        by_id={}
+        by_lane={}
+        costs=array('d')
+        rows=db.session.query(Location.id,Location.origin,Location.destination,Location.cost_per_kg)\
+            .order_by(Location.id).all()
+        for index,(location_id,origin,destination,cost_per_kg) in enumerate(rows):
+            by_id[location_id]=index
+            #the oldest location wins when the same lane was entered twice
+            by_lane.setdefault(lane_key(origin,destination),index)
+            costs.append(cost_per_kg)
+        location_ids=array('l',[row[0] for row in rows])
+        return (time.monotonic(),version,by_id,by_lane,costs,location_ids)
+
+
+rate_table=RateTable()
+
+
+class RouteGraph:
+    """Cheapest multi-leg routes over the rate table's lanes, the cost of a route being the sum of its cost_per_kg.
+
+    Locations are edges between place names. The shortest path tree of an origin is computed
+    with Dijkstra the first time a route from it is asked for and kept, along with every route
+    read from it, so a repeat lookup is two dictionary hits. Only places on the graph are
+    memoized, any other name has no route. When the rate table is rebuilt only the trees that
+    a changed lane ran through, or now makes cheaper, are dropped.
+    """
+
+    def __init__(self,rates):
+        self.rates=rates
+        self._state=None
+
+    def _current(self):
+        _,by_lane,costs,location_ids=self.rates.snapshot()
+        state=self._state
+        if state is None or state[0] is not by_lane:
+            lanes={}
+            edges={}
+            for (origin,destination),lane in by_lane.items():
+                if origin!=destination:
+                    lanes[(origin,destination)]=(location_ids[lane],costs[lane])
+                    edges.setdefault(origin,[]).append((destination,lane))
+            places={place for key in lanes for place in key}
+            trees,routes=self._kept(state,lanes,places) if state is not None else ({},{})
+            state=self._state=(by_lane,costs,location_ids,edges,places,lanes,trees,routes)
+        return state
+
+    @staticmethod
+    def _affects(distance,via,key,old,new):
+        origin,destination=key
+        #the tree ran through the lane as it was
+        if old is not None and via.get(destination)==origin:
+            return True
+        #the lane as it is now is a cheaper way in
+        return new is not None and origin in distance and \
+            (destination not in distance or distance[origin]+new[1]<distance[destination])
+
+    def _kept(self,state,lanes,places):
+        """The trees and routes of state that none of the changed lanes can cut or improve."""
+        old_lanes,trees,routes=state[5:]
+        changed=[(key,old_lanes.get(key),lanes.get(key)) for key in old_lanes.keys()|lanes.keys()
+                 if old_lanes.get(key)!=lanes.get(key)]
+        kept={origin:tree for origin,tree in trees.items()
+              if origin in places and not any(self._affects(*tree,*change) for change in changed)}
+        return kept,{key:legs for key,legs in routes.items() if key[0] in kept}
+
+    def _tree(self,state,origin):
+        costs,edges,trees=state[1],state[3],state[6]
+        tree=trees.get(origin)
+        if tree is None:
+            distance={origin:0.0}
+            via={}
+            heap=[(0.0,origin)]
+            while heap:
+                cost,node=heapq.heappop(heap)
+                if cost>distance[node]:
+                    continue
+                for destination,lane in edges.get(node,()):
+                    candidate=cost+costs[lane]
+                    if destination not in distance or candidate<distance[destination]:
+                        distance[destination]=candidate
+                        via[destination]=node
+                        heapq.heappush(heap,(candidate,destination))
+            tree=trees[origin]=(distance,via)
+        return tree
+
+    def route(self,origin,destination):
+        """The cheapest route as a list of (location_id, origin, destination, cost_per_kg) legs, None when there is none."""
+        state=self._current()
+        key=lane_key(origin,destination)
+        places,lanes,routes=state[4],state[5],state[7]
+        if key in routes:
+            return routes[key]
+        origin,destination=key
+        if origin==destination or origin not in places or destination not in places:
+            return None
+        distance,via=self._tree(state,origin)
+        legs=None
+        if destination in distance:
+            legs=[]
+            node=destination
+            while node!=origin:
+                previous=via[node]
+                location_id,cost_per_kg=lanes[(previous,node)]
+                legs.append((location_id,previous,node,cost_per_kg))
+                node=previous
+            legs.reverse()
+        routes[key]=legs
+        return legs
+
+
+route_graph=RouteGraph(rate_table)
+
+
+def price(costs,lanes,weights):
+    """shipping_cost for every (lane, weight) pair, one map over the arrays instead of a Python loop."""
+    return array('d',map(operator.mul,map(costs.__getitem__,lanes),weights))
+
+
+class Quotes(Resource):
+    def post(self):
+        data=request.get_json()
+        items=data.get('items') if isinstance(data,dict) else None
+        if not isinstance(items,list) or not items:
+            return make_response({
+                "error":"Please send the items to price as a non empty list under 'items'"
+            },400)
+        if len(items)>MAX_QUOTE_ITEMS:
+            return make_response({
+                "error":f"A quote can have at most {MAX_QUOTE_ITEMS} items"
+            },400)
+
+        by_id,by_lane,costs,location_ids=rate_table.snapshot()
+        lanes=array('l')
+        weights=array('d')
+        priced=[]
+        errors=[]
+        for index,item in enumerate(items):
+            if not isinstance(item,dict):
+                errors.append({"index":index,"error":"Invalid item"})
+                continue
+            weight=item.get('weight')
+            if isinstance(weight,bool) or not isinstance(weight,(int,float)) or weight<=0:
+                errors.append({"index":index,"error":"weight should be a positive number"})
+                continue
+            if 'location_id' in item:
+                try:
+                    lane=by_id.get(int(item['location_id']))
+                except (TypeError,ValueError):
+                    lane=None
+            elif isinstance(item.get('origin'),str) and isinstance(item.get('destination'),str):
+                lane=by_lane.get(lane_key(item['origin'],item['destination']))
+            else:
+                errors.append({"index":index,"error":"Please enter a location_id or an origin and destination"})
+                continue
+            if lane is None:
+                errors.append({"index":index,"error":"No rate for that route"})
+                continue
+            lanes.append(lane)
+            weights.append(weight)
+            priced.append(index)
+
+        shipping_costs=price(costs,lanes,weights)
+        quotes=[{
+            "index":index,
+            "location_id":location_ids[lane],
+            "cost_per_kg":costs[lane],
+            "weight":weight,
+            "shipping_cost":shipping_cost
+        } for index,lane,weight,shipping_cost in zip(priced,lanes,weights,shipping_costs)]
+
+        return make_response({
+            "quotes":quotes,
+            "total":sum(shipping_costs),
+            "errors":errors
+        },200 if quotes else 400)
+
+api.add_resource(Quotes,'/quotes')
+
+class Routes(Resource):
+    def get(self):
+        origin=request.args.get('origin','').strip()
+        destination=request.args.get('destination','').strip()
+        if not origin or not destination:
+            return make_response({
+                "error":"Please enter the origin and destination"
+            },400)
+        weight=request.args.get('weight')
+        if weight is not None:
+            try:
+                weight=float(weight)
+            except ValueError:
+                weight=0
+            if not weight>0:
+                return make_response({
+                    "error":"weight should be a positive number"
+                },400)
+
+        legs=route_graph.route(origin,destination)
+        if legs is None:
+            return make_response({
+                "error":"No route between those locations"
+            },400)
+        cost_per_kg=sum(leg[3] for leg in legs)
+
+        return make_response({
+            "origin":origin,
+            "destination":destination,
+            "cost_per_kg":cost_per_kg,
+            "weight":weight,
+            "shipping_cost":cost_per_kg*weight if weight else None,
+            "legs":[{
+                "location_id":location_id,
+                "origin":leg_origin,
+                "destination":leg_destination,
+                "cost_per_kg":leg_cost
+            } for location_id,leg_origin,leg_destination,leg_cost in legs]
+        },200)
+
+api.add_resource(Routes,'/routes')
@@ -0,0 +1,147 @@
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from flask import g,request,has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine,event
+from background import FirstUse,daemon
+
+logger=logging.getLogger(__name__)
+
+READ_METHODS=frozenset(('GET','HEAD','OPTIONS'))
+PIN_COOKIE='db_primary'
+PIN_HEADER='X-Read-Primary'
+
+
+class RoutingSession(Session):
+    """Session that reads from the replica picked for the current request.
+
+    Flushes and INSERT/UPDATE/DELETE statements always go to the primary, and once a request
+    has written, its remaining reads do too.
+    """
+
+    def get_bind(self,mapper=None,clause=None,**kwargs):
+        if has_app_context():
+            replica=g.get('db_replica')
+            if replica is not None:
+                if not self._flushing and not getattr(clause,'is_dml',False):
+                    return replica
+                g.db_replica=None
+            if self._flushing or getattr(clause,'is_dml',False):
+                g.db_wrote=True
+        return super().get_bind(mapper,clause=clause,**kwargs)
+
+
+@contextmanager
+def on_primary():
+    """Run the block's queries against the primary even in a request routed to a replica."""
+    replica=g.get('db_replica')
+    g.db_replica=None
+    try:
+        yield
+    finally:
+        if not g.get('db_wrote'):
+            g.db_replica=replica
+
+
+class ReplicaRouter:
+    """Round-robin of read-only requests over the SQLALCHEMY_REPLICA_URIS databases.
+
+    GET, HEAD and OPTIONS requests are each given one healthy replica, everything else uses
+    the primary. A request that writes sets a cookie that keeps the client's reads on the
+    primary for REPLICA_PIN_SECONDS, long enough for the replicas to catch up, clients without
+    cookies can send an X-Read-Primary header instead. A background thread checks every
+    replica each REPLICA_HEALTH_SECONDS and a replica whose connection fails is taken out of
+    the rotation right away, with no healthy replica left reads fall back to the primary.
+    """
+
+    def __init__(self,app=None):
+        self.engines=[]
+        self.healthy=[]
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self,app):
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS',[])
+        app.config.setdefault('REPLICA_HEALTH_SECONDS',5)
+        app.config.setdefault('REPLICA_PIN_SECONDS',10)
+        self.health_seconds=app.config['REPLICA_HEALTH_SECONDS']
+        self.pin_seconds=app.config['REPLICA_PIN_SECONDS']
+        options=app.config.get('SQLALCHEMY_ENGINE_OPTIONS',{})
+        self.engines=[create_engine(uri,**options) for uri in app.config['SQLALCHEMY_REPLICA_URIS']]
+        for engine in self.engines:
+            event.listen(engine,'handle_error',self._connection_failed)
+        self.healthy=list(self.engines)
+        self._turn=itertools.count()
+        self._lock=threading.Lock()
+        self._checker=FirstUse(lambda:daemon(self._check_forever,'replica-health'))
+        if self.engines:
+            app.before_request(self._route)
+            app.after_request(self._pin)
+        app.extensions['replicas']=self
+
+    def replica(self):
+        """The next healthy replica, None when there is none."""
+        healthy=self.healthy
+        if not healthy:
+            return None
+        return healthy[next(self._turn)%len(healthy)]
+
+    def _route(self):
+        self._ensure_checker()
+        if request.method not in READ_METHODS or request.headers.get(PIN_HEADER):
+            return
+        pinned=request.cookies.get(PIN_COOKIE)
+        if pinned and pinned.isdigit() and int(pinned)>time.time():
+            return
+        g.db_replica=self.replica()
+
+    def _pin(self,response):
+        if g.get('db_wrote'):
+            response.set_cookie(PIN_COOKIE,str(int(time.time()+self.pin_seconds)),max_age=self.pin_seconds,
+                                httponly=True,samesite='Lax')
+        return response
+
+    def _connection_failed(self,context):
+        if not (context.is_disconnect or context.connection is None):
+            return
+        with self._lock:
+            for engine in self.healthy:
+                if context.engine is engine:
+                    logger.warning("Replica %s failed, reading from the others until it recovers",engine.url)
+                    self.healthy=[other for other in self.healthy if other is not engine]
+
+    def check(self):
+        """Ping every replica and rebuild the rotation from the ones that answer."""
+        healthy=[]
+        for engine in self.engines:
+            try:
+                with engine.connect() as connection:
+                    connection.exec_driver_sql('SELECT 1')
+            except Exception as error:
+                if engine in self.healthy:
+                    logger.warning("Replica %s is down: %s",engine.url,error)
+                continue
+            if engine not in self.healthy:
+                logger.info("Replica %s is back",engine.url)
+            healthy.append(engine)
+        with self._lock:
+            self.healthy=healthy
+        return healthy
+
+    def _ensure_checker(self):
+        if self.health_seconds:
+            self._checker.get()
+
+    def _check_forever(self):
+        while True:
+            time.sleep(self.health_seconds)
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Replica health check failed")
+
+
+replicas=ReplicaRouter()
@@ -0,0 +1,843 @@
+from models import db,User,Parcel,Vehicle,Location,UserParcelAssignment,RouteSummary
+from flask import Blueprint,request,make_response
+from flask_restful import Api, Resource
+from flask_jwt_extended import jwt_required,current_user
+from auth import allow
+from identity import invalidate_user
+from tracking import invalidate_tracking,tracking_cache
+from events import record_snapshots
+from rates import rate_table,route_graph
+from stats import count_new_parcels
+from pagination import PaginationError,page_size,encode_cursor,decode_cursor,parse_fields,parse_datetime,page
+from serializers import serialize,serialize_many,eager,USER_COLUMNS
+from search import users_index,parcels_index,prefix_range
+from shared_cache import response_cache
+from encoding import REPRESENTATIONS
+from sqlalchemy import and_,insert,or_,select,union
+from datetime import datetime
+
+resources_bp = Blueprint('resources_bp',__name__)
+api=Api(resources_bp)
+api.representations.update(REPRESENTATIONS)
+
+
+@resources_bp.route('/')
+def index():
+    return '<h1>Matwana Logistics</h1>'
+
+###################################################USER RESOURCE###################################################################
+
+class Users(Resource):
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def get(self):
+        args=request.args
+        try:
+            limit=page_size(args)
+            cursor=decode_cursor(args.get('cursor'))
+            last_id=int(cursor[0]) if cursor else None
+        except (PaginationError,TypeError,ValueError):
+            return make_response({
+                "error":"Invalid limit or cursor"
+            },400)
+        
+        query=db.session.query(*[getattr(User,column) for column in USER_COLUMNS])
+        if 'role' in args:
+            query=query.filter(User.role==args['role'])
+        #prefix searches, phone numbers and emails through their unique indexes, names through full-text search
+        if args.get('phone_number'):
+            query=query.filter(prefix_range(User.phone_number,args['phone_number']))
+        if args.get('email'):
+            query=query.filter(prefix_range(User.email,args['email']))
+        if args.get('name'):
+            match=users_index.match(args['name'])
+            if match is None:
+                return make_response({
+                    "error":"name should contain letters or digits"
+                },400)
+            query=query.filter(match)
+        if last_id is not None:
+            query=query.filter(User.id>last_id)
+        
+        users=query.order_by(User.id).limit(limit+1).all()
+        users,next_cursor=page(users,limit,lambda user:encode_cursor(user.id))
+        
+        return make_response({
+            "users":[user._asdict() for user in users],
+            "next_cursor":next_cursor
+        },200)
+
+        
+    
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def post(self):
+        data=request.get_json()
+        name=data['name']
+        phone_number=data['phone_number']
+        email=data['email']
+        password=data['password']
+        role=data['role']
+        
+        errors=[]
+        if len(name)<2:
+            errors.append("Name is required and name should be at least 3 characters")
+        if not phone_number.isdigit() or not len(phone_number) ==10:
+            errors.append('Phone number should be 10 characters and have digits only')
+        if not "@" in email or not email:
+            errors.append('email is required')
+        if len(password) <8 :
+            errors.append('Password should be at least 8 characters')
+        
+        user =User.get_user_by_name(name=name)
+        
+        if user is not None:
+            errors.append("User with that username exists")
+        
+        if errors:
+            return make_response({
+                "errors":errors
+            },400)
+            
+        new_user=User(name=name,
+                      phone_number=phone_number,
+                      email=email,
+                      role=role)
+        
+        new_user.set_password(password=password)
+        new_user.save()
+        
+        return make_response({
+            "name":name,
+            "phone_number":phone_number,
+            "password":password
+        },201)
+        
+api.add_resource(Users,'/users')
+
+class User_by_id(Resource):
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def get(self,id):
+        user=User.query.filter_by(id=id).first()
+        if not user:
+            return make_response({
+                "error":"No user found"
+            },400)
+        return make_response(serialize(user),200)
+    
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def delete(self,id):
+        user=User.query.filter_by(id=id).first()
+        if not user:
+            return make_response({
+                "error":"No user found"
+            },400)
+        
+        
+        user.delete()
+        invalidate_user(id)
+        
+        return make_response({
+            "message":"user delete successfully"
+        },200)
+    
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def put(self,id):
+        user=User.query.filter_by(id=id).first()
+        if not user:
+            return make_response({
+                "error":"User not found"
+            })
+        
+        data=request.get_json()
+        for key,value in data.items():
+            setattr(user,key,value)
+        db.session.commit()
+        invalidate_user(id)
+        
+        return make_response(serialize(user),200)
+api.add_resource(User_by_id,'/users/<int:id>')
+
+
+############################################## PARCEL RESOURCE ###################################################################
+PARCEL_FIELDS=('id','name','description','tracking_number','weight','status','shipping_cost','created_at',
+               'sender_id','recipient_id','location_id','vehicle_id','sender','recipient')
+PARCEL_ID_FILTERS=('location_id','vehicle_id','sender_id','recipient_id')
+PARCEL_REQUIRED=('user_id','name','description','tracking_number','weight','status',
+                 'sender_id','recipient_id','location_id','vehicle_id')
+MAX_BULK_PARCELS=1000
+
+class Parcels(Resource):
+    @jwt_required()
+    @allow(['admin','customer_service','customer'])
+    def get(self):
+        args=request.args
+        try:
+            limit=page_size(args)
+            cursor=decode_cursor(args.get('cursor'))
+            fields=parse_fields(args,PARCEL_FIELDS)
+            created_from=parse_datetime(args.get('created_from'),'created_from')
+            created_to=parse_datetime(args.get('created_to'),'created_to')
+        except PaginationError as error:
+            return make_response({
+                "error":str(error)
+            },400)
+        
+        query=Parcel.query
+        if 'status' in args:
+            query=query.filter(Parcel.status==args['status'])
+        for key in PARCEL_ID_FILTERS:
+            value=args.get(key,type=int)
+            if value is not None:
+                query=query.filter(getattr(Parcel,key)==value)
+        if created_from:
+            query=query.filter(Parcel.created_at>=created_from)
+        if created_to:
+            query=query.filter(Parcel.created_at<created_to)
+        
+        #keyset pagination on (created_at, id), newest parcels first, so the
+        #created_at and (status, created_at) indexes hand rows back already sorted
+        if cursor:
+            try:
+                created_at,last_id=datetime.fromisoformat(cursor[0]),int(cursor[1])
+            except (IndexError,TypeError,ValueError):
+                return make_response({
+                    "error":"Invalid cursor"
+                },400)
+            query=query.filter(Parcel.created_at<=created_at,
+                               or_(Parcel.created_at<created_at,Parcel.id<last_id))
+        only=tuple(fields) if fields else None
+        loaded=only+('created_at',) if only else None
+        query=query.options(*eager(Parcel,only=loaded))
+        
+        parcels=query.order_by(Parcel.created_at.desc(),Parcel.id.desc()).limit(limit+1).all()
+        parcels,next_cursor=page(parcels,limit,lambda parcel:encode_cursor(parcel.created_at.isoformat(),parcel.id))
+        
+        return make_response({
+            "parcels":serialize_many(parcels,Parcel,only=only),
+            "next_cursor":next_cursor
+        },200)
+    
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def post(self):
+        data=request.get_json()
+        user_id=data['user_id']
+        name=data['name']
+        description=data['description']
+        tracking_number=data['tracking_number']
+        weight=data['weight']
+        status=data['status']
+        sender_id = data['sender_id']  
+        recipient_id = data['recipient_id']
+        location_id=data.get('location_id')
+        vehicle_id = data['vehicle_id']  
+        
+        #no location given, ship along the cheapest chain of lanes and file the parcel under the first one
+        legs=None
+        if location_id is None and isinstance(data.get('origin'),str) and isinstance(data.get('destination'),str):
+            legs=route_graph.route(data['origin'],data['destination'])
+            if legs:
+                location_id=legs[0][0]
+        
+        user=User.query.filter_by(id=user_id).first()
+        sender=User.query.filter_by(id=sender_id).first()
+        recipient=User.query.filter_by(id=recipient_id).first()
+        vehicle=Vehicle.query.filter_by(id=vehicle_id).first()
+        location=Location.query.filter_by(id=location_id).first()
+         
+        if not user or user.role not in ['customer_service','admin']:
+            return make_response({
+                "error":"Invalid user Id or insufficient permission"
+            },403)
+        
+        if not sender or not recipient or not location:
+            return make_response({
+                "error":"Please enter a valid sender,recipient,vehicle or location details"
+            },400)
+            
+        
+        if not description or not weight or not name:
+            return make_response({
+                "errors":"please enter  all parcel information"
+            },400)
+        
+        shipping_cost=(sum(leg[3] for leg in legs) if legs else location.cost_per_kg)*weight
+       
+        parcel=Parcel(
+            name=name,
+            description=description,
+            tracking_number=tracking_number,
+            weight=weight,
+            status=status,
+            shipping_cost=shipping_cost,
+            sender_id = sender_id,  
+            recipient_id = recipient_id,
+            location_id=location_id, 
+            vehicle_id = vehicle_id  
+            )
+        user_parcel_assignment=UserParcelAssignment(user=user,parcel=parcel)
+        db.session.add(user_parcel_assignment)
+        db.session.add(parcel)
+        db.session.commit()
+        
+        parcel_dict={
+            "name":parcel.name,
+            "description":parcel.description,
+            "tracking_number":parcel.tracking_number,
+            "weight":parcel.weight,
+            "status":parcel.status,
+            "shipping_cost":parcel.shipping_cost,
+            "sender_id":parcel.sender_id,  
+            "recipient_id":parcel.recipient_id,
+            "location_id":parcel.location_id, 
+            "vehicle_id":parcel.vehicle_id  
+        }
+        if legs:
+            parcel_dict["route"]=[leg[0] for leg in legs]
+        
+        return make_response(parcel_dict,201)
+
+api.add_resource(Parcels,'/parcels')
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError,ValueError):
+        return None
+
+class ParcelsBulk(Resource):
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def post(self):
+        data=request.get_json()
+        items=data.get('parcels') if isinstance(data,dict) else None
+        if not isinstance(items,list) or not items:
+            return make_response({
+                "error":"Please send the parcels as a non empty list under 'parcels'"
+            },400)
+        if len(items)>MAX_BULK_PARCELS:
+            return make_response({
+                "error":f"A batch can have at most {MAX_BULK_PARCELS} parcels"
+            },400)
+        
+        items=[item if isinstance(item,dict) else {} for item in items]
+        user_ids={_as_id(item.get(key)) for item in items for key in ('user_id','sender_id','recipient_id')}
+        vehicle_ids={_as_id(item.get('vehicle_id')) for item in items}
+        location_ids={_as_id(item.get('location_id')) for item in items}
+        tracking_numbers={item.get('tracking_number') for item in items if isinstance(item.get('tracking_number'),str)}
+        
+        #one IN query per model instead of five lookups per parcel
+        roles=dict(db.session.query(User.id,User.role).filter(User.id.in_(user_ids-{None})).all())
+        vehicles={vehicle_id for (vehicle_id,) in db.session.query(Vehicle.id).filter(Vehicle.id.in_(vehicle_ids-{None}))}
+        rates=dict(db.session.query(Location.id,Location.cost_per_kg).filter(Location.id.in_(location_ids-{None})).all())
+        taken={number for (number,) in db.session.query(Parcel.tracking_number).filter(Parcel.tracking_number.in_(tracking_numbers))}
+        
+        rows=[]
+        assigners=[]
+        accepted=[]
+        errors=[]
+        for index,item in enumerate(items):
+            item_errors=[f"{key} is required" for key in PARCEL_REQUIRED if key not in item]
+            if item_errors:
+                errors.append({"index":index,"errors":item_errors})
+                continue
+            
+            user_id=_as_id(item['user_id'])
+            sender_id=_as_id(item['sender_id'])
+            recipient_id=_as_id(item['recipient_id'])
+            location_id=_as_id(item['location_id'])
+            vehicle_id=_as_id(item['vehicle_id'])
+            tracking_number=item['tracking_number']
+            weight=item['weight']
+            
+            if roles.get(user_id) not in ['customer_service','admin']:
+                item_errors.append("Invalid user Id or insufficient permission")
+            if sender_id not in roles or recipient_id not in roles:
+                item_errors.append("Invalid sender or recipient")
+            if location_id not in rates:
+                item_errors.append("Invalid location")
+            if item['vehicle_id'] is not None and vehicle_id not in vehicles:
+                item_errors.append("Invalid vehicle")
+            for key in ('name','description','status'):
+                if not isinstance(item[key],str) or not item[key]:
+                    item_errors.append(f"{key} should be a non empty string")
+            if isinstance(weight,bool) or not isinstance(weight,(int,float)) or weight<=0:
+                item_errors.append("weight should be a positive number")
+            if not isinstance(tracking_number,str) or not tracking_number:
+                item_errors.append("tracking_number should be a non empty string")
+            elif tracking_number in taken:
+                item_errors.append("Tracking number is already used")
+            if item_errors:
+                errors.append({"index":index,"errors":item_errors})
+                continue
+            
+            taken.add(tracking_number)
+            rows.append({
+                "name":item['name'],
+                "description":item['description'],
+                "tracking_number":tracking_number,
+                "weight":weight,
+                "status":item['status'],
+                "shipping_cost":rates[location_id]*weight,
+                "sender_id":sender_id,
+                "recipient_id":recipient_id,
+                "location_id":location_id,
+                "vehicle_id":vehicle_id
+            })
+            assigners.append(user_id)
+            accepted.append(index)
+        
+        created=[]
+        if rows:
+            #plain executemany, the new ids come back through the unique tracking number index
+            db.session.execute(insert(Parcel),rows)
+            ids=dict(db.session.query(Parcel.tracking_number,Parcel.id)
+                     .filter(Parcel.tracking_number.in_([row['tracking_number'] for row in rows])).all())
+            parcel_ids=[ids[row['tracking_number']] for row in rows]
+            db.session.execute(insert(UserParcelAssignment),[
+                {"user_id":user_id,"parcel_id":parcel_id} for user_id,parcel_id in zip(assigners,parcel_ids)
+            ])
+            record_snapshots(Parcel.id.in_(parcel_ids))
+            count_new_parcels(parcel_ids)
+            db.session.commit()
+            created=[{
+                "index":index,
+                "id":parcel_id,
+                "tracking_number":row['tracking_number'],
+                "shipping_cost":row['shipping_cost']
+            } for index,parcel_id,row in zip(accepted,parcel_ids,rows)]
+        
+        #422 as soon as any item was rejected, the valid ones are still saved and listed under created
+        return make_response({
+            "created":created,
+            "errors":errors
+        },422 if errors else 201)
+
+api.add_resource(ParcelsBulk,'/parcels/bulk')
+
+class ParcelSearch(Resource):
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def get(self):
+        args=request.args
+        try:
+            limit=page_size(args)
+            cursor=decode_cursor(args.get('cursor'))
+            fields=parse_fields(args,PARCEL_FIELDS)
+        except PaginationError as error:
+            return make_response({
+                "error":str(error)
+            },400)
+        ranked=parcels_index.ranked(args.get('q',''))
+        if ranked is None:
+            return make_response({
+                "error":"Please enter a search of at least 3 letters or digits"
+            },400)
+        
+        query=db.session.query(Parcel,ranked.c.rank).join(ranked,ranked.c.id==Parcel.id)
+        if 'status' in args:
+            query=query.filter(Parcel.status==args['status'])
+        #keyset pagination on (rank, id), best matches first
+        if cursor:
+            try:
+                rank,last_id=float(cursor[0]),int(cursor[1])
+            except (IndexError,TypeError,ValueError):
+                return make_response({
+                    "error":"Invalid cursor"
+                },400)
+            query=query.filter(or_(ranked.c.rank>rank,and_(ranked.c.rank==rank,Parcel.id>last_id)))
+        only=tuple(fields) if fields else None
+        rows=query.options(*eager(Parcel,only=only+('id',) if only else None)).order_by(ranked.c.rank,Parcel.id).limit(limit+1).all()
+        rows,next_cursor=page(rows,limit,lambda row:encode_cursor(row[1],row[0].id))
+        
+        return make_response({
+            "parcels":serialize_many([parcel for parcel,_ in rows],Parcel,only=only),
+            "next_cursor":next_cursor
+        },200)
+
+api.add_resource(ParcelSearch,'/parcels/search')
+
+def _cursor_id(cursor):
+    try:
+        return int(cursor[0])
+    except (IndexError,TypeError,ValueError):
+        return None
+
+def _my_parcel_ids(column,user_id,before,limit,*criteria):
+    #each side walks its own index, sender_id and recipient_id indexes are ordered by id within a user
+    query=select(Parcel.id).where(column==user_id,*criteria)
+    if before is not None:
+        query=query.where(Parcel.id<before)
+    return select(query.order_by(Parcel.id.desc()).limit(limit).subquery())
+
+class MyParcels(Resource):
+    @jwt_required()
+    def get(self):
+        args=request.args
+        try:
+            limit=page_size(args)
+            cursor=decode_cursor(args.get('cursor'))
+            fields=parse_fields(args,PARCEL_FIELDS)
+        except PaginationError as error:
+            return make_response({
+                "error":str(error)
+            },400)
+        before=None
+        if cursor:
+            before=_cursor_id(cursor)
+            if before is None:
+                return make_response({
+                    "error":"Invalid cursor"
+                },400)
+        
+        #parcels the user sent or receives, newest first: the next page from each index, merged
+        user_id=current_user.id
+        criteria=[Parcel.status==args['status']] if 'status' in args else []
+        ids=union(_my_parcel_ids(Parcel.sender_id,user_id,before,limit+1,*criteria),
+                  _my_parcel_ids(Parcel.recipient_id,user_id,before,limit+1,*criteria)).subquery()
+        query=Parcel.query.filter(Parcel.id.in_(select(ids.c.id)))
+        only=tuple(fields) if fields else None
+        query=query.options(*eager(Parcel,only=only+('id',) if only else None))
+        
+        parcels=query.order_by(Parcel.id.desc()).limit(limit+1).all()
+        parcels,next_cursor=page(parcels,limit,lambda parcel:encode_cursor(parcel.id))
+        
+        return make_response({
+            "parcels":serialize_many(parcels,Parcel,only=only),
+            "next_cursor":next_cursor
+        },200)
+
+api.add_resource(MyParcels,'/me/parcels')
+
+class Parcel_by_id(Resource):
+    @jwt_required()
+    @allow(['admin','customer_service','customer'])
+    def get(self,id):
+        parcel=Parcel.query.options(*eager(Parcel)).filter_by(id=id).first()
+        
+        if not parcel:
+            return make_response({
+                "error":"Parcel not found"
+            },400)
+        
+        return make_response(serialize(parcel),200)
+    
+    @jwt_required()
+    @allow(['admin','customer_service','customer'])
+    def delete(self,id):
+        parcel=Parcel.query.filter_by(id=id).first()
+        if not parcel:
+            return make_response({
+                "error":"Parcel not found"
+            },400)
+        
+        db.session.delete(parcel)
+        db.session.commit()
+        invalidate_tracking(parcel.tracking_number)
+        return make_response({
+            "message":"parcel successfully deleted"
+        },200)
+    
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def put(self,id):
+        parcel=Parcel.query.filter_by(id=id).first()
+        data=request.get_json()
+        if not parcel:
+            return make_response({
+                "error":"Parcel not found"
+            },400)
+        
+        tracking_number=parcel.tracking_number
+        for key,value in data.items():
+            setattr(parcel,key,value)
+        
+        db.session.commit()
+        invalidate_tracking(tracking_number,parcel.tracking_number)
+        
+        return make_response(serialize(parcel),200)
+
+api.add_resource(Parcel_by_id,'/parcels/<int:id>')
+
+################################################## VEHICLES RESOURCE ######################################
+
+#the public vehicle list is served from the shared response cache until one of these is bumped,
+#deleting a location clears location_id on its vehicles
+def vehicles_changed():
+    response_cache.bump('vehicles')
+
+def _vehicle_list():
+    vehicles=serialize_many(Vehicle.query.all(),Vehicle)
+    if not vehicles:
+        return make_response({
+            "message":"no vehicles found"
+        },200)
+    return make_response(vehicles,200)
+
+class Vehicles(Resource):
+    def get(self):
+        return response_cache.respond('vehicles',('vehicles','locations'),_vehicle_list)
+    
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def post(self):
+        data=request.get_json()
+        number_plate=data['number_plate']
+        capacity=data['capacity']
+        driver_name=data['driver_name']
+        driver_phone=data['driver_phone']
+        departure_time=data['departure_time']
+        expected_arrival_time=data['expected_arrival_time']
+        status=data['status']
+        location_id=data['location_id']
+        
+        location=Location.query.filter_by(id=location_id).first()
+        
+        if not location:
+            return make_response({
+                "error":"Please enter a valid location"
+            },400)
+        
+        if not number_plate or not capacity:
+            return make_response({
+                "error":"Please insert the number plate details of the vehicle"
+            },400)
+        
+        vehicle=Vehicle(number_plate=number_plate,
+                        capacity=capacity,
+                        driver_name=driver_name,
+                        departure_time=departure_time,
+                        expected_arrival_time=expected_arrival_time,
+                        driver_phone=driver_phone,
+                        status=status,
+                        location_id=location_id
+                        )
+        db.session.add(vehicle)
+        db.session.commit()
+        vehicles_changed()
+        
+        return make_response(serialize(vehicle),200)
+
+api.add_resource(Vehicles,'/vehicles')
+
+
+class Vehicle_by_id(Resource):
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def get(self,id):
+        vehicle=Vehicle.query.options(*eager(Vehicle,'detail')).filter_by(id=id).first()
+        
+        if not vehicle:
+            return make_response({
+                "error":"No vehicle found"
+            },400)
+        return make_response(serialize(vehicle,'detail'),200)
+    
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def delete(self,id):
+        vehicle=Vehicle.query.filter_by(id=id).first()
+        if not vehicle:
+            return make_response({
+                "error":"No vehicle found"
+            },400)
+        
+        db.session.delete(vehicle)
+        db.session.commit()
+        vehicles_changed()
+        
+        return make_response({
+            "message":"vehicle deleted"
+        },204)
+    
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def put(self,id):
+        vehicle=Vehicle.query.filter_by(id=id).first()
+        data=request.get_json()
+        if not vehicle:
+            return make_response({
+                "error":"No vehicle found"
+            },400)
+        
+        for key,value in data.items():
+            setattr(vehicle,key,value)
+        
+        db.session.commit()
+        vehicles_changed()
+        
+        return make_response(serialize(vehicle),200)
+
+api.add_resource(Vehicle_by_id,'/vehicles/<int:id>')
+
+################################################### LOCATION RESOURCE ############################################################
+
+#everything derived from the locations table that has to be rebuilt after a write
+def locations_changed():
+    response_cache.bump('locations')
+    rate_table.invalidate()
+    tracking_cache.clear()
+
+def _location_list():
+    locations=serialize_many(Location.query.all(),Location)
+    
+    if  not locations:
+        return make_response({
+            "error":"No location is found"
+        },400)
+    
+    return make_response(locations,200)
+
+class Locations(Resource):
+    def get(self):
+        return response_cache.respond('locations',('locations',),_location_list)
+    
+    @jwt_required()
+    @allow(['admin'])
+    def post(self):
+        data=request.get_json()
+        origin=data['origin']
+        destination=data['destination']
+        cost_per_kg=data['cost_per_kg']
+        
+        if not origin or not destination or not cost_per_kg:
+            return make_response({
+                "error":"please enter all the details the origin ,destination and cost_per_kg"
+            },400)
+        
+        location=Location(origin=origin,destination=destination,cost_per_kg=cost_per_kg)
+        db.session.add(location)
+        db.session.commit()
+        locations_changed()
+        
+        return make_response(serialize(location),200)
+    
+    @jwt_required()
+    @allow(['admin'])
+    def delete(self):
+        locations=Location.query.first()
+        
+        if  not locations:
+            return make_response({
+                "error":"No location is found"
+            },400)
+        
+        Location.query.delete()
+        RouteSummary.query.delete()
+        db.session.commit()
+        locations_changed()
+        
+        return make_response({
+            "message":"All Locations  have been deleted"
+        },200)
+        
+api.add_resource(Locations,'/locations')
+
+class Locations_by_id(Resource):
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def get(self,id):
+        location=Location.query.options(*eager(Location,'detail')).filter_by(id=id).first()
+        
+        if not location:
+            return make_response({
+                "error":"No location is found"
+            },400)
+            
+        return make_response(serialize(location,'detail'),200)
+    
+    @jwt_required()
+    @allow(['admin'])
+    def delete(self,id):
+        location=Location.query.filter_by(id=id).first()
+        if not location:
+            return make_response({
+                "error":"No location is found"
+            },400)
+        
+        db.session.delete(location)
+        db.session.commit()
+        locations_changed()
+        
+        return make_response({
+            "body":"Location is deleted"
+        },204)
+    
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def put(self,id):
+        location=Location.query.filter_by(id=id).first()
+        data=request.get_json()
+        if not location:
+            return make_response({
+                "error":"No location is found"
+            },400)
+        
+        for key,value in data.items():
+            setattr(location,key,value)
+        
+        db.session.commit()
+        locations_changed()
+        return make_response(serialize(location),200)
+
+api.add_resource(Locations_by_id,'/locations/<int:id>')
+
+################################################# CUSTOMER SERVICE RESOURCE ######################################################
+class Userparcels(Resource):
+    
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def get(self,id):
+        user=User.query.filter_by(id=id).first()
+        
+        if not user or user.role not in ['customer_service','admin']:
+            return make_response({"error": "Invalid user ID or Insufficient user role"}, 400)
+        
+        args=request.args
+        try:
+            limit=page_size(args)
+            cursor=decode_cursor(args.get('cursor'))
+        except PaginationError as error:
+            return make_response({
+                "error":str(error)
+            },400)
+        
+        #newest assignments first, keyset on the assignment id so the user_id index serves every page
+        query=db.session.query(Parcel,UserParcelAssignment.id).join(UserParcelAssignment)\
+            .filter(UserParcelAssignment.user_id==id).options(*eager(Parcel))
+        if cursor:
+            before=_cursor_id(cursor)
+            if before is None:
+                return make_response({
+                    "error":"Invalid cursor"
+                },400)
+            query=query.filter(UserParcelAssignment.id<before)
+        rows=query.order_by(UserParcelAssignment.id.desc()).limit(limit+1).all()
+        rows,next_cursor=page(rows,limit,lambda row:encode_cursor(row[1]))
+        
+        return make_response({
+            "parcels":serialize_many([parcel for parcel,_ in rows],Parcel),
+            "next_cursor":next_cursor
+        },200)
+    
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def delete(self,id):
+        user=User.query.filter_by(id=id).first()
+        
+        if not user or user.role not in ['admin']:
+            return make_response({"error": "Invalid user ID or Insufficient user role"}, 400)
+        
+        userParcel=UserParcelAssignment.query.filter_by(user_id=id).first()
+        db.session.delete(userParcel)
+        db.session.commit()
+        
+        return make_response({
+            "message":"Assignment is deleted"
+        },204)
+
+api.add_resource(Userparcels,'/assignments/<int:id>')
@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime,timezone
+from models import db,TokenBlocklist
+from cache import TTLCache
+from replicas import on_primary
+from background import FirstUse,daemon
+
+logger=logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed size set of strings that can answer "definitely not present" without false negatives."""
+
+    def __init__(self,capacity,error_rate=0.001):
+        self.capacity=max(capacity,1)
+        self.size=max(int(-self.capacity*math.log(error_rate)/math.log(2)**2),8)
+        self.hash_count=max(int(round(self.size/self.capacity*math.log(2))),1)
+        self.bits=bytearray((self.size+7)//8)
+        self.count=0
+
+    def _positions(self,key):
+        digest=hashlib.blake2b(key.encode(),digest_size=16).digest()
+        first=int.from_bytes(digest[:8],'little')
+        second=int.from_bytes(digest[8:],'little')|1
+        return [(first+i*second)%self.size for i in range(self.hash_count)]
+
+    def add(self,key):
+        for position in self._positions(key):
+            self.bits[position>>3]|=1<<(position&7)
+        self.count+=1
+
+    def __contains__(self,key):
+        return all(self.bits[position>>3]&(1<<(position&7)) for position in self._positions(key))
+
+
+class TokenBlocklistCache:
+    """Process local view of the token blocklist.
+
+    Tokens revoked in this process are answered from a TTL cache. Every other jti is checked
+    against a Bloom filter of the whole table, kept current by fetching rows with a higher id
+    at most every JWT_BLOCKLIST_SYNC_SECONDS, so a token revoked by another worker is honoured
+    after that delay at the latest. Only Bloom filter hits go to the database.
+    """
+
+    def __init__(self,app=None):
+        self.app=None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self,app):
+        app.config.setdefault('JWT_BLOCKLIST_SYNC_SECONDS',1)
+        app.config.setdefault('JWT_BLOCKLIST_PURGE_SECONDS',3600)
+        app.config.setdefault('JWT_BLOCKLIST_CACHE_SIZE',10000)
+        app.config.setdefault('JWT_BLOCKLIST_BLOOM_CAPACITY',100000)
+        self.app=app
+        self.sync_seconds=app.config['JWT_BLOCKLIST_SYNC_SECONDS']
+        self.purge_seconds=app.config['JWT_BLOCKLIST_PURGE_SECONDS']
+        self.retention=app.config['JWT_REFRESH_TOKEN_EXPIRES']
+        self.revoked=TTLCache(maxsize=app.config['JWT_BLOCKLIST_CACHE_SIZE'],
+                              ttl=app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds())
+        self.bloom_capacity=app.config['JWT_BLOCKLIST_BLOOM_CAPACITY']
+        self.bloom=None
+        self.last_id=0
+        self.synced_at=0
+        self._lock=threading.Lock()
+        self._purger=FirstUse(lambda:daemon(self._purge_forever,'blocklist-purge'))
+        app.extensions['token_blocklist']=self
+
+    def is_revoked(self,jti):
+        if jti in self.revoked:
+            return True
+        self._ensure_purger()
+        #a lagging replica would let a revoked token through, the blocklist is read from the primary
+        with on_primary():
+            if time.monotonic()-self.synced_at>=self.sync_seconds:
+                self.sync()
+            if jti not in self.bloom:
+                return False
+            if db.session.query(TokenBlocklist.id).filter_by(jti=jti).first() is None:
+                return False
+        self.revoked.set(jti,True)
+        return True
+
+    def revoke(self,jti):
+        """Commit jti's blocklist row with the request's session, then reject it in this process.
+
+        Other workers pick the row up at their next sync. The cache and Bloom filter are only
+        updated once the row is committed, so a failed write is not hidden by this worker.
+        """
+        db.session.add(TokenBlocklist(jti=jti,created_at=datetime.now(timezone.utc)))
+        db.session.commit()
+        self.revoked.set(jti,True)
+        with self._lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def sync(self):
+        with self._lock:
+            if self.bloom is None:
+                self._reload()
+            else:
+                rows=db.session.query(TokenBlocklist.id,TokenBlocklist.jti)\
+                    .filter(TokenBlocklist.id>self.last_id).order_by(TokenBlocklist.id).all()
+                for row_id,jti in rows:
+                    self.bloom.add(jti)
+                    self.last_id=row_id
+                #a Bloom filter cannot grow, past its capacity the false positive rate climbs
+                if self.bloom.count>self.bloom.capacity:
+                    self._reload()
+            self.synced_at=time.monotonic()
+
+    def _reload(self):
+        count=db.session.query(TokenBlocklist.id).count()
+        bloom=BloomFilter(max(self.bloom_capacity,count*2))
+        last_id=0
+        for row_id,jti in db.session.query(TokenBlocklist.id,TokenBlocklist.jti).yield_per(5000):
+            bloom.add(jti)
+            last_id=max(last_id,row_id)
+        self.bloom=bloom
+        self.last_id=last_id
+
+    def purge(self):
+        """Delete rows older than the refresh token lifetime, no token they block is still valid."""
+        cutoff=datetime.now(timezone.utc)-self.retention
+        deleted=TokenBlocklist.query.filter(TokenBlocklist.created_at<cutoff).delete(synchronize_session=False)
+        db.session.commit()
+        if deleted:
+            with self._lock:
+                self._reload()
+        return deleted
+
+    def _ensure_purger(self):
+        if self.purge_seconds:
+            self._purger.get()
+
+    def _purge_forever(self):
+        while True:
+            time.sleep(self.purge_seconds)
+            with self.app.app_context():
+                try:
+                    deleted=self.purge()
+                    if deleted:
+                        logger.info("Purged %s expired token blocklist entries",deleted)
+                except Exception:
+                    logger.exception("Token blocklist purge failed")
+                    db.session.rollback()
+
+
+blocklist=TokenBlocklistCache()
@@ -0,0 +1,190 @@
+import re
+from contextlib import contextmanager
+from models import db,User,Parcel
+from sqlalchemy import DDL,and_,event,func,literal_column,select,text
+from flask.cli import AppGroup
+
+# Full-text indexes: an external-content FTS5 table kept in sync by triggers on SQLite,
+# a GIN index over to_tsvector('simple', ...) on Postgres. Both are created with the table
+# (db.create_all) and by the migrations, and queried through FullTextIndex.match().
+
+TOKEN=re.compile(r'\w+',re.UNICODE)
+
+
+class FullTextIndex:
+    def __init__(self,name,table,columns):
+        self.name=name
+        self.table=table
+        self.columns=columns
+        for statement in self.sqlite_ddl():
+            event.listen(table,'after_create',DDL(statement).execute_if(dialect='sqlite'))
+        event.listen(table,'after_create',DDL(self.postgresql_ddl()).execute_if(dialect='postgresql'))
+        event.listen(table,'before_drop',DDL(f"DROP TABLE IF EXISTS {name}").execute_if(dialect='sqlite'))
+
+    def sqlite_ddl(self):
+        table=self.table.name
+        columns=', '.join(self.columns)
+        new_values=', '.join(f'new.{column}' for column in self.columns)
+        old_values=', '.join(f'old.{column}' for column in self.columns)
+        delete_old=f"INSERT INTO {self.name}({self.name}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+        insert_new=f"INSERT INTO {self.name}(rowid, {columns}) VALUES (new.id, {new_values});"
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.name} USING fts5({columns}, content='{table}', content_rowid='id')",
+            f"CREATE TRIGGER IF NOT EXISTS {self.name}_insert AFTER INSERT ON {table} BEGIN {insert_new} END",
+            f"CREATE TRIGGER IF NOT EXISTS {self.name}_delete AFTER DELETE ON {table} BEGIN {delete_old} END",
+            f"CREATE TRIGGER IF NOT EXISTS {self.name}_update AFTER UPDATE OF {columns} ON {table} BEGIN {delete_old} {insert_new} END",
+        ]
+
+    def postgresql_ddl(self):
+        return f"CREATE INDEX IF NOT EXISTS ix_{self.name} ON {self.table.name} USING gin (to_tsvector('simple', {self._document()}))"
+
+    def _document(self,prefix=''):
+        return " || ' ' || ".join(f"coalesce({prefix}{column}, '')" for column in self.columns)
+
+    def match(self,query):
+        """A clause true for the rows of the table whose words start with every word of query."""
+        tokens=TOKEN.findall(query)
+        if not tokens:
+            return None
+        if db.engine.dialect.name=='postgresql':
+            #written out in full so the expression matches the one the GIN index was built on
+            terms=' & '.join(f'{token}:*' for token in tokens)
+            document=self._document(prefix=self.table.name+'.')
+            return text(f"to_tsvector('simple', {document}) @@ to_tsquery('simple', :terms)").bindparams(terms=terms)
+        terms=' AND '.join(f'"{token}"*' for token in tokens)
+        matches=select(text('rowid')).select_from(text(self.name)).where(text(f'{self.name} MATCH :terms'))
+        return self.table.c.id.in_(matches.params(terms=terms))
+
+    def rebuild(self):
+        if db.engine.dialect.name=='sqlite':
+            db.session.execute(text(f"INSERT INTO {self.name}({self.name}) VALUES ('rebuild')"))
+            db.session.commit()
+
+    @contextmanager
+    def deferred(self):
+        """Skip the insert trigger during a bulk load and index every row in one pass afterwards."""
+        if db.engine.dialect.name!='sqlite':
+            yield
+            return
+        db.session.execute(text(f"DROP TRIGGER IF EXISTS {self.name}_insert"))
+        try:
+            yield
+        finally:
+            for statement in self.sqlite_ddl():
+                db.session.execute(text(statement))
+            self.rebuild()
+
+
+class ParcelIndex(FullTextIndex):
+    """Ranked substring search over parcels and the names of their sender and recipient.
+
+    On SQLite an FTS5 table with the trigram tokenizer holds its own copy of each parcel's
+    text and party names, so a fragment of a tracking number matches as well as a word,
+    kept in sync by triggers on parcels and on renames in users and ranked with bm25. On
+    Postgres pg_trgm GIN indexes serve ILIKE over the parcel columns and the user names,
+    ranked by similarity. Terms shorter than a trigram are ignored.
+    """
+    PARTIES=('sender','recipient')
+    # bm25 weight of each column, in the order of the FTS5 table
+    WEIGHTS={'name':5.0,'description':1.0,'tracking_number':10.0,'sender':3.0,'recipient':3.0}
+
+    def __init__(self,name,table,columns):
+        event.listen(table,'after_create',DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect='postgresql'))
+        super().__init__(name,table,columns)
+        event.listen(table,'before_drop',DDL(f"DROP TRIGGER IF EXISTS {name}_party").execute_if(dialect='sqlite'))
+        event.listen(table,'after_create',DDL(self.postgresql_users_ddl()).execute_if(dialect='postgresql'))
+
+    def _values(self,row):
+        parties=', '.join(f"(SELECT name FROM users WHERE id = {row}.{party}_id)" for party in self.PARTIES)
+        return f"{row}.id, "+', '.join(f'{row}.{column}' for column in self.columns)+f", {parties}"
+
+    def _fts_columns(self):
+        return ', '.join(self.columns+list(self.PARTIES))
+
+    def sqlite_ddl(self):
+        table=self.table.name
+        watched=', '.join(self.columns+[f'{party}_id' for party in self.PARTIES])
+        delete_old=f"DELETE FROM {self.name} WHERE rowid = old.id;"
+        insert_new=f"INSERT INTO {self.name}(rowid, {self._fts_columns()}) SELECT {self._values('new')};"
+        rename=' '.join(f"UPDATE {self.name} SET {party} = new.name WHERE rowid IN "
+                        f"(SELECT id FROM {table} WHERE {party}_id = new.id);" for party in self.PARTIES)
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.name} USING fts5({self._fts_columns()}, tokenize='trigram')",
+            f"CREATE TRIGGER IF NOT EXISTS {self.name}_insert AFTER INSERT ON {table} BEGIN {insert_new} END",
+            f"CREATE TRIGGER IF NOT EXISTS {self.name}_delete AFTER DELETE ON {table} BEGIN {delete_old} END",
+            f"CREATE TRIGGER IF NOT EXISTS {self.name}_update AFTER UPDATE OF {watched} ON {table} BEGIN {delete_old} {insert_new} END",
+            f"CREATE TRIGGER IF NOT EXISTS {self.name}_party AFTER UPDATE OF name ON users BEGIN {rename} END",
+        ]
+
+    def postgresql_ddl(self):
+        return f"CREATE INDEX IF NOT EXISTS ix_{self.name} ON {self.table.name} USING gin (({self._document()}) gin_trgm_ops)"
+
+    def postgresql_users_ddl(self):
+        return f"CREATE INDEX IF NOT EXISTS ix_{self.name}_users ON users USING gin (name gin_trgm_ops)"
+
+    def terms(self,query):
+        return [token for token in TOKEN.findall(query) if len(token)>=3]
+
+    def ranked(self,query):
+        """An (id, rank) subquery of the parcels matching every term of query, best first by ascending rank."""
+        terms=self.terms(query)
+        if not terms:
+            return None
+        if db.engine.dialect.name=='postgresql':
+            document=self._document(prefix=self.table.name+'.')
+            matches=[]
+            params={}
+            for index,term in enumerate(terms):
+                params[f'term_{index}']='%'+term.replace('_','\\_')+'%'
+                parties=' OR '.join(f"{self.table.name}.{party}_id IN (SELECT id FROM users WHERE name ILIKE :term_{index})"
+                                    for party in self.PARTIES)
+                matches.append(f"(({document}) ILIKE :term_{index} OR {parties})")
+            rank=(-func.similarity(literal_column(f"({document})"),' '.join(terms))).label('rank')
+            return select(self.table.c.id.label('id'),rank)\
+                .where(text(' AND '.join(matches)).bindparams(**params)).subquery('ranked')
+        weights=', '.join(str(self.WEIGHTS[column]) for column in self.columns+list(self.PARTIES))
+        #each term quoted, a trigram table matches it anywhere in a column
+        terms=' AND '.join(f'"{term}"' for term in terms)
+        return select(literal_column(f'{self.name}.rowid').label('id'),
+                      literal_column(f'bm25({self.name}, {weights})').label('rank'))\
+            .select_from(text(self.name)).where(text(f'{self.name} MATCH :terms').bindparams(terms=terms))\
+            .subquery('ranked')
+
+    def rebuild(self):
+        if db.engine.dialect.name=='sqlite':
+            parties=' '.join(f"LEFT JOIN users AS {party} ON {party}.id = {self.table.name}.{party}_id" for party in self.PARTIES)
+            values=f"{self.table.name}.id, "+', '.join(f'{self.table.name}.{column}' for column in self.columns)\
+                +', '+', '.join(f'{party}.name' for party in self.PARTIES)
+            db.session.execute(text(f"DELETE FROM {self.name}"))
+            db.session.execute(text(f"INSERT INTO {self.name}(rowid, {self._fts_columns()}) "
+                                    f"SELECT {values} FROM {self.table.name} {parties}"))
+            db.session.execute(text(f"INSERT INTO {self.name}({self.name}) VALUES ('optimize')"))
+            db.session.commit()
+
+
+users_index=FullTextIndex('users_fts',User.__table__,['name'])
+parcels_index=ParcelIndex('parcels_fts',Parcel.__table__,['name','description','tracking_number'])
+INDEXES=[users_index,parcels_index]
+
+
+search_cli=AppGroup('search',help="Full-text search indexes.")
+
+
+@search_cli.command('rebuild')
+def rebuild_indexes():
+    """Reindex every row, for data loaded while the triggers were missing."""
+    for index in INDEXES:
+        index.rebuild()
+        print(f"Rebuilt {index.name}")
+
+
+def include_name(name,type_,parent_names):
+    """Keep the FTS5 tables and their shadow tables out of migration autogenerate."""
+    if type_=='table':
+        return not any(name==index.name or name.startswith(index.name+'_') for index in INDEXES)
+    return True
+
+
+def prefix_range(column,prefix):
+    """column LIKE 'prefix%' written as a range, so a plain B-tree index serves it on any database."""
+    return and_(column>=prefix,column<prefix+'\U0010ffff')
@@ -1,6 +1,230 @@
-from models import db,User,Parcel,Vehicle,Location,UserParcelAssignment
-from app import app
+"""Recreate the tables and fill them with synthetic data.
 
-with app.app_context():
+Run from the server directory:
+
+    python seed.py                                   # small demo dataset
+    python seed.py --parcels 1000000 --users 100000  # load testing volumes
+
+Rows go in with executemany INSERTs in chunks, so memory stays flat and millions of
+parcels load in seconds. Every user's password is password123, the first user is an
+admin with phone number 0700000000.
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import timedelta
+from models import db,User,Parcel,Vehicle,Location,UserParcelAssignment,TokenBlocklist,local_now
+from shared_cache import response_cache
+from search import users_index,parcels_index
+from werkzeug.security import generate_password_hash
+
+CHUNK=20000
+PASSWORD='password123'
+ADMIN_PHONE='0700000000'
+TOWNS=('Nairobi','Mombasa','Kisumu','Nakuru','Eldoret','Thika','Malindi','Kitale','Garissa','Kakamega',
+       'Nyeri','Machakos','Meru','Lamu','Naivasha','Kericho','Embu','Isiolo','Voi','Narok')
+FIRST_NAMES=('Wanjiru','Otieno','Achieng','Kamau','Njeri','Mwangi','Akinyi','Kiptoo','Chebet','Omondi',
+             'Wambui','Mutua','Atieno','Kibet','Nyambura','Odhiambo','Jepkosgei','Karanja','Adhiambo','Barasa')
+LAST_NAMES=('Kariuki','Ochieng','Wekesa','Kiprono','Muthoni','Onyango','Njoroge','Rotich','Wafula','Maina',
+            'Owino','Chege','Langat','Mugo','Okoth','Gitau','Korir','Nduta','Simiyu','Kimani')
+STATUSES=('pending','in_transit','delivered')
+STATUS_WEIGHTS=(3,3,4)
+# share of customer_service staff among the generated users, the rest are customers
+STAFF_SHARE=0.05
+
+
+def _chunks(rows):
+    chunk=[]
+    for row in rows:
+        chunk.append(row)
+        if len(chunk)==CHUNK:
+            yield chunk
+            chunk=[]
+    if chunk:
+        yield chunk
+
+
+def _insert(model,rows):
+    """executemany rows into model's table CHUNK at a time. Returns how many went in.
+
+    The INSERT is compiled once and the rows go to the driver as they are, with only each
+    column's bind processor applied: building SQLAlchemy parameters per row costs more
+    than the database spends writing them.
+    """
+    connection=db.session.connection()
+    dialect=connection.dialect
+    table=model.__table__
+    count=0
+    statement=None
+    for chunk in _chunks(rows):
+        if statement is None:
+            compiled=table.insert().compile(dialect=dialect,column_keys=list(chunk[0]))
+            statement=str(compiled)
+            keys=compiled.positiontup if compiled.positional else list(chunk[0])
+            processors=[(key,table.c[key].type.dialect_impl(dialect).bind_processor(dialect)) for key in keys]
+        if compiled.positional:
+            params=[tuple(process(row[key]) if process else row[key] for key,process in processors) for row in chunk]
+        else:
+            params=[{key:process(row[key]) if process else row[key] for key,process in processors} for row in chunk]
+        connection.exec_driver_sql(statement,params)
+        count+=len(chunk)
+    return count
+
+
+def _users(count,password):
+    for index in range(count):
+        if index==0:
+            role='admin'
+        else:
+            role='customer_service' if random.random()<STAFF_SHARE else 'customer'
+        yield {
+            "name":f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)} {index}",
+            "phone_number":f"07{index:08d}",
+            "email":f"user{index}@example.com",
+            "password":password,
+            "role":role
+        }
+
+
+def _locations(count):
+    for _ in range(count):
+        origin,destination=random.sample(TOWNS,2)
+        yield {"origin":origin,"destination":destination,"cost_per_kg":round(random.uniform(50,300),2)}
+
+
+def _vehicles(count,locations):
+    for index in range(count):
+        yield {
+            "number_plate":f"KBX {index:05d}",
+            "capacity":float(random.randrange(500,5001,50)),
+            "driver_name":f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}",
+            "driver_phone":f"072{index:07d}",
+            "status":random.choice(('empty','loading','in_transit')),
+            "location_id":index%locations+1 if locations else None
+        }
+
+
+def _parcels(count,customers,rates,vehicles_by_location,days):
+    #created_at grows with the id like it does in production, spread evenly over the window
+    start=local_now()-timedelta(days=days)
+    step=days*86400/max(count,1)
+    customers=customers or [None]
+    locations=list(range(1,len(rates)+1)) or [None]
+    for first in range(0,count,CHUNK):
+        size=min(CHUNK,count-first)
+        #random values drawn a chunk at a time, one call each instead of one per parcel
+        statuses=random.choices(STATUSES,STATUS_WEIGHTS,k=size)
+        senders=random.choices(customers,k=size)
+        recipients=random.choices(customers,k=size)
+        location_ids=random.choices(locations,k=size)
+        for index,status,sender_id,recipient_id,location_id in zip(range(first,first+size),statuses,senders,recipients,location_ids):
+            weight=round(random.uniform(0.5,60),1)
+            vehicles=vehicles_by_location.get(location_id)
+            yield {
+                "name":f"Parcel {index}",
+                "description":"Synthetic parcel",
+                "tracking_number":f"MW{index:010d}",
+                "weight":weight,
+                "status":status,
+                "shipping_cost":round(rates[location_id-1]*weight,2) if location_id else None,
+                "created_at":start+timedelta(seconds=index*step),
+                "sender_id":sender_id,
+                "recipient_id":recipient_id,
+                "location_id":location_id,
+                "vehicle_id":random.choice(vehicles) if vehicles and random.random()<0.7 else None
+            }
+
+
+def _assignments(count,staff,parcels):
+    for first in range(0,count,CHUNK):
+        size=min(CHUNK,count-first)
+        for index,user_id in zip(range(first,first+size),random.choices(staff,k=size)):
+            yield {"user_id":user_id,"parcel_id":index%parcels+1}
+
+
+def _blocklist(count):
+    now=local_now()
+    for _ in range(count):
+        yield {"jti":str(uuid.uuid4()),"created_at":now-timedelta(seconds=random.randrange(7200))}
+
+
+def generate(users=1000,locations=50,vehicles=200,parcels=10000,assignments=None,blocklist=1000,days=90,seed=None,log=print):
+    """Drop every table and load the requested volumes. Needs an app context."""
+    from stats import rebuild
+
+    random.seed(seed)
     db.drop_all()
-    db.create_all()
\ No newline at end of file
+    db.create_all()
+    users=max(users,1)
+    if assignments is None:
+        assignments=parcels
+
+    connection=db.session.connection()
+    if connection.dialect.name=='sqlite':
+        #a throwaway dataset, durability is not worth the fsyncs
+        connection.exec_driver_sql('PRAGMA synchronous=OFF')
+        connection.exec_driver_sql('PRAGMA cache_size=-262144')
+
+    def load(model,rows):
+        started=time.perf_counter()
+        #filling a table and indexing it afterwards beats updating every index row by row
+        indexes=list(model.__table__.indexes)
+        for index in indexes:
+            index.drop(db.session.connection())
+        count=_insert(model,rows)
+        for index in indexes:
+            index.create(db.session.connection())
+        db.session.commit()
+        log(f"{model.__tablename__}: {count} rows in {time.perf_counter()-started:.2f}s")
+
+    #one hash for everybody, hashing a million passwords would take hours
+    #the search indexes are filled in one pass after the load instead of by their triggers row by row
+    with users_index.deferred():
+        load(User,_users(users,generate_password_hash(PASSWORD)))
+    load(Location,_locations(locations))
+    load(Vehicle,_vehicles(vehicles,locations))
+
+    #tables start empty, so ids run 1..n in insert order
+    roles=dict(db.session.query(User.id,User.role).all())
+    customers=[user_id for user_id,role in roles.items() if role=='customer'] or list(roles)
+    staff=[user_id for user_id,role in roles.items() if role!='customer']
+    rates=[cost for (cost,) in db.session.query(Location.cost_per_kg).order_by(Location.id)]
+    vehicles_by_location={}
+    for vehicle_id,location_id in db.session.query(Vehicle.id,Vehicle.location_id):
+        vehicles_by_location.setdefault(location_id,[]).append(vehicle_id)
+
+    with parcels_index.deferred():
+        load(Parcel,_parcels(parcels,customers,rates,vehicles_by_location,days))
+    if parcels:
+        load(UserParcelAssignment,_assignments(assignments,staff,parcels))
+    load(TokenBlocklist,_blocklist(blocklist))
+
+    started=time.perf_counter()
+    rebuild()
+    log(f"summaries rebuilt in {time.perf_counter()-started:.2f}s")
+    if response_cache.path:
+        response_cache.bump('locations','vehicles')
+
+
+def main():
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users',type=int,default=1000)
+    parser.add_argument('--locations',type=int,default=50)
+    parser.add_argument('--vehicles',type=int,default=200)
+    parser.add_argument('--parcels',type=int,default=10000)
+    parser.add_argument('--assignments',type=int,default=None,help="defaults to one per parcel")
+    parser.add_argument('--blocklist',type=int,default=1000)
+    parser.add_argument('--days',type=int,default=90,help="spread parcel creation over this many days")
+    parser.add_argument('--seed',type=int,default=None)
+    args=parser.parse_args()
+
+    from app import create_app
+    app=create_app()
+    with app.app_context():
+        generate(users=args.users,locations=args.locations,vehicles=args.vehicles,parcels=args.parcels,
+                 assignments=args.assignments,blocklist=args.blocklist,days=args.days,seed=args.seed)
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,117 @@
+from functools import lru_cache
+from datetime import datetime,date,time
+from sqlalchemy.orm import load_only,selectinload
+from sqlalchemy.orm.interfaces import MANYTOONE
+from models import User,Parcel,Vehicle,Location,UserParcelAssignment,ParcelEvent
+
+# same formats SerializerMixin.to_dict() used, so the responses keep their shape
+DATETIME_FORMAT='%Y-%m-%d %H:%M:%S'
+DATE_FORMAT='%Y-%m-%d'
+TIME_FORMAT='%H:%M'
+
+USER_COLUMNS=('id','name','phone_number','email','role')
+PARCEL_COLUMNS=('id','name','description','tracking_number','weight','status','shipping_cost','created_at',
+                'sender_id','recipient_id','location_id','vehicle_id')
+VEHICLE_COLUMNS=('id','number_plate','capacity','driver_name','driver_phone','departure_time',
+                 'expected_arrival_time','status','location_id')
+LOCATION_COLUMNS=('id','origin','destination','cost_per_kg')
+
+# A shape lists the columns of a model to serialize and the relationships to nest,
+# as (relationship, shape of the related model). The password hash is never part of a shape.
+SHAPES={
+    User:{
+        'default':USER_COLUMNS,
+    },
+    Parcel:{
+        'default':PARCEL_COLUMNS+(('sender','default'),('recipient','default')),
+    },
+    Vehicle:{
+        'default':VEHICLE_COLUMNS,
+        'detail':VEHICLE_COLUMNS+(('parcels','default'),),
+    },
+    Location:{
+        'default':LOCATION_COLUMNS,
+        'detail':LOCATION_COLUMNS+(('vehicles','default'),),
+    },
+    UserParcelAssignment:{
+        'default':('id','user_id','parcel_id',('user','default'),('parcel','default')),
+    },
+    ParcelEvent:{
+        'default':('id','parcel_id','status','vehicle_id','location_id','created_at'),
+    },
+}
+
+
+def _format(value):
+    if isinstance(value,datetime):
+        return value.strftime(DATETIME_FORMAT)
+    if isinstance(value,date):
+        return value.strftime(DATE_FORMAT)
+    if isinstance(value,time):
+        return value.strftime(TIME_FORMAT)
+    return value
+
+
+def _fields(model,shape,only):
+    fields=SHAPES[model][shape]
+    if only is None:
+        return fields
+    return tuple(field for field in fields if (field[0] if isinstance(field,tuple) else field) in only)
+
+
+@lru_cache(maxsize=256)
+def compile_serializer(model,shape='default',only=None):
+    """Build the function that turns one instance into a dict, once per model, shape and projection."""
+    columns=[]
+    nested=[]
+    for field in _fields(model,shape,only):
+        if isinstance(field,tuple):
+            name,nested_shape=field
+            relationship=getattr(model,name).property
+            nested.append((name,relationship.uselist,compile_serializer(relationship.mapper.class_,nested_shape)))
+        else:
+            columns.append(field)
+    columns=tuple(columns)
+    nested=tuple(nested)
+
+    def serializer(instance):
+        data={name:_format(getattr(instance,name)) for name in columns}
+        for name,uselist,serialize_related in nested:
+            related=getattr(instance,name)
+            if uselist:
+                data[name]=[serialize_related(item) for item in related]
+            else:
+                data[name]=serialize_related(related) if related is not None else None
+        return data
+    return serializer
+
+
+@lru_cache(maxsize=256)
+def eager(model,shape='default',only=None):
+    """Loader options that fetch everything a shape touches in a fixed number of queries."""
+    options=[]
+    columns=[]
+    for field in _fields(model,shape,only):
+        if isinstance(field,tuple):
+            name,nested_shape=field
+            relationship=getattr(model,name)
+            loader=selectinload(relationship)
+            child_options=eager(relationship.property.mapper.class_,nested_shape)
+            options.append(loader.options(*child_options) if child_options else loader)
+            #a many-to-one needs its foreign key loaded even when the projection leaves it out
+            if relationship.property.direction is MANYTOONE:
+                columns.extend(getattr(model,column.key) for column in relationship.property.local_columns)
+        else:
+            columns.append(getattr(model,field))
+    if only is not None:
+        options.append(load_only(*columns))
+    return tuple(options)
+
+
+def serialize(instance,shape='default',only=None):
+    return compile_serializer(type(instance),shape,only)(instance)
+
+
+def serialize_many(instances,model,shape='default',only=None):
+    serializer=compile_serializer(model,shape,only)
+    return [serializer(instance) for instance in instances]
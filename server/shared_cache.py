@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from flask import Response,request
+from replicas import on_primary
+from encoding import negotiated_mimetype,compression
+
+SCHEMA=(
+    "CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL, changed_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, versions TEXT NOT NULL, stored_at REAL NOT NULL, "
+    "status INTEGER NOT NULL, mimetype TEXT NOT NULL, etag TEXT NOT NULL, encoding TEXT, body BLOB NOT NULL)",
+)
+RESPONSE_COLUMNS=('key','versions','stored_at','status','mimetype','etag','encoding','body')
+
+
+class ResponseCache:
+    """Rendered responses shared by every worker on the host through a small SQLite file.
+
+    Each cached collection depends on named version counters that writers bump after they
+    commit. A response is stored with the versions it was rendered at and served until one of
+    them moves, so a write in any worker invalidates every worker's copy at once. Responses
+    carry an ETag of the body and a Last-Modified from the latest bump, and conditional
+    requests get a 304. RESPONSE_CACHE_TTL bounds how long a change made outside
+    the app (a migration, seed.py) can go unnoticed. Each content encoding the clients ask
+    for is stored already compressed, so a hit is served without compressing it again.
+    """
+
+    def __init__(self,app=None):
+        self.path=None
+        self._local=threading.local()
+        self._memo={}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self,app):
+        uri=app.config['SQLALCHEMY_DATABASE_URI']
+        #one file per database, so a test run against another database never sees these entries
+        name=f"response-cache-{hashlib.sha1(uri.encode()).hexdigest()[:10]}.db"
+        app.config.setdefault('RESPONSE_CACHE_PATH',os.path.join(app.instance_path,name))
+        app.config.setdefault('RESPONSE_CACHE_TTL',300)
+        app.config.setdefault('RESPONSE_CACHE_MAX_AGE',0)
+        app.config.setdefault('RESPONSE_CACHE_SHARED_MAX_AGE',30)
+        self.path=app.config['RESPONSE_CACHE_PATH']
+        self.ttl=app.config['RESPONSE_CACHE_TTL']
+        self.cache_control=f"public, max-age={app.config['RESPONSE_CACHE_MAX_AGE']}, "\
+                           f"s-maxage={app.config['RESPONSE_CACHE_SHARED_MAX_AGE']}"
+        os.makedirs(os.path.dirname(self.path) or '.',exist_ok=True)
+        app.extensions['response_cache']=self
+
+    # one connection per thread and process, sqlite3 connections must not cross either
+    def _connection(self):
+        connection=getattr(self._local,'connection',None)
+        if connection is None or self._local.pid!=os.getpid():
+            connection=sqlite3.connect(self.path,timeout=5,isolation_level=None,check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            #a file written before the encoding column holds nothing worth keeping
+            columns=tuple(row[1] for row in connection.execute('PRAGMA table_info(responses)'))
+            if columns and columns!=RESPONSE_COLUMNS:
+                connection.execute('DROP TABLE responses')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection=connection
+            self._local.pid=os.getpid()
+        return connection
+
+    def versions(self,*names):
+        """{name: (version, changed_at)} for the given counters, unknown ones at (0, 0)."""
+        placeholders=','.join('?'*len(names))
+        rows=self._connection().execute(
+            f"SELECT name,version,changed_at FROM versions WHERE name IN ({placeholders})",names).fetchall()
+        found={name:(version,changed_at) for name,version,changed_at in rows}
+        return {name:found.get(name,(0,0.0)) for name in names}
+
+    def version(self,name):
+        return self.versions(name)[name][0]
+
+    def bump(self,*names):
+        """Mark the named collections as changed, call it after the write commits."""
+        now=time.time()
+        self._connection().executemany(
+            "INSERT INTO versions (name,version,changed_at) VALUES (?,1,?) "
+            "ON CONFLICT (name) DO UPDATE SET version=version+1,changed_at=excluded.changed_at",
+            [(name,now) for name in names])
+
+    def _stored(self,key,stamp):
+        entry=self._memo.get(key)
+        if entry is None or entry[0]!=stamp:
+            row=self._connection().execute(
+                "SELECT stored_at,status,mimetype,etag,encoding,body FROM responses WHERE key=? AND versions=?",
+                (key,stamp)).fetchone()
+            if row is None:
+                return None
+            entry=self._memo[key]=(stamp,)+row
+        if time.time()-entry[1]>self.ttl:
+            return None
+        return entry[2:]
+
+    def _store(self,key,stamp,status,mimetype,body):
+        stored_at=time.time()
+        #the ETag is of the body as rendered, every encoding of it shares it as a weak one
+        etag=hashlib.sha1(body).hexdigest()[:20]
+        body,encoding=compression.encode(body,mimetype)
+        self._connection().execute(
+            "INSERT OR REPLACE INTO responses (key,versions,stored_at,status,mimetype,etag,encoding,body) "
+            "VALUES (?,?,?,?,?,?,?,?)",
+            (key,stamp,stored_at,status,mimetype,etag,encoding,body))
+        self._memo[key]=(stamp,stored_at,status,mimetype,etag,encoding,body)
+        return status,mimetype,etag,encoding,body
+
+    def respond(self,key,names,render):
+        """The cached response for key, rendered by render() when one of the names changed since."""
+        key=f"{key}:{negotiated_mimetype()}:{compression.negotiate() or 'identity'}"
+        versions=self.versions(*names)
+        stamp=json.dumps([versions[name][0] for name in names])
+        entry=self._stored(key,stamp)
+        if entry is None:
+            #a lagging replica could hand back rows older than the versions read above
+            with on_primary():
+                response=render()
+            entry=self._store(key,stamp,response.status_code,response.mimetype,response.get_data())
+        status,mimetype,etag,encoding,body=entry
+        response=Response(body,status=status,mimetype=mimetype)
+        response.set_etag(etag,weak=encoding is not None)
+        #with a Content-Encoding set the compression hook leaves the body alone
+        response.vary.add('Accept-Encoding')
+        if encoding is not None:
+            response.headers['Content-Encoding']=encoding
+        changed_at=max(changed_at for _,changed_at in versions.values())
+        if changed_at:
+            response.last_modified=changed_at
+        response.headers['Cache-Control']=self.cache_control
+        return response.make_conditional(request)
+
+
+response_cache=ResponseCache()
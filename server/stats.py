@@ -0,0 +1,261 @@
+import math
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date,timedelta
+from models import db,Parcel,Vehicle,Location,StatusSummary,RouteSummary,VehicleDaySummary,local_now
+from flask import Blueprint,request,make_response
+from flask.cli import AppGroup
+from flask_restful import Api, Resource
+from flask_jwt_extended import jwt_required
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event,inspect,select,delete,insert,func
+from sqlalchemy.dialects import postgresql,sqlite
+from auth import allow
+from serializers import DATE_FORMAT
+
+stats_bp = Blueprint('stats_bp',__name__)
+api=Api(stats_bp)
+
+# summary table -> (key columns, running totals)
+SUMMARIES={
+    StatusSummary:(('status',),('parcels','weight')),
+    RouteSummary:(('location_id',),('parcels','weight','revenue')),
+    VehicleDaySummary:(('vehicle_id','day'),('parcels','weight')),
+}
+# parcel columns the summaries are computed from
+COUNTED=(Parcel.status,Parcel.location_id,Parcel.vehicle_id,Parcel.created_at,Parcel.weight,Parcel.shipping_cost)
+COUNT_BATCH=5000
+DEFAULT_DAYS=30
+
+
+def _groups(*criteria):
+    """One GROUP BY over every key the summaries use, for the parcels matching criteria.
+
+    Ids of deleted locations and vehicles come back as NULL, those parcels no longer count
+    towards a route or a vehicle.
+    """
+    day=func.date(Parcel.created_at,type_=db.Date)
+    return select(Parcel.status,Location.id,Vehicle.id,day,func.count(),
+                  func.coalesce(func.sum(Parcel.weight),0),func.coalesce(func.sum(Parcel.shipping_cost),0))\
+        .select_from(Parcel)\
+        .outerjoin(Location,Location.id==Parcel.location_id)\
+        .outerjoin(Vehicle,Vehicle.id==Parcel.vehicle_id)\
+        .where(*criteria)\
+        .group_by(Parcel.status,Location.id,Vehicle.id,day)
+
+
+def _upsert(connection,model):
+    keys,totals=SUMMARIES[model]
+    table=model.__table__
+    dialect=postgresql if connection.dialect.name=='postgresql' else sqlite
+    statement=dialect.insert(table)
+    return statement.on_conflict_do_update(index_elements=list(keys),set_={
+        column:table.c[column]+statement.excluded[column] for column in totals
+    })
+
+
+class Tally:
+    """Signed changes to the summary rows, written as one upsert per summary table."""
+
+    def __init__(self):
+        self.changes=defaultdict(dict)
+
+    def count(self,connection,criteria,sign):
+        """Add (sign 1) or take out (sign -1) the parcels matching criteria as they are in the database right now."""
+        for status,location_id,vehicle_id,day,parcels,weight,revenue in connection.execute(_groups(*criteria)):
+            parcels*=sign
+            weight*=sign
+            self._add(StatusSummary,(status,),(parcels,weight))
+            if location_id is not None:
+                self._add(RouteSummary,(location_id,),(parcels,weight,revenue*sign))
+            if vehicle_id is not None and day is not None:
+                self._add(VehicleDaySummary,(vehicle_id,day),(parcels,weight))
+
+    def count_ids(self,connection,parcel_ids,sign):
+        parcel_ids=list(parcel_ids)
+        for start in range(0,len(parcel_ids),COUNT_BATCH):
+            self.count(connection,(Parcel.id.in_(parcel_ids[start:start+COUNT_BATCH]),),sign)
+
+    def _add(self,model,key,values):
+        totals=self.changes[model].get(key)
+        if totals is None:
+            self.changes[model][key]=list(values)
+        else:
+            for index,value in enumerate(values):
+                totals[index]+=value
+
+    def apply(self,connection):
+        for model,changes in self.changes.items():
+            keys,totals=SUMMARIES[model]
+            rows=[dict(zip(keys+totals,key+tuple(values))) for key,values in changes.items() if any(values)]
+            if not rows:
+                continue
+            connection.execute(_upsert(connection,model),rows)
+            if any(row['parcels']<0 for row in rows):
+                connection.execute(delete(model).where(model.parcels<=0))
+        self.changes.clear()
+
+
+# ORM writes: take the parcels out of the summaries before the flush and add them back after
+# it, both read from the database so unloaded attributes and defaults need no special care.
+
+def _touches_summaries(parcel):
+    attrs=inspect(parcel).attrs
+    return any(attrs[column.key].history.has_changes() for column in COUNTED)
+
+
+@event.listens_for(Session,'before_flush')
+def _count_out(session,flush_context,instances):
+    changed=[parcel.id for parcel in session.dirty if isinstance(parcel,Parcel) and _touches_summaries(parcel)]
+    deleted=[parcel.id for parcel in session.deleted if isinstance(parcel,Parcel)]
+    locations=[location.id for location in session.deleted if isinstance(location,Location)]
+    vehicles=[vehicle.id for vehicle in session.deleted if isinstance(vehicle,Vehicle)]
+    if not (changed or deleted or locations or vehicles or any(isinstance(parcel,Parcel) for parcel in session.new)):
+        return
+    tally=Tally()
+    if changed or deleted:
+        tally.count_ids(session.connection(),changed+deleted,-1)
+    session.info['summary_tally']=(tally,changed,locations,vehicles)
+
+
+@event.listens_for(Session,'after_flush')
+def _count_in(session,flush_context):
+    pending=session.info.pop('summary_tally',None)
+    if pending is None:
+        return
+    tally,changed,locations,vehicles=pending
+    connection=session.connection()
+    created=[parcel.id for parcel in session.new if isinstance(parcel,Parcel)]
+    tally.count_ids(connection,changed+created,1)
+    tally.apply(connection)
+    #parcels of a deleted route or vehicle lose the link, so its totals go with it
+    if locations:
+        connection.execute(delete(RouteSummary).where(RouteSummary.location_id.in_(locations)))
+    if vehicles:
+        connection.execute(delete(VehicleDaySummary).where(VehicleDaySummary.vehicle_id.in_(vehicles)))
+
+
+@event.listens_for(Session,'after_rollback')
+def _discard_tally(session):
+    session.info.pop('summary_tally',None)
+
+
+# Bulk statements skip the session hooks, their callers report the parcels they touched.
+
+def count_new_parcels(parcel_ids):
+    """Add parcels created with a bulk INSERT."""
+    tally=Tally()
+    connection=db.session.connection()
+    tally.count_ids(connection,parcel_ids,1)
+    tally.apply(connection)
+
+
+@contextmanager
+def recounting(parcel_ids):
+    """Wrap bulk UPDATEs of parcel_ids: they leave the summaries before it runs and come back after."""
+    tally=Tally()
+    connection=db.session.connection()
+    tally.count_ids(connection,parcel_ids,-1)
+    yield
+    tally.count_ids(connection,parcel_ids,1)
+    tally.apply(connection)
+
+
+def count_loaded(*criteria):
+    """Add parcels that a bulk UPDATE has just put on a vehicle, all of them on none before.
+
+    Their status and route totals stay as they were, so one GROUP BY by vehicle and day after
+    the UPDATE covers what recounting() needs two full ones for.
+    """
+    tally=Tally()
+    day=func.date(Parcel.created_at,type_=db.Date)
+    groups=select(Vehicle.id,day,func.count(),func.coalesce(func.sum(Parcel.weight),0))\
+        .select_from(Parcel)\
+        .join(Vehicle,Vehicle.id==Parcel.vehicle_id)\
+        .where(*criteria)\
+        .group_by(Vehicle.id,day)
+    connection=db.session.connection()
+    for vehicle_id,day,parcels,weight in connection.execute(groups):
+        if day is not None:
+            tally._add(VehicleDaySummary,(vehicle_id,day),(parcels,weight))
+    tally.apply(connection)
+
+
+def _same(expected,current):
+    if expected is None or current is None:
+        return expected is current
+    return expected[0]==current[0] and all(math.isclose(a,b,abs_tol=1e-6) for a,b in zip(expected[1:],current[1:]))
+
+
+def rebuild():
+    """Recompute every summary with GROUP BY. Returns how many groups were out of date.
+
+    Writes that commit while it runs can be lost on databases with concurrent writers,
+    run it when intake is quiet.
+    """
+    tally=Tally()
+    tally.count(db.session.connection(),(),1)
+    stale=0
+    for model,(keys,totals) in SUMMARIES.items():
+        size=len(keys)
+        expected={key:tuple(values) for key,values in tally.changes[model].items()}
+        current={tuple(row[:size]):tuple(row[size:]) for row in
+                 db.session.execute(select(*[getattr(model,column) for column in keys+totals]))}
+        stale+=sum(1 for key in expected.keys()|current.keys() if not _same(expected.get(key),current.get(key)))
+        db.session.execute(delete(model))
+        if expected:
+            db.session.execute(insert(model),[dict(zip(keys+totals,key+values)) for key,values in expected.items()])
+    db.session.commit()
+    return stale
+
+
+stats_cli=AppGroup('stats',help="Dashboard summary tables.")
+
+
+@stats_cli.command('rebuild')
+def rebuild_summaries():
+    """Recompute the summaries from the parcels table and report any drift."""
+    stale=rebuild()
+    print(f"Rebuilt parcel summaries, {stale} groups were out of date")
+
+
+def _date(value):
+    return date.fromisoformat(value) if value else None
+
+
+class Stats(Resource):
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def get(self):
+        args=request.args
+        try:
+            end=_date(args.get('to')) or local_now().date()
+            start=_date(args.get('from')) or end-timedelta(days=DEFAULT_DAYS-1)
+            vehicle_id=int(args['vehicle_id']) if 'vehicle_id' in args else None
+        except ValueError:
+            return make_response({
+                "error":"from and to should be ISO 8601 dates, vehicle_id a number"
+            },400)
+
+        statuses=db.session.query(StatusSummary.status,StatusSummary.parcels,StatusSummary.weight)\
+            .order_by(StatusSummary.status).all()
+        routes=db.session.query(RouteSummary.location_id,Location.origin,Location.destination,
+                                RouteSummary.parcels,RouteSummary.weight,RouteSummary.revenue)\
+            .join(Location,Location.id==RouteSummary.location_id).order_by(RouteSummary.location_id).all()
+        vehicles=db.session.query(VehicleDaySummary.vehicle_id,Vehicle.number_plate,VehicleDaySummary.day,
+                                  VehicleDaySummary.parcels,VehicleDaySummary.weight)\
+            .join(Vehicle,Vehicle.id==VehicleDaySummary.vehicle_id)\
+            .filter(VehicleDaySummary.day>=start,VehicleDaySummary.day<=end)
+        if vehicle_id is not None:
+            vehicles=vehicles.filter(VehicleDaySummary.vehicle_id==vehicle_id)
+        vehicles=vehicles.order_by(VehicleDaySummary.day,VehicleDaySummary.vehicle_id).all()
+
+        return make_response({
+            "statuses":[row._asdict() for row in statuses],
+            "routes":[row._asdict() for row in routes],
+            "vehicles":[dict(row._asdict(),day=row.day.strftime(DATE_FORMAT)) for row in vehicles],
+            "from":start.strftime(DATE_FORMAT),
+            "to":end.strftime(DATE_FORMAT)
+        },200)
+
+api.add_resource(Stats,'/stats')
@@ -0,0 +1,68 @@
+import os
+import sys
+from contextlib import contextmanager
+import pytest
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    from app import create_app
+    directory=tmp_path_factory.mktemp('app')
+    #the extensions are module-level singletons, so one app serves the whole session
+    app=create_app({
+        "TESTING":True,
+        "SQLALCHEMY_DATABASE_URI":f"sqlite:///{directory/'test.db'}",
+        "RESPONSE_CACHE_PATH":str(directory/'response-cache.db'),
+        #no periodic blocklist sync landing in the middle of a statement count
+        "JWT_BLOCKLIST_SYNC_SECONDS":3600,
+    })
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def seed(app):
+    """seed(**volumes) drops every table and loads seed.generate()'s synthetic data."""
+    from seed import generate
+
+    def load(**volumes):
+        volumes.setdefault('blocklist',0)
+        generate(seed=1,log=lambda line:None,**volumes)
+    return load
+
+
+@pytest.fixture
+def auth(app):
+    """auth(user_id, role) is the Authorization header of an access token for that user."""
+    from flask_jwt_extended import create_access_token
+
+    def header(user_id=1,role='admin'):
+        token=create_access_token(identity=user_id,additional_claims={"role":role})
+        return {"Authorization":f"Bearer {token}"}
+    return header
+
+
+@pytest.fixture
+def statements(app):
+    """with statements() as executed: ... collects the (SQL, parameters) the block sends to the database."""
+    from sqlalchemy import event
+    from models import db
+
+    @contextmanager
+    def collect():
+        executed=[]
+        def record(conn,cursor,statement,parameters,context,executemany):
+            executed.append((statement,parameters))
+        event.listen(db.engine,'before_cursor_execute',record)
+        try:
+            yield executed
+        finally:
+            event.remove(db.engine,'before_cursor_execute',record)
+    return collect
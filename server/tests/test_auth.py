@@ -0,0 +1,11 @@
+"""Signup stores a password hash that login checks in the request."""
+
+
+def test_signup_then_login(client,seed):
+    seed(users=5,parcels=0)
+    user={"name":"Wanjiku","phone_number":"0712345678","email":"wanjiku@example.com","password":"correct horse","role":"customer"}
+    assert client.post('/auth/signup',json=user).status_code==201
+    logged_in=client.post('/auth/login',json={"phone_number":"0712345678","password":"correct horse"}).get_json()
+    assert logged_in['role']=='customer' and logged_in['tokens']['access_token']
+    refused=client.post('/auth/login',json={"phone_number":"0712345678","password":"wrong horse!"}).get_json()
+    assert refused=={"message":"Invalid username or password"}
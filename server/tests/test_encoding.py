@@ -0,0 +1,19 @@
+"""Responses are compact JSON through orjson, or msgpack for clients that ask for it."""
+import json
+import pytest
+
+
+def test_json_is_compact_with_sorted_keys(app):
+    assert app.json.dumps({"b":1,"a":[1,2]})=='{"a":[1,2],"b":1}'
+    assert app.json.loads('{"a":[1,2]}')=={"a":[1,2]}
+
+
+def test_msgpack_when_the_client_prefers_it(client,seed,auth):
+    msgpack=pytest.importorskip('msgpack')
+    seed(users=10,parcels=20)
+    as_json=client.get('/parcels?limit=5',headers=auth())
+    as_msgpack=client.get('/parcels?limit=5',headers=dict(auth(),Accept='application/msgpack'))
+    assert as_msgpack.status_code==200
+    assert as_msgpack.mimetype=='application/msgpack'
+    assert 'Accept' in as_msgpack.vary
+    assert msgpack.unpackb(as_msgpack.get_data())==json.loads(as_json.get_data())
@@ -0,0 +1,31 @@
+"""A parcel's event log pages forward by event id."""
+import base64
+import pytest
+from models import db,Parcel,ParcelEvent
+from pagination import encode_cursor
+
+
+def test_events_page_forward(client,seed,auth):
+    seed(users=10,parcels=5)
+    parcel=db.session.query(Parcel).first()
+    for status in ('delivered','pending','in_transit','delivered'):
+        parcel.status=status
+        db.session.commit()
+    logged=[event_id for (event_id,) in db.session.query(ParcelEvent.id).filter_by(parcel_id=parcel.id).order_by(ParcelEvent.id)]
+    first=client.get(f'/parcels/{parcel.id}/events?limit=2',headers=auth()).get_json()
+    ids=[event['id'] for event in first['events']]
+    cursor=first['next_cursor']
+    while cursor:
+        page=client.get(f"/parcels/{parcel.id}/events?limit=2&cursor={cursor}",headers=auth()).get_json()
+        ids+=[event['id'] for event in page['events']]
+        cursor=page['next_cursor']
+    assert len(logged)>=3 and ids==logged
+
+
+@pytest.mark.parametrize('cursor',[base64.urlsafe_b64encode(b'{"a":1}').decode(),encode_cursor([{"a":1}]),encode_cursor(["x"]),'%%%'])
+def test_a_malformed_cursor_is_a_400(client,seed,auth,cursor):
+    seed(users=10,parcels=5)
+    parcel_id=db.session.query(Parcel.id).limit(1).scalar()
+    response=client.get(f'/parcels/{parcel_id}/events?cursor={cursor}',headers=auth())
+    assert response.status_code==400
+    assert response.get_json()=={"error":"Invalid cursor"}
@@ -0,0 +1,14 @@
+"""The parcel export is gzipped only for clients that accept gzip."""
+import gzip
+import pytest
+
+
+@pytest.mark.parametrize('accept,compressed',[('gzip',True),('gzip;q=0.5, identity',True),
+                                               ('gzip;q=0, identity',False),('identity',False)])
+def test_export_honours_the_gzip_quality(client,seed,auth,accept,compressed):
+    seed(users=10,parcels=20)
+    response=client.get('/parcels/export',headers=dict(auth(),**{'Accept-Encoding':accept}))
+    assert response.status_code==200
+    assert (response.headers.get('Content-Encoding')=='gzip')==compressed
+    body=gzip.decompress(response.get_data()) if compressed else response.get_data()
+    assert len(body.decode().splitlines())==20
@@ -0,0 +1,31 @@
+"""/metrics is for admins and opted-in scraper addresses, and failed statements do not skew the SQL timings."""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from models import db
+from metrics import request_metrics
+
+SCRAPER={"REMOTE_ADDR":"10.0.0.9"}
+
+
+def test_metrics_need_an_admin_token_even_from_localhost(client,seed,auth):
+    seed(users=5,parcels=0)
+    assert client.get('/metrics').status_code==401
+    assert client.get('/metrics',headers=auth(2,'customer')).status_code==403
+    response=client.get('/metrics',headers=auth())
+    assert response.status_code==200
+    assert 'http_request_duration_seconds' in response.get_data(as_text=True)
+
+
+def test_metrics_open_to_addresses_opted_in(client,monkeypatch):
+    monkeypatch.setattr(request_metrics,'allowed_addresses',frozenset(['10.0.0.9']))
+    assert client.get('/metrics',environ_base=SCRAPER).status_code==200
+    assert client.get('/metrics').status_code==401
+
+
+def test_failed_statement_leaves_no_start_time_behind(app):
+    connection=db.session.connection()
+    with pytest.raises(OperationalError):
+        connection.execute(text("SELECT * FROM no_such_table"))
+    assert not connection.info.get('metrics_started')
+    db.session.rollback()
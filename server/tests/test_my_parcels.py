@@ -0,0 +1,32 @@
+"""/me/parcels lists what the user sent and what they receive, newest first, one page after another."""
+from sqlalchemy import or_
+from models import db,Parcel
+
+
+def test_pages_cover_sent_and_received_without_gaps(client,seed,auth):
+    seed(users=10,parcels=300)
+    user_id=db.session.query(Parcel.sender_id).limit(1).scalar()
+    expected=[parcel_id for (parcel_id,) in db.session.query(Parcel.id)
+              .filter(or_(Parcel.sender_id==user_id,Parcel.recipient_id==user_id)).order_by(Parcel.id.desc())]
+    sent=db.session.query(Parcel.id).filter(Parcel.sender_id==user_id).count()
+    assert 0<sent<len(expected)
+
+    seen=[]
+    url='/me/parcels?limit=7&fields=id,sender_id,recipient_id'
+    while url:
+        body=client.get(url,headers=auth(user_id,'customer')).get_json()
+        assert len(body['parcels'])<=7
+        assert all(user_id in (parcel['sender_id'],parcel['recipient_id']) for parcel in body['parcels'])
+        seen+=[parcel['id'] for parcel in body['parcels']]
+        url=body['next_cursor'] and f"/me/parcels?limit=7&fields=id,sender_id,recipient_id&cursor={body['next_cursor']}"
+    assert seen==expected
+
+
+def test_status_filter(client,seed,auth):
+    seed(users=10,parcels=300)
+    user_id=db.session.query(Parcel.recipient_id).limit(1).scalar()
+    body=client.get('/me/parcels?limit=200&status=delivered&fields=id,status',headers=auth(user_id,'customer')).get_json()
+    expected=db.session.query(Parcel.id).filter(or_(Parcel.sender_id==user_id,Parcel.recipient_id==user_id),
+                                                Parcel.status=='delivered').count()
+    assert len(body['parcels'])==expected>0
+    assert {parcel['status'] for parcel in body['parcels']}=={'delivered'}
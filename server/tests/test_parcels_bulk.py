@@ -0,0 +1,50 @@
+from models import db,Parcel
+
+
+def parcel(tracking_number):
+    return {"user_id":1,"name":"crate","description":"bulk test","tracking_number":tracking_number,
+            "weight":2.5,"status":"pending","sender_id":2,"recipient_id":3,"location_id":1,"vehicle_id":None}
+
+
+def test_all_valid_batch_is_created(client,seed,auth):
+    seed(users=10,parcels=0)
+    response=client.post('/parcels/bulk',json={"parcels":[parcel('BULK-1'),parcel('BULK-2')]},headers=auth())
+    assert response.status_code==201
+    assert [item['index'] for item in response.get_json()['created']]==[0,1]
+    assert response.get_json()['errors']==[]
+
+
+def test_mixed_batch_saves_the_good_rows_and_reports_the_bad(client,seed,auth):
+    seed(users=10,parcels=0)
+    items=[parcel('BULK-1'),parcel(12345),parcel(['BULK-X']),parcel(''),parcel('BULK-1'),parcel('BULK-2')]
+    response=client.post('/parcels/bulk',json={"parcels":items},headers=auth())
+    body=response.get_json()
+    assert response.status_code==422
+    assert [item['index'] for item in body['created']]==[0,5]
+    assert [error['index'] for error in body['errors']]==[1,2,3,4]
+    assert body['errors'][0]['errors']==["tracking_number should be a non empty string"]
+    assert body['errors'][3]['errors']==["Tracking number is already used"]
+    assert {number for (number,) in db.session.query(Parcel.tracking_number)}=={'BULK-1','BULK-2'}
+
+
+def test_all_invalid_batch_saves_nothing(client,seed,auth):
+    seed(users=10,parcels=0)
+    response=client.post('/parcels/bulk',json={"parcels":[parcel(7),{"name":"no fields"}]},headers=auth())
+    assert response.status_code==422
+    assert response.get_json()['created']==[]
+    assert db.session.query(Parcel).count()==0
+
+
+def test_fields_that_are_not_strings_are_reported_per_item(client,seed,auth):
+    seed(users=10,parcels=0)
+    items=[parcel('BULK-1'),dict(parcel('BULK-2'),name=["x"]),dict(parcel('BULK-3'),description={"a":1}),
+           dict(parcel('BULK-4'),status=None),dict(parcel('BULK-5'),name=""),parcel('BULK-6')]
+    response=client.post('/parcels/bulk',json={"parcels":items},headers=auth())
+    body=response.get_json()
+    assert response.status_code==422
+    assert [item['index'] for item in body['created']]==[0,5]
+    assert [error['errors'] for error in body['errors']]==[["name should be a non empty string"],
+                                                          ["description should be a non empty string"],
+                                                          ["status should be a non empty string"],
+                                                          ["name should be a non empty string"]]
+    assert {number for (number,) in db.session.query(Parcel.tracking_number)}=={'BULK-1','BULK-6'}
@@ -0,0 +1,44 @@
+"""The load planner writes its assignments with set-based statements and keeps the summaries right."""
+from sqlalchemy import func,update
+from models import db,Parcel,ParcelEvent,Vehicle
+from stats import rebuild
+
+
+def unassigned_route(seed):
+    seed(users=30,parcels=600,vehicles=40,locations=3)
+    location_id=db.session.query(Vehicle.location_id).filter(Vehicle.location_id.isnot(None))\
+        .order_by(Vehicle.location_id).limit(1).scalar()
+    db.session.execute(update(Parcel).where(Parcel.location_id==location_id).values(vehicle_id=None,status='pending'))
+    db.session.commit()
+    rebuild()
+    return location_id
+
+
+def test_dry_run_writes_nothing(client,seed,auth):
+    location_id=unassigned_route(seed)
+    events=db.session.query(func.count(ParcelEvent.id)).scalar()
+    response=client.post(f'/locations/{location_id}/plan?dry_run=1',headers=auth())
+    assert response.status_code==200
+    assert response.get_json()['assigned']>0
+    db.session.expire_all()
+    assert db.session.query(Parcel).filter(Parcel.location_id==location_id,Parcel.vehicle_id.isnot(None)).count()==0
+    assert db.session.query(func.count(ParcelEvent.id)).scalar()==events
+
+
+def test_plan_assigns_within_capacity_and_keeps_summaries(client,seed,auth):
+    location_id=unassigned_route(seed)
+    events=db.session.query(func.count(ParcelEvent.id)).scalar()
+    body=client.post(f'/locations/{location_id}/plan',headers=auth()).get_json()
+    db.session.expire_all()
+
+    capacities=dict(db.session.query(Vehicle.id,Vehicle.capacity).filter(Vehicle.location_id==location_id))
+    loads=dict(db.session.query(Parcel.vehicle_id,func.sum(Parcel.weight))
+               .filter(Parcel.location_id==location_id,Parcel.vehicle_id.isnot(None)).group_by(Parcel.vehicle_id))
+    assert body['assigned']>0
+    assert db.session.query(Parcel).filter(Parcel.location_id==location_id,Parcel.vehicle_id.isnot(None)).count()==body['assigned']
+    assert all(load<=capacities[vehicle_id]+1e-6 for vehicle_id,load in loads.items())
+    assert db.session.query(func.count(ParcelEvent.id)).scalar()==events+body['assigned']
+    #a rebuild from scratch finds every summary row already right
+    assert rebuild()==0
+    #nothing is left that fits, so a second plan assigns nothing
+    assert client.post(f'/locations/{location_id}/plan',headers=auth()).get_json()['assigned']==0
@@ -0,0 +1,75 @@
+"""Every worker's position rings follow vehicle_positions, and drivers report only for their own vehicles."""
+import time
+from datetime import datetime
+import pytest
+from sqlalchemy import insert
+from models import db,User,Vehicle,VehiclePosition
+from positions import positions,LOCAL
+from shared_cache import response_cache
+
+
+@pytest.fixture
+def store(seed):
+    seed(users=20,parcels=0,vehicles=5)
+    positions.rings={}
+    positions.pending=[]
+    positions.synced=None
+    positions.sync_seconds=0
+    return positions
+
+
+def test_reads_pick_up_pings_other_workers_wrote(store):
+    vehicle_id,other_id=[vehicle.id for vehicle in Vehicle.query.order_by(Vehicle.id).limit(2)]
+    now=time.time()
+    store.add([(vehicle_id,now,-1.28,36.82,40.0)])
+    assert set(store.latest())=={vehicle_id}
+
+    #what another worker's flusher writes
+    db.session.execute(insert(VehiclePosition),[{"vehicle_id":other_id,"recorded_at":datetime.fromtimestamp(now,LOCAL),
+                                                 "latitude":-1.3,"longitude":36.8,"speed":None}])
+    db.session.commit()
+    assert store.latest()[other_id][1:3]==(-1.3,36.8)
+
+    #this worker's own pings come back from the table without being appended twice
+    store.flush()
+    store.latest()
+    assert store.rings[vehicle_id].count==1
+
+
+def test_first_read_loads_the_latest_stored_position(store):
+    vehicle_id=db.session.query(Vehicle.id).order_by(Vehicle.id).limit(1).scalar()
+    db.session.execute(insert(VehiclePosition),[
+        {"vehicle_id":vehicle_id,"recorded_at":datetime.fromtimestamp(time.time()-minutes*60,LOCAL),
+         "latitude":-1.0-minutes,"longitude":36.0,"speed":30.0}
+        for minutes in (1,5,3)])
+    db.session.commit()
+    assert store.latest(vehicle_id)[vehicle_id][1]==-2.0
+
+
+def test_driver_reports_only_for_their_vehicles(client,store,auth):
+    driver=User(name='Driver Test',phone_number='0799999999',email='driver@example.com',password='x',role='driver')
+    db.session.add(driver)
+    own,other=Vehicle.query.order_by(Vehicle.id).limit(2).all()
+    own.driver_phone=driver.phone_number
+    db.session.commit()
+    response_cache.bump('vehicles')
+
+    ping={"latitude":-1.28,"longitude":36.82}
+    response=client.post('/vehicles/positions',json={"positions":[dict(ping,vehicle_id=own.id),dict(ping,vehicle_id=other.id)]},
+                         headers=auth(driver.id,'driver'))
+    assert response.status_code==202
+    assert response.get_json()=={"accepted":1,"errors":[{"index":1,"error":"Invalid vehicle"}]}
+
+    response=client.post('/vehicles/positions',json={"positions":[dict(ping,vehicle_id=other.id)]},headers=auth())
+    assert response.status_code==202
+
+
+def test_vehicle_ids_that_are_not_integers_are_rejected_per_item(client,store,auth):
+    vehicle_id=db.session.query(Vehicle.id).order_by(Vehicle.id).limit(1).scalar()
+    ping={"latitude":-1.28,"longitude":36.82}
+    items=[dict(ping,vehicle_id=[vehicle_id]),dict(ping,vehicle_id={"id":vehicle_id}),dict(ping,vehicle_id=True),
+           dict(ping,vehicle_id=str(vehicle_id)),dict(ping,vehicle_id=vehicle_id)]
+    response=client.post('/vehicles/positions',json={"positions":items},headers=auth())
+    assert response.status_code==202
+    assert response.get_json()=={"accepted":1,"errors":[{"index":index,"error":"Invalid vehicle"} for index in range(4)]}
+    assert set(store.latest())=={vehicle_id}
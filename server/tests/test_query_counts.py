@@ -0,0 +1,64 @@
+"""List endpoints load their rows and everything they serialize in a fixed number of statements."""
+from resources import _vehicle_list,_location_list
+from sqlalchemy import func
+from models import db,User,Parcel
+
+
+def count(client,statements,url,headers=None):
+    #the first request also pays for one-off loads (the blocklist Bloom filter), leave it out
+    assert client.get(url,headers=headers).status_code==200
+    with statements() as executed:
+        response=client.get(url,headers=headers)
+    assert response.status_code==200
+    return len(executed)
+
+
+def staff_id():
+    return db.session.query(User.id).filter(User.role=='customer_service').order_by(User.id).limit(1).scalar()
+
+
+def test_parcels_page_size_does_not_change_statements(client,seed,auth,statements):
+    seed(users=50,parcels=300)
+    small=count(client,statements,'/parcels?limit=5',auth())
+    large=count(client,statements,'/parcels?limit=100',auth())
+    assert small==large
+
+
+def test_parcel_projection_with_relationships_is_constant(client,seed,auth,statements):
+    seed(users=50,parcels=300)
+    fields='id,sender,recipient'
+    small=count(client,statements,f'/parcels?limit=5&fields={fields}',auth())
+    large=count(client,statements,f'/parcels?limit=100&fields={fields}',auth())
+    assert small==large
+
+
+def test_assignments_constant_as_rows_grow(client,seed,auth,statements):
+    seed(users=50,parcels=20)
+    small=count(client,statements,f'/assignments/{staff_id()}?limit=200',auth())
+    seed(users=50,parcels=2000)
+    large=count(client,statements,f'/assignments/{staff_id()}?limit=200',auth())
+    assert small==large
+
+
+def busiest_sender():
+    return db.session.query(Parcel.sender_id).group_by(Parcel.sender_id).order_by(func.count().desc()).limit(1).scalar()
+
+
+def test_my_parcels_constant_as_rows_grow(client,seed,auth,statements):
+    seed(users=50,parcels=20)
+    small=count(client,statements,'/me/parcels?limit=200',auth(busiest_sender(),'customer'))
+    seed(users=50,parcels=2000)
+    large=count(client,statements,'/me/parcels?limit=200',auth(busiest_sender(),'customer'))
+    assert small==large
+
+
+def test_vehicle_and_location_lists_constant_as_rows_grow(client,seed,auth,statements):
+    counts=[]
+    for vehicles,locations in ((5,3),(300,60)):
+        seed(users=20,parcels=50,vehicles=vehicles,locations=locations)
+        #the endpoints answer from the shared response cache once warm, count what a miss renders
+        with statements() as executed:
+            assert _vehicle_list().status_code==200
+            assert _location_list().status_code==200
+        counts.append(len(executed))
+    assert counts[0]==counts[1]
@@ -0,0 +1,64 @@
+"""The filtered parcel, user and assignment queries are served by the indexes the migrations create."""
+import pytest
+from models import db,User
+
+
+def plans(statements,run):
+    """The EXPLAIN QUERY PLAN lines of every SELECT that run() sends."""
+    with statements() as executed:
+        run()
+    connection=db.session.connection()
+    return [[row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}",parameters)]
+            for statement,parameters in executed if statement.lstrip().upper().startswith('SELECT')]
+
+
+def request_plans(client,statements,url,headers):
+    def run():
+        assert client.get(url,headers=headers).status_code==200
+    #the first request also loads the blocklist Bloom filter, plan only what the endpoint runs
+    run()
+    return plans(statements,run)
+
+
+def lines(plans):
+    return [line for plan in plans for line in plan]
+
+
+@pytest.fixture(scope='module')
+def seeded(app):
+    from seed import generate
+    generate(seed=1,log=lambda line:None,users=100,parcels=2000,blocklist=0)
+
+
+@pytest.mark.parametrize('url,index',[
+    ('/parcels?status=pending','ix_parcels_status_created_at'),
+    ('/parcels?status=pending&created_to=2030-01-01T00:00:00','ix_parcels_status_created_at'),
+    ('/parcels?created_from=2024-01-01T00:00:00','ix_parcels_created_at'),
+    ('/parcels?vehicle_id=1','ix_parcels_vehicle_id_status'),
+    ('/parcels?location_id=1','ix_parcels_location_id_vehicle_id'),
+    ('/parcels?sender_id=5','ix_parcels_sender_id'),
+    ('/parcels?recipient_id=5','ix_parcels_recipient_id'),
+])
+def test_filtered_parcels_use_their_index(client,seeded,auth,statements,url,index):
+    found=lines(request_plans(client,statements,url,auth()))
+    assert any(f"USING INDEX {index} " in line for line in found),found
+    assert not any(line.startswith('SCAN parcels') for line in found),found
+
+
+def test_users_by_role_use_the_role_index(client,seeded,auth,statements):
+    found=lines(request_plans(client,statements,'/users?role=customer',auth()))
+    assert any("USING INDEX ix_users_role " in line for line in found),found
+    assert not any(line.startswith('SCAN users') for line in found),found
+
+
+def test_user_by_name_uses_the_name_index(seeded,statements):
+    name=db.session.query(User.name).order_by(User.id).limit(1).scalar()
+    found=lines(plans(statements,lambda:User.get_user_by_name(name=name)))
+    assert any("USING INDEX ix_users_name " in line for line in found),found
+
+
+def test_assignments_use_the_user_id_index(client,seeded,auth,statements):
+    staff=db.session.query(User.id).filter(User.role=='customer_service').order_by(User.id).limit(1).scalar()
+    found=lines(request_plans(client,statements,f'/assignments/{staff}',auth()))
+    assert any("USING INDEX ix_user_parcel_assignments_user_id " in line for line in found),found
+    assert not any(line.startswith(('SCAN parcels','SCAN user_parcel_assignments')) for line in found),found
@@ -0,0 +1,63 @@
+"""POST /quotes prices items from the in-memory rate table."""
+import pytest
+from models import db,Location
+from resources import locations_changed
+
+
+@pytest.fixture
+def lanes(seed):
+    seed(users=5,parcels=0,locations=3)
+    #the tables were recreated, the ids of the previous test's objects come round again
+    db.session.expunge_all()
+    added=[Location(origin='Kisumu',destination='Eldoret',cost_per_kg=40.0),
+           Location(origin='Eldoret',destination='Kitale',cost_per_kg=25.0)]
+    db.session.add_all(added)
+    db.session.commit()
+    locations_changed()
+    return added
+
+
+def test_quote_by_lane_and_by_location(client,lanes):
+    kisumu_eldoret,eldoret_kitale=lanes
+    items=[{"origin":"kisumu","destination":"ELDORET","weight":2},{"location_id":eldoret_kitale.id,"weight":4.5}]
+    response=client.post('/quotes',json={"items":items})
+    body=response.get_json()
+    assert response.status_code==200
+    assert [(quote['index'],quote['location_id'],quote['shipping_cost']) for quote in body['quotes']]==\
+        [(0,kisumu_eldoret.id,80.0),(1,eldoret_kitale.id,112.5)]
+    assert body['total']==192.5 and body['errors']==[]
+
+
+@pytest.mark.parametrize('data',[[],{},{"items":[]},{"items":"x"},{"items":[{}]*10001}])
+def test_a_missing_or_oversized_item_list_is_a_400(client,lanes,data):
+    response=client.post('/quotes',json=data)
+    assert response.status_code==400
+    assert 'error' in response.get_json()
+
+
+def test_invalid_items_are_reported_and_all_invalid_is_a_400(client,lanes):
+    items=[{"origin":"Kisumu","destination":"Eldoret","weight":0},{"origin":"Kisumu","destination":"Nowhere","weight":1},
+           {"location_id":"abc","weight":1},{"weight":1},"item",{"origin":"Kisumu","destination":"Eldoret","weight":True}]
+    response=client.post('/quotes',json={"items":items})
+    assert response.status_code==400
+    assert [error['index'] for error in response.get_json()['errors']]==[0,1,2,3,4,5]
+
+    response=client.post('/quotes',json={"items":items+[{"origin":"Kisumu","destination":"Eldoret","weight":1}]})
+    assert response.status_code==200
+    assert len(response.get_json()['errors'])==6
+
+
+def test_rates_come_from_the_cached_table_until_a_location_changes(client,lanes,statements):
+    kisumu_eldoret,_=lanes
+    item={"items":[{"origin":"Kisumu","destination":"Eldoret","weight":1}]}
+    client.post('/quotes',json=item)
+    with statements() as executed:
+        assert client.post('/quotes',json=item).get_json()['total']==40.0
+    assert not [statement for statement,_ in executed if 'locations' in statement]
+
+    kisumu_eldoret.cost_per_kg=50.0
+    db.session.commit()
+    locations_changed()
+    with statements() as executed:
+        assert client.post('/quotes',json=item).get_json()['total']==50.0
+    assert [statement for statement,_ in executed if 'locations' in statement]
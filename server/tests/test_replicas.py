@@ -0,0 +1,78 @@
+"""GET requests read from a replica, writes and the clients that just wrote stay on the primary."""
+import sqlite3
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Column,Integer,MetaData,String,Table,insert,select
+from replicas import ReplicaRouter,RoutingSession,PIN_COOKIE,PIN_HEADER
+
+metadata=MetaData()
+places=Table('places',metadata,Column('id',Integer,primary_key=True),Column('name',String))
+
+
+def database(path,name):
+    connection=sqlite3.connect(path)
+    connection.execute("CREATE TABLE places (id INTEGER PRIMARY KEY, name TEXT)")
+    connection.execute("INSERT INTO places (name) VALUES (?)",(name,))
+    connection.commit()
+    connection.close()
+    return path
+
+
+def read_only(path):
+    return f"sqlite:///file:{path}?mode=ro&uri=true"
+
+
+@pytest.fixture
+def routed(tmp_path):
+    """An app on a primary and a replica told apart by the name stored in each, and its router."""
+    def build(*replica_paths):
+        app=Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI']=f"sqlite:///{database(tmp_path/'primary.db','primary')}"
+        app.config['SQLALCHEMY_REPLICA_URIS']=[read_only(path) for path in replica_paths]
+        app.config['REPLICA_HEALTH_SECONDS']=0
+        db=SQLAlchemy(metadata=metadata,session_options={"class_":RoutingSession})
+        db.init_app(app)
+        router=ReplicaRouter(app)
+
+        @app.get('/place')
+        def read():
+            return {"names":db.session.execute(select(places.c.name).order_by(places.c.id)).scalars().all()}
+
+        @app.post('/place')
+        def write():
+            db.session.execute(insert(places).values(name='written'))
+            db.session.commit()
+            return read()
+
+        return app.test_client(),router
+    return build
+
+
+def test_reads_go_to_the_replica_and_writers_stay_on_the_primary(routed,tmp_path):
+    client,router=routed(database(tmp_path/'replica.db','replica'))
+    assert client.get('/place').get_json()=={"names":["replica"]}
+
+    #the write and the reads after it in the same request use the primary
+    response=client.post('/place')
+    assert response.get_json()=={"names":["primary","written"]}
+    assert client.get_cookie(PIN_COOKIE) is not None
+    assert client.get('/place').get_json()=={"names":["primary","written"]}
+
+    client.delete_cookie(PIN_COOKIE)
+    assert client.get('/place').get_json()=={"names":["replica"]}
+    assert client.get('/place',headers={PIN_HEADER:'1'}).get_json()=={"names":["primary","written"]}
+
+
+def test_a_failed_replica_leaves_the_rotation(routed,tmp_path):
+    missing=tmp_path/'missing.db'
+    client,router=routed(database(tmp_path/'replica.db','replica'),missing)
+    statuses=[client.get('/place').status_code for _ in range(2)]
+    assert sorted(statuses)==[200,500]
+    assert [engine.url.database for engine in router.healthy]==[f"file:{tmp_path/'replica.db'}"]
+    assert all(client.get('/place').get_json()=={"names":["replica"]} for _ in range(4))
+
+    #the health check puts it back once it answers
+    database(missing,'recovered')
+    assert len(router.check())==2
+    assert {client.get('/place').get_json()['names'][0] for _ in range(2)}=={"replica","recovered"}
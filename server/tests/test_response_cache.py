@@ -0,0 +1,29 @@
+"""The shared response cache keeps each content encoding already compressed."""
+import gzip
+import json
+from encoding import compression
+from shared_cache import response_cache
+
+
+def test_a_hit_is_served_compressed_without_compressing_again(app,client,seed,monkeypatch):
+    seed(users=10,parcels=10,vehicles=10,locations=40)
+    with app.app_context():
+        response_cache.bump('locations')
+    encode=compression.encode
+    calls=[]
+    monkeypatch.setattr(compression,'encode',lambda *args:calls.append(args) or encode(*args))
+
+    first,second=(client.get('/locations',headers={'Accept-Encoding':'gzip'}) for _ in range(2))
+    assert len(calls)==1
+    for response in (first,second):
+        assert response.status_code==200
+        assert response.headers['Content-Encoding']=='gzip'
+        assert 'Accept-Encoding' in response.vary
+    assert second.get_data()==first.get_data()
+    assert first.get_etag()==second.get_etag()==(first.get_etag()[0],True)
+
+    plain=client.get('/locations',headers={'Accept-Encoding':'gzip;q=0, identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert json.loads(plain.get_data())==json.loads(gzip.decompress(first.get_data()))
+    assert plain.get_etag()==(first.get_etag()[0],False)
+    assert client.get('/locations',headers={'Accept-Encoding':'gzip','If-None-Match':first.headers['ETag']}).status_code==304
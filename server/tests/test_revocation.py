@@ -0,0 +1,13 @@
+"""Logging out commits the token's blocklist row before the response goes out."""
+from models import db,TokenBlocklist
+from revocation import blocklist
+
+
+def test_logout_writes_the_blocklist_row(client,seed,auth):
+    seed(users=5,parcels=0)
+    headers=auth()
+    response=client.get('/auth/logout',headers=headers)
+    assert response.status_code==200
+    jtis=[jti for (jti,) in db.session.query(TokenBlocklist.jti)]
+    assert len(jtis)==1
+    assert blocklist.is_revoked(jtis[0])
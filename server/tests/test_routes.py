@@ -0,0 +1,56 @@
+"""Cheapest routes are memoized only for real places and kept across unrelated lane changes."""
+from models import db,Location
+from rates import route_graph
+from resources import locations_changed
+
+
+def lanes(*rows):
+    added=[Location(origin=origin,destination=destination,cost_per_kg=cost) for origin,destination,cost in rows]
+    db.session.add_all(added)
+    db.session.commit()
+    locations_changed()
+    return added
+
+
+def test_route_takes_the_cheapest_legs(client,seed):
+    seed(users=5,parcels=0,locations=3)
+    lanes(('Alpha','Bravo',2.0),('Bravo','Charlie',3.0),('Alpha','Charlie',9.0))
+    body=client.get('/routes?origin=alpha&destination=CHARLIE&weight=2').get_json()
+    assert [(leg['origin'],leg['destination']) for leg in body['legs']]==[('alpha','bravo'),('bravo','charlie')]
+    assert body['cost_per_kg']==5.0 and body['shipping_cost']==10.0
+
+
+def test_unknown_places_are_not_memoized(client,seed):
+    seed(users=5,parcels=0,locations=3)
+    lanes(('Alpha','Bravo',2.0))
+    client.get('/routes?origin=alpha&destination=bravo')
+    trees,routes=route_graph._state[6],route_graph._state[7]
+    sizes=(len(trees),len(routes))
+    for number in range(200):
+        response=client.get(f'/routes?origin=nowhere-{number}&destination=bravo')
+        assert response.status_code==400
+        client.get(f'/routes?origin=alpha&destination=nowhere-{number}')
+    assert (len(trees),len(routes))==sizes
+
+
+def test_a_lane_change_drops_only_the_trees_it_touches(client,seed):
+    seed(users=5,parcels=0,locations=3)
+    alpha_bravo,_,yankee_zulu=lanes(('Alpha','Bravo',2.0),('Bravo','Charlie',3.0),('Yankee','Zulu',4.0))
+    route_graph.route('alpha','charlie')
+    route_graph.route('yankee','zulu')
+    alpha=route_graph._state[6]['alpha']
+
+    yankee_zulu.cost_per_kg=5.0
+    db.session.commit()
+    locations_changed()
+    assert route_graph.route('yankee','zulu')[0][3]==5.0
+    assert route_graph._state[6]['alpha'] is alpha
+
+    #a cheaper direct lane improves alpha's tree, a dearer first leg cuts through it
+    direct,=lanes(('Alpha','Charlie',4.0))
+    assert route_graph.route('alpha','charlie')==[(direct.id,'alpha','charlie',4.0)]
+    alpha_bravo.cost_per_kg=7.0
+    db.session.commit()
+    locations_changed()
+    assert route_graph.route('alpha','bravo')==[(alpha_bravo.id,'alpha','bravo',7.0)]
+    assert route_graph._state[6]['alpha'] is not alpha
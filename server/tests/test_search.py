@@ -0,0 +1,45 @@
+"""/parcels/search matches fragments of names, descriptions and tracking numbers, best first."""
+import pytest
+from models import db,Parcel
+
+
+@pytest.fixture
+def zebras(seed):
+    seed(users=20,parcels=200)
+    parcels=db.session.query(Parcel).order_by(Parcel.id).limit(25).all()
+    for parcel in parcels:
+        parcel.description='zebrafish tank, handle with care'
+    db.session.commit()
+    return [parcel.id for parcel in parcels]
+
+
+def test_matches_a_fragment_of_the_description(client,auth,zebras):
+    body=client.get('/parcels/search?q=ebrafi&limit=100&fields=id,description',headers=auth()).get_json()
+    assert sorted(parcel['id'] for parcel in body['parcels'])==zebras
+    assert body['next_cursor'] is None
+
+
+def test_matches_part_of_a_tracking_number(client,auth,zebras):
+    tracking_number=db.session.get(Parcel,zebras[0]).tracking_number
+    body=client.get(f'/parcels/search?q={tracking_number[-6:]}&fields=id,tracking_number',headers=auth()).get_json()
+    assert tracking_number in [parcel['tracking_number'] for parcel in body['parcels']]
+
+
+def test_pages_follow_the_cursor(client,auth,zebras):
+    seen=[]
+    url='/parcels/search?q=zebrafish&limit=10&fields=id'
+    sizes=[]
+    while url:
+        body=client.get(url,headers=auth()).get_json()
+        sizes.append(len(body['parcels']))
+        seen+=[parcel['id'] for parcel in body['parcels']]
+        url=body['next_cursor'] and f"/parcels/search?q=zebrafish&limit=10&fields=id&cursor={body['next_cursor']}"
+    assert sizes==[10,10,5]
+    assert sorted(seen)==zebras
+
+
+@pytest.mark.parametrize('q',['','ab','a b','%%'])
+def test_a_query_too_short_to_match_is_a_400(client,auth,zebras,q):
+    response=client.get(f'/parcels/search?q={q}',headers=auth())
+    assert response.status_code==400
+    assert response.get_json()=={"error":"Please enter a search of at least 3 letters or digits"}
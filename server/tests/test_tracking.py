@@ -0,0 +1,38 @@
+"""Public tracking answers carry an ETag that follows the parcel."""
+from models import db,Parcel
+from tracking import tracking_cache
+
+
+def tracked(seed):
+    seed(users=10,parcels=5)
+    tracking_cache.clear()
+    return db.session.query(Parcel).filter(Parcel.status!='delivered').first()
+
+
+def test_answer_carries_an_etag(client,seed):
+    parcel=tracked(seed)
+    response=client.get(f'/track/{parcel.tracking_number}')
+    assert response.status_code==200
+    assert response.get_json()['status']==parcel.status
+    etag,weak=response.get_etag()
+    assert etag and not weak
+    assert client.get(f'/track/{parcel.tracking_number}').headers['ETag']==response.headers['ETag']
+
+
+def test_matching_if_none_match_is_a_304(client,seed):
+    parcel=tracked(seed)
+    etag=client.get(f'/track/{parcel.tracking_number}').headers['ETag']
+    response=client.get(f'/track/{parcel.tracking_number}',headers={'If-None-Match':etag})
+    assert response.status_code==304
+    assert response.get_data()==b''
+    assert client.get(f'/track/{parcel.tracking_number}',headers={'If-None-Match':'"other"'}).status_code==200
+
+
+def test_etag_changes_after_an_update(client,seed,auth):
+    parcel=tracked(seed)
+    etag=client.get(f'/track/{parcel.tracking_number}').headers['ETag']
+    assert client.put(f'/parcels/{parcel.id}',json={"status":"delivered"},headers=auth()).status_code==200
+    response=client.get(f'/track/{parcel.tracking_number}',headers={'If-None-Match':etag})
+    assert response.status_code==200
+    assert response.headers['ETag']!=etag
+    assert response.get_json()['status']=='delivered'
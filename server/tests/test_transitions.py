@@ -0,0 +1,74 @@
+"""POST /vehicles/<id>/transition moves a vehicle's parcels in one statement."""
+from collections import Counter
+import pytest
+from sqlalchemy import func
+from models import db,Parcel,ParcelEvent,Vehicle
+
+
+def loaded_vehicle():
+    return db.session.query(Parcel.vehicle_id).filter(Parcel.vehicle_id.isnot(None)).group_by(Parcel.vehicle_id)\
+        .order_by(func.count(func.distinct(Parcel.status)).desc(),func.count().desc()).limit(1).scalar()
+
+
+def statuses(vehicle_id):
+    return Counter(status for (status,) in db.session.query(Parcel.status).filter_by(vehicle_id=vehicle_id))
+
+
+def test_transition_moves_the_parcels_and_the_vehicle(client,seed,auth):
+    seed(users=20,parcels=500,vehicles=10)
+    vehicle_id=loaded_vehicle()
+    before=statuses(vehicle_id)
+    events=db.session.query(ParcelEvent).count()
+    response=client.post(f'/vehicles/{vehicle_id}/transition',json={"status":"delivered","vehicle_status":"idle"},
+                         headers=auth())
+    body=response.get_json()
+    assert response.status_code==200
+    moved=sum(count for status,count in before.items() if status!='delivered')
+    assert body['updated']==moved>0
+    assert body['previous_statuses']=={status:count for status,count in before.items() if status!='delivered'}
+    db.session.expire_all()
+    assert statuses(vehicle_id)=={"delivered":sum(before.values())}
+    assert db.session.get(Vehicle,vehicle_id).status=='idle'
+    assert db.session.query(ParcelEvent).count()==events+moved
+
+
+def test_from_status_limits_what_moves(client,seed,auth):
+    seed(users=20,parcels=500,vehicles=10)
+    vehicle_id=loaded_vehicle()
+    before=statuses(vehicle_id)
+    response=client.post(f'/vehicles/{vehicle_id}/transition',json={"status":"in_transit","from_status":"pending"},
+                         headers=auth())
+    assert response.get_json()['updated']==before['pending']
+    db.session.expire_all()
+    assert statuses(vehicle_id)==Counter(in_transit=before['pending']+before['in_transit'],delivered=before['delivered'])
+
+
+@pytest.mark.parametrize('data,error',[
+    ({},"Please enter the status to move the parcels to"),
+    ({"status":""},"Please enter the status to move the parcels to"),
+    ({"status":"delivered","from_status":[]},"from_status should be a status or a list of statuses"),
+    ({"status":"delivered","from_status":[1]},"from_status should be a status or a list of statuses"),
+    ({"status":"delivered","vehicle_status":5},"vehicle_status should be a status"),
+])
+def test_invalid_transitions_are_rejected_without_changes(client,seed,auth,data,error):
+    seed(users=20,parcels=100,vehicles=5)
+    vehicle_id=loaded_vehicle()
+    before=statuses(vehicle_id)
+    response=client.post(f'/vehicles/{vehicle_id}/transition',json=data,headers=auth())
+    assert response.status_code==400
+    assert response.get_json()=={"error":error}
+    assert statuses(vehicle_id)==before
+
+
+def test_customers_cannot_move_parcels(client,seed,auth):
+    seed(users=20,parcels=100,vehicles=5)
+    vehicle_id=loaded_vehicle()
+    response=client.post(f'/vehicles/{vehicle_id}/transition',json={"status":"delivered"},headers=auth(2,'customer'))
+    assert response.status_code==403
+
+
+def test_unknown_vehicle(client,seed,auth):
+    seed(users=20,parcels=100,vehicles=5)
+    response=client.post('/vehicles/999999/transition',json={"status":"delivered"},headers=auth())
+    assert response.status_code==400
+    assert response.get_json()=={"error":"No vehicle found"}
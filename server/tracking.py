@@ -0,0 +1,59 @@
+import hashlib
+from models import db,Parcel,Location
+from flask import Blueprint,request,make_response,current_app
+from flask_restful import Api, Resource
+from cache import TTLCache
+from serializers import DATETIME_FORMAT
+
+tracking_bp = Blueprint('tracking_bp',__name__)
+api=Api(tracking_bp)
+
+# tracking number -> (body, etag). Writes in this process invalidate entries straight away,
+# the TTL bounds how long another worker can serve a parcel that changed elsewhere.
+TRACKING_CACHE_SIZE=50000
+TRACKING_CACHE_TTL=300
+tracking_cache=TTLCache(maxsize=TRACKING_CACHE_SIZE,ttl=TRACKING_CACHE_TTL)
+
+
+def invalidate_tracking(*tracking_numbers):
+    for tracking_number in tracking_numbers:
+        tracking_cache.pop(tracking_number)
+
+
+def _load(tracking_number):
+    row=db.session.query(Parcel.tracking_number,Parcel.name,Parcel.status,Parcel.created_at,
+                         Location.origin,Location.destination)\
+        .outerjoin(Location,Parcel.location_id==Location.id)\
+        .filter(Parcel.tracking_number==tracking_number).first()
+    if row is None:
+        return None
+    #only what a customer needs to follow the parcel, no sender or recipient details
+    body=current_app.json.dumps({
+        "tracking_number":row.tracking_number,
+        "name":row.name,
+        "status":row.status,
+        "created_at":row.created_at.strftime(DATETIME_FORMAT) if row.created_at else None,
+        "origin":row.origin,
+        "destination":row.destination
+    }).encode()
+    return body,hashlib.sha256(body).hexdigest()
+
+
+class Track(Resource):
+    def get(self,tracking_number):
+        entry=tracking_cache.get(tracking_number)
+        if entry is None:
+            entry=_load(tracking_number)
+            if entry is None:
+                return make_response({
+                    "error":"Parcel not found"
+                },400)
+            tracking_cache.set(tracking_number,entry)
+
+        body,etag=entry
+        response=current_app.response_class(body,mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control']='no-cache'
+        return response.make_conditional(request)
+
+api.add_resource(Track,'/track/<string:tracking_number>')
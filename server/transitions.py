@@ -0,0 +1,87 @@
+from collections import Counter
+from models import db,Parcel,Vehicle
+from flask import Blueprint,request,make_response
+from flask_restful import Api, Resource
+from flask_jwt_extended import jwt_required
+from sqlalchemy import update
+from auth import allow
+from events import record_snapshots
+from stats import recounting
+from tracking import invalidate_tracking
+from shared_cache import response_cache
+
+transitions_bp = Blueprint('transitions_bp',__name__)
+api=Api(transitions_bp)
+
+SNAPSHOT_BATCH=5000
+
+
+def _statuses(value):
+    if value is None:
+        return None
+    if isinstance(value,str):
+        value=[value]
+    if not isinstance(value,list) or not value or not all(isinstance(status,str) and status for status in value):
+        return False
+    return value
+
+
+class VehicleTransition(Resource):
+    @jwt_required()
+    @allow(['admin','customer_service'])
+    def post(self,id):
+        data=request.get_json(silent=True) or {}
+        status=data.get('status')
+        from_status=_statuses(data.get('from_status'))
+        vehicle_status=data.get('vehicle_status')
+        if not isinstance(status,str) or not status:
+            return make_response({
+                "error":"Please enter the status to move the parcels to"
+            },400)
+        if from_status is False:
+            return make_response({
+                "error":"from_status should be a status or a list of statuses"
+            },400)
+        if vehicle_status is not None and (not isinstance(vehicle_status,str) or not vehicle_status):
+            return make_response({
+                "error":"vehicle_status should be a status"
+            },400)
+        vehicle=db.session.get(Vehicle,id)
+        if vehicle is None:
+            return make_response({
+                "error":"No vehicle found"
+            },400)
+
+        criteria=[Parcel.vehicle_id==id,Parcel.status!=status]
+        if from_status:
+            criteria.append(Parcel.status.in_(from_status))
+        #the ids feed the summary recount, the event log and the tracking cache, FOR UPDATE
+        #keeps another transaction from moving these rows in between on databases that lock rows
+        rows=db.session.query(Parcel.id,Parcel.tracking_number,Parcel.status).filter(*criteria)\
+            .with_for_update().all()
+        parcel_ids=[parcel_id for parcel_id,_,_ in rows]
+
+        if parcel_ids:
+            with recounting(parcel_ids):
+                updated=db.session.execute(update(Parcel).where(*criteria).values(status=status)
+                                           .execution_options(synchronize_session=False)).rowcount
+            for start in range(0,len(parcel_ids),SNAPSHOT_BATCH):
+                record_snapshots(Parcel.id.in_(parcel_ids[start:start+SNAPSHOT_BATCH]))
+        else:
+            updated=0
+        if vehicle_status is not None:
+            vehicle.status=vehicle_status
+        db.session.commit()
+        invalidate_tracking(*(tracking_number for _,tracking_number,_ in rows))
+        if vehicle_status is not None:
+            response_cache.bump('vehicles')
+
+        return make_response({
+            "vehicle_id":id,
+            "status":status,
+            "updated":updated,
+            "previous_statuses":dict(Counter(previous for _,_,previous in rows)),
+            "vehicle_status":vehicle_status
+        },200)
+
+api.add_resource(VehicleTransition,'/vehicles/<int:id>/transition')
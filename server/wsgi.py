@@ -0,0 +1,15 @@
+"""WSGI entry point for a pre-forking server, run from the server directory:
+
+    gunicorn --preload --workers 4 --bind 0.0.0.0:5555 wsgi:app
+
+With --preload the app is built once in the gunicorn master and every worker is forked from
+it with the imports, models and routes already in place. create_app() opens no database
+connection and starts no thread, those are made per worker on first use.
+"""
+import gc
+from app import create_app
+
+app=create_app()
+#what is built so far lives as long as the workers, moved out of the collector's reach it is
+#never written to by a collection and so stays shared with the master instead of being copied
+gc.freeze()